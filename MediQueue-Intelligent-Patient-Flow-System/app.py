@@ -1,135 +1,330 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
 import mysql.connector
-from mysql.connector import Error
+import os
 import random
-from datetime import date, datetime, time, timedelta
+import threading
+from datetime import date, datetime, timedelta
+
+from db import AdvisoryLock, DatabaseUnavailable, db_connection, pool_stats
+import directory
+import events
+from events import MySQLEventRelay, broker, queue_topics, subscription_topics
+from log_config import configure_logging
+import metrics
+import schema
+from otp_store import create_otp_store
+import queue_engine
+from queue_engine import live_queue
+from response_cache import response_cache
+from pagination import (
+    NEXT_CURSOR_HEADER,
+    Keyset,
+    PageError,
+    build_filters,
+    fetch_page,
+    first_page,
+    page_response,
+    parse_date_arg,
+    parse_int_arg,
+)
+from reservations import (
+    SlotFull,
+    allocate_token,
+    claim_slot,
+    ensure_reservation_table,
+    release_slot,
+    reserve_and_book,
+    reserve_and_book_many,
+)
+from scheduler import SlotBoundaryScheduler, current_slot_start
+import serializer
+import sql_trace
+from slots import MAX_RANGE_DAYS, SLOT_MINUTES, available_slots, fetch_slot_counts, slot_start_for, slot_window
+from serializer import as_date, as_time, format_hhmm, serialize
+from streaming import stream_json
+
+log = configure_logging()
 
 app = Flask(__name__)
-CORS(app)
+CORS(app, expose_headers=[NEXT_CURSOR_HEADER, "Link", "Server-Timing"])
+sql_trace.install(app)
+metrics.install(app)
+serializer.install(app)
 
 # ----------------------------
 # DATABASE CONNECTION
 # ----------------------------
-def get_connection():
-    """Create a new MySQL connection for each request."""
-    try:
-        conn = mysql.connector.connect(
-            host="localhost",
-            user="root",
-            password="root",
-            database="clinic"
-        )
-        return conn
-    except Error as e:
-        print("❌ Database connection error:", e)
-        return None
+# Every route borrows a pooled connection with `with db_connection() as conn:`;
+# leaving the block hands it back to the pool (see db.py for configuration).
+@app.errorhandler(DatabaseUnavailable)
+def database_unavailable(e):
+    print("❌ Database connection error:", e)
+    return jsonify({"error": "Database connection failed"}), 500
+
+
+@app.errorhandler(schema.SchemaError)
+def schema_mismatch(e):
+    print("❌ Unsupported database schema:", e)
+    return jsonify({"error": "Database schema is missing a required column"}), 500
+
+
+@app.errorhandler(PageError)
+def bad_page_request(e):
+    return jsonify({"error": str(e)}), 400
+
+
+@app.route("/db/pool", methods=["GET"])
+def get_pool_stats():
+    return jsonify(pool_stats())
+
+
+@metrics.register_collector
+def _pool_and_cache_metrics():
+    pool = pool_stats()
+    cache = response_cache.stats()
+    return [
+        ("mediqueue_db_pool_size", "gauge", "Connections the pool may hold.", pool["pool_size"]),
+        ("mediqueue_db_pool_in_use", "gauge", "Connections checked out by requests or jobs.", pool["in_use"]),
+        ("mediqueue_db_pool_waiting", "gauge", "Callers waiting for a free connection.", pool["waiting"]),
+        ("mediqueue_db_pool_saturation", "gauge", "Share of the pool in use (0-1).", pool["in_use"] / pool["pool_size"]),
+        ("mediqueue_db_pool_checkouts_total", "counter", "Connections handed out.", pool["checkouts"]),
+        ("mediqueue_db_pool_timeouts_total", "counter", "Checkouts that gave up waiting.", pool["timeouts"]),
+        ("mediqueue_db_pool_errors_total", "counter", "Checkouts that failed to connect.", pool["errors"]),
+        ("mediqueue_response_cache_entries", "gauge", "Responses held by the response cache.", cache["entries"]),
+        ("mediqueue_response_cache_hits_total", "counter", "Cached responses served.", cache["hits"]),
+        ("mediqueue_response_cache_misses_total", "counter", "Cacheable requests that ran the view.", cache["misses"]),
+        ("mediqueue_response_cache_not_modified_total", "counter", "304 responses sent.", cache["not_modified"]),
+        ("mediqueue_response_cache_evictions_total", "counter", "Entries evicted by the LRU bound.", cache["evictions"]),
+        ("mediqueue_response_cache_hit_ratio", "gauge", "Hits over lookups since start.", cache["hit_ratio"]),
+    ]
+
+
+@app.route("/metrics", methods=["GET"])
+def get_metrics():
+    """Prometheus text format; see metrics.py for what is recorded."""
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
+@app.route("/cache/stats", methods=["GET"])
+def get_cache_stats():
+    return jsonify(response_cache.stats())
+
+
+@app.route("/db/requests", methods=["GET"])
+def get_request_sql_stats():
+    """Statements, DB time and rows per endpoint (see sql_trace.py), plus the last run of each scheduled job."""
+    return jsonify({"endpoints": sql_trace.endpoint_stats(), "jobs": scheduler.last_runs})
+
+
+@app.route("/db/schema", methods=["GET"])
+def get_schema_columns():
+    """The column names the SQL builders use (see schema.py)."""
+    with db_connection() as conn:
+        return jsonify(schema.columns(conn))
 
 
 # ----------------------------
 # HELPER FUNCTIONS
 # ----------------------------
-def convert_dates(rows):
-    """Convert MySQL date/time objects to strings for JSON serialization."""
-    for row in rows:
-        for key, value in row.items():
-            if isinstance(value, (date, datetime, timedelta)):
-                row[key] = str(value)
-    return rows
+def auto_complete_past_appointments():
+    """Automatically mark appointments that are before the current time slot as Completed.
+    Does NOT mark appointments in the current time slot as completed.
+
+    Runs from the slot scheduler (on startup and at every 30-minute boundary),
+    never from a request, so read endpoints stay read-only."""
+    try:
+        with db_connection() as conn:
+            _auto_complete_past_appointments(conn)
+    except DatabaseUnavailable:
+        print("❌ Cannot auto-complete appointments: Database connection failed")
 
 
-def _get_queue_status_column(conn):
-    """Return the column name used to store queue status (q_status or status)."""
+# One set-based UPDATE completes every appointment BEFORE the current time slot
+# (date < today, or date = today AND time < slot_start) together with its queue row.
+AUTO_COMPLETE_SQL = """
+    UPDATE appointment a
+    LEFT JOIN queue q ON q.a_id = a.a_id
+    SET a.{a_status} = 'Completed',
+        q.{q_status} = 'Completed'
+    WHERE a.{a_status} IN ('Scheduled', 'Waiting')
+      AND (
+        a.date < %s
+        OR (a.date = %s AND a.time < %s)
+      )
+"""
+
+
+def _auto_complete_past_appointments(conn):
     cursor = conn.cursor()
     try:
-        cursor.execute("SHOW COLUMNS FROM queue LIKE 'q_status'")
-        if cursor.fetchone():
-            return "q_status"
-        cursor.execute("SHOW COLUMNS FROM queue LIKE 'status'")
-        if cursor.fetchone():
-            return "status"
-    finally:
-        cursor.close()
-    raise RuntimeError("Queue status column not found")
+        slot_start = current_slot_start()
+        today = slot_start.date()
 
+        cursor.execute(schema.sql(conn, AUTO_COMPLETE_SQL), (today, today, slot_start.time()))
+        completed_count = cursor.rowcount
 
-def auto_complete_past_appointments():
-    """Automatically mark appointments that are before the current time slot as Completed.
-    Does NOT mark appointments in the current time slot as completed."""
-    conn = get_connection()
-    if not conn:
-        print("❌ Cannot auto-complete appointments: Database connection failed")
-        return
-    
-    cursor = conn.cursor(dictionary=True)
-    try:
-        now = datetime.now()
-        today = now.date()
-        current_time = now.time()
-        
-        # Calculate current time slot (30-minute window)
-        # Round down to nearest 30-minute slot
-        slot_minute = 0 if current_time.minute < 30 else 30
-        slot_start = time(current_time.hour, slot_minute, 0)
-        
-        # Find all appointments that are BEFORE the current time slot and not already completed
-        # An appointment is in the past if:
-        # 1. date < today, OR
-        # 2. date = today AND time < slot_start (before current time slot, not in it)
-        cursor.execute("""
-            SELECT a.a_id, a.date, a.time
-            FROM appointment a
-            WHERE a.status IN ('Scheduled', 'Waiting')
-              AND (
-                a.date < %s
-                OR (a.date = %s AND a.time < %s)
-              )
-        """, (today, today, slot_start))
-        
-        past_appointments = cursor.fetchall()
-        
-        if not past_appointments:
-            cursor.close()
-            conn.close()
-            return
-        
-        # Get queue status column name
-        try:
-            status_column = _get_queue_status_column(conn)
-        except RuntimeError:
-            status_column = None
-        
-        # Mark each past appointment as completed
-        completed_count = 0
-        for apt in past_appointments:
-            a_id = apt['a_id']
-            
-            # Update appointment status
-            cursor.execute("UPDATE appointment SET status='Completed' WHERE a_id=%s", (a_id,))
-            
-            # Update queue status if queue table exists
-            if status_column:
-                try:
-                    cursor.execute(
-                        f"UPDATE queue SET {status_column}='Completed' WHERE a_id=%s",
-                        (a_id,)
-                    )
-                except Exception as e:
-                    # Queue entry might not exist, that's okay
-                    pass
-            
-            completed_count += 1
-        
         conn.commit()
         if completed_count > 0:
-            print(f"✅ Auto-completed {completed_count} past appointment(s) (before current time slot)")
-        
+            print(f"✅ Auto-completed past appointments before {slot_start.strftime('%H:%M')} ({completed_count} row(s) updated)")
+
     except Exception as e:
         print(f"❌ Error auto-completing past appointments: {e}")
         conn.rollback()
     finally:
         cursor.close()
-        conn.close()
+
+
+# ----------------------------
+# BACKGROUND JOBS
+# ----------------------------
+# Shared jobs run in one worker process at a time: the holder of this MySQL lock
+scheduler = SlotBoundaryScheduler(leader=AdvisoryLock("mediqueue-scheduler"))
+scheduler.add_job(auto_complete_past_appointments, shared=True)
+
+
+# Carries queue events between worker processes (see events.py); None with a single process
+event_relay = MySQLEventRelay(broker) if events.RELAY == "mysql" else None
+
+
+def start_event_relay():
+    if event_relay is not None:
+        event_relay.start()
+
+
+def start_background_jobs():
+    """Resolve the schema, then start the event relay and the slot-boundary scheduler (runs each job once immediately)."""
+    try:
+        with db_connection() as conn:
+            schema.refresh(conn)
+    except (DatabaseUnavailable, schema.SchemaError) as e:
+        print(f"❌ Cannot resolve the database schema at startup: {e}")
+    start_event_relay()
+    scheduler.start()
+
+
+draining = threading.Event()
+
+
+def stop_background_jobs():
+    """Drain this process: fail health checks, stop the scheduler and relay and end open event streams."""
+    draining.set()
+    scheduler.stop(timeout=0)
+    if event_relay is not None:
+        event_relay.stop()
+    broker.close()
+
+
+@scheduler.add_job
+def rebuild_live_queue():
+    """Reload the in-memory live queue for today, reporting any drift from the database first."""
+    if not queue_engine.ENABLED:
+        return
+    try:
+        with db_connection() as conn:
+            if live_queue.is_current():
+                drift = live_queue.check(conn)
+                if not drift["consistent"]:
+                    print(f"⚠️ Live queue drifted from the database: {len(drift['missing'])} missing, "
+                          f"{len(drift['extra'])} extra, {len(drift['mismatched'])} mismatched")
+            live_queue.rebuild(conn)
+    except (DatabaseUnavailable, RuntimeError) as e:
+        print(f"❌ Cannot rebuild live queue: {e}")
+
+
+def _sync_live_queue_many(conn, a_ids):
+    """_sync_live_queue() for a bulk write: one query for all the appointments."""
+    if not a_ids or not live_queue.is_current():
+        return
+    try:
+        live_queue.refresh_appointments(conn, a_ids)
+    except Exception as e:
+        print(f"❌ Error updating live queue for {len(a_ids)} appointment(s): {e}")
+
+
+def _sync_live_queue(conn, a_id, removed=False):
+    """Apply a committed change to one appointment to the in-memory live queue."""
+    if not live_queue.is_current():
+        return
+    try:
+        if removed:
+            live_queue.remove(a_id)
+        else:
+            live_queue.refresh_appointment(conn, a_id)
+    except Exception as e:
+        # The change is committed; the next slot-boundary rebuild picks it up
+        print(f"❌ Error updating live queue for appointment {a_id}: {e}")
+
+
+@scheduler.add_job
+def expire_slot_availability():
+    """Cached availability hides past slots, so it goes stale when a slot starts."""
+    response_cache.bump_prefix("slots:")
+
+
+@scheduler.add_job
+def sweep_expired_otps():
+    otp_store.sweep()
+
+
+# Relayed, one announcement reaches every worker; otherwise each tells its own streams
+@scheduler.add_job(shared=event_relay is not None)
+def announce_slot_rollover():
+    """Tell every live dashboard that the current slot changed."""
+    broker.publish({"queue", "broadcast"}, {"type": "slot_rollover", "slot_start": current_slot_start().isoformat()})
+
+
+@scheduler.add_job(shared=True)
+def prune_queue_events():
+    if event_relay is None:
+        return
+    with db_connection() as conn:
+        events.prune_relayed_events(conn)
+
+
+# ----------------------------
+# LIVE QUEUE EVENTS (Server-Sent Events)
+# ----------------------------
+def _publish_queue_change(kind, a_id=None, d_id=None, p_id=None, day=None, appt_time=None):
+    """Push an appointment/queue change to subscribed dashboards (call after commit)."""
+    appt_time = as_time(appt_time) if appt_time is not None else None
+    day = as_date(day)
+    slot_start = slot_start_for(appt_time) if appt_time else None
+    broker.publish(queue_topics(d_id, p_id, day, slot_start), {
+        "type": kind,
+        "a_id": a_id,
+        "d_id": d_id,
+        "p_id": p_id,
+        "date": day.isoformat() if day else None,
+        "time": appt_time.strftime("%H:%M") if appt_time else None,
+    })
+
+
+@app.route("/events/queue", methods=["GET"])
+def queue_events():
+    """Stream queue changes as Server-Sent Events.
+
+    Query params: doctor=<d_id>, patient=<p_id>, slot=<d_id>:<YYYY-MM-DD>T<HH:MM>
+    (repeatable) narrow the stream to changes matching any of them; with none
+    of them every change is sent. Slot rollovers are always sent. Clients
+    refetch their view when an event arrives.
+
+    Each stream holds a worker thread while it is open. server.py adds
+    MEDIQUEUE_MAX_EVENT_STREAMS threads per worker for them; past that many
+    the request is refused with 503 and the client falls back to polling
+    (async_app.py serves this route without a thread per stream).
+    """
+    if broker.full:
+        response = jsonify({"error": "Too many open event streams, poll instead"})
+        response.headers["Retry-After"] = "60"
+        return response, 503
+
+    last_id = request.headers.get("Last-Event-ID", type=int)
+    return Response(
+        broker.stream(subscription_topics(request.args), last_id),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 # ----------------------------
@@ -140,46 +335,39 @@ def home():
     return jsonify({"message": "✅ MediQueue API is running successfully!"})
 
 
+@app.route("/healthz", methods=["GET"])
+def healthz():
+    """Readiness for load balancers; 503 once this process has started draining."""
+    if draining.is_set():
+        return jsonify({"status": "draining", "pid": os.getpid()}), 503
+    return jsonify({"status": "ok", "pid": os.getpid()})
+
+
 # ----------------------------
 # LOGIN & REGISTRATION
 # ----------------------------
-otp_storage = {}  # {contact: otp}
+otp_store = create_otp_store()  # see otp_store.py; use MEDIQUEUE_OTP_STORE=sqlite with several workers
 
 @app.route("/send_otp", methods=["POST"])
 def send_otp():
     data = request.json
     contact = data.get("contact")
 
-    conn = get_connection()
-    if not conn:
-        return jsonify({"error": "Database connection failed"}), 500
-
-    cursor = conn.cursor(dictionary=True)
-
-    # Check contact across patient, doctor, admin
-    user_role = None
-    user_id = None
-    for table, role, id_field in [
-        ("patient", "patient", "p_id"),
-        ("doctor", "doctor", "d_id"),
-        ("admin", "admin", "admin_id")
-    ]:
-        cursor.execute(f"SELECT {id_field} FROM {table} WHERE contact = %s", (contact,))
-        row = cursor.fetchone()
-        if row:
-            user_role = role
-            user_id = row[id_field]
-            break
-
-    cursor.close()
-    conn.close()
+    with db_connection() as conn:
+        directory.ensure_directory(conn)
+        cursor = conn.cursor()
+        # One primary-key lookup across patients, doctors and admins (see directory.py)
+        found = directory.lookup(cursor, contact)
+        cursor.close()
 
+    user_role, user_id = found or (None, None)
     if not user_role:
         return jsonify({"error": "No user found with this contact. Please register first."}), 404
 
     otp = random.randint(1000, 9999)
-    otp_storage[contact] = otp
-    print(f"DEBUG → OTP for {contact} ({user_role}): {otp}")
+    otp_store.put(contact, otp)
+    # No SMS gateway yet: the OTP only reaches the console (MEDIQUEUE_LOG_LEVEL=DEBUG)
+    log.debug("OTP for %s (%s): %s", contact, user_role, otp, extra={"always": True})
     return jsonify({"message": "OTP sent successfully", "role": user_role, "id": user_id})
 
 
@@ -189,29 +377,37 @@ def verify_otp():
     contact = data.get("contact")
     otp = int(data.get("otp", 0))
 
-    if otp_storage.get(contact) == otp:
-        del otp_storage[contact]
+    if otp_store.consume(contact, otp):
         return jsonify({"message": "OTP verified successfully!"})
     else:
         return jsonify({"error": "Invalid OTP!"}), 400
 
 
+def _contact_taken_error(taken):
+    return jsonify({"error": "Contact already registered", "details": {"role": taken.role}}), 409
+
+
 @app.route("/register", methods=["POST"])
 def register_patient():
     data = request.json
-    conn = get_connection()
-    if not conn:
-        return jsonify({"error": "Database connection failed"}), 500
-
-    cursor = conn.cursor()
-    sql = """INSERT INTO patient (p_name, age, gender, contact)
-             VALUES (%s, %s, %s, %s)"""
-    values = (data["p_name"], data["age"], data["gender"], data["contact"])
-    cursor.execute(sql, values)
-    conn.commit()
-    cursor.close()
-    conn.close()
+    with db_connection() as conn:
+        directory.ensure_directory(conn)
+        cursor = conn.cursor()
+        try:
+            directory.check_available(cursor, "patient", data["contact"])
+            sql = """INSERT INTO patient (p_name, age, gender, contact)
+                     VALUES (%s, %s, %s, %s)"""
+            values = (data["p_name"], data["age"], data["gender"], data["contact"])
+            cursor.execute(sql, values)
+            directory.upsert(cursor, "patient", cursor.lastrowid, data["contact"])
+        except directory.ContactTaken as taken:
+            conn.rollback()
+            return _contact_taken_error(taken)
+        finally:
+            cursor.close()
+        conn.commit()
 
+    response_cache.bump("patients")
     return jsonify({"message": "Registration successful!"})
 
 
@@ -220,22 +416,22 @@ def register_patient():
 # ----------------------------
 @app.route("/patients", methods=["GET"])
 def get_patients():
-    conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM patient")
-    data = convert_dates(cursor.fetchall())
-    cursor.close()
-    conn.close()
-    return jsonify(data)
+    """List patients. Supports ?limit=&after= keyset pagination (see pagination.py)."""
+    with db_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        rows, next_cursor = fetch_page(cursor, "SELECT * FROM patient", Keyset(("p_id", "ASC", "p_id")))
+        data = serialize(rows, cursor.description)
+        cursor.close()
+    return page_response(data, next_cursor)
 
 @app.route("/patients/<int:p_id>", methods=["GET"])
+@response_cache.cached("patients")
 def get_patient_by_id(p_id):
-    conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM patient WHERE p_id=%s", (p_id,))
-    patient = cursor.fetchone()
-    cursor.close()
-    conn.close()
+    with db_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute("SELECT * FROM patient WHERE p_id=%s", (p_id,))
+        patient = cursor.fetchone()
+        cursor.close()
     if not patient:
         return jsonify({"error": "Patient not found"}), 404
     return jsonify(patient)
@@ -244,75 +440,76 @@ def get_patient_by_id(p_id):
 @app.route("/patients/<int:p_id>", methods=["PUT"])
 def update_patient(p_id):
     data = request.json
-    conn = get_connection()
-    cursor = conn.cursor()
-    sql = """UPDATE patient
-             SET p_name=%s, age=%s, gender=%s, contact=%s, address=%s
-             WHERE p_id=%s"""
-    values = (data["p_name"], data["age"], data["gender"], data["contact"], data["address"], p_id)
-    cursor.execute(sql, values)
-    conn.commit()
-    cursor.close()
-    conn.close()
+    with db_connection() as conn:
+        directory.ensure_directory(conn)
+        cursor = conn.cursor()
+        try:
+            directory.check_available(cursor, "patient", data["contact"], p_id)
+            sql = """UPDATE patient
+                     SET p_name=%s, age=%s, gender=%s, contact=%s, address=%s
+                     WHERE p_id=%s"""
+            values = (data["p_name"], data["age"], data["gender"], data["contact"], data["address"], p_id)
+            cursor.execute(sql, values)
+            if cursor.rowcount:
+                directory.upsert(cursor, "patient", p_id, data["contact"])
+        except directory.ContactTaken as taken:
+            conn.rollback()
+            return _contact_taken_error(taken)
+        finally:
+            cursor.close()
+        conn.commit()
+    response_cache.bump("patients")
     return jsonify({"message": "Patient updated successfully!"})
 
 
 @app.route("/patients/<int:p_id>", methods=["DELETE"])
 def delete_patient(p_id):
-    conn = get_connection()
-    if not conn:
-        return jsonify({"error": "Database connection failed"}), 500
-    
-    cursor = conn.cursor(dictionary=True)
-    try:
-        # Check if patient exists
-        cursor.execute("SELECT p_id FROM patient WHERE p_id = %s", (p_id,))
-        patient = cursor.fetchone()
-        if not patient:
-            cursor.close()
-            conn.close()
-            return jsonify({"error": "Patient not found"}), 404
+    with db_connection() as conn:
+        directory.ensure_directory(conn)
+        cursor = conn.cursor(dictionary=True)
+        try:
+            # Check if patient exists
+            cursor.execute("SELECT p_id FROM patient WHERE p_id = %s", (p_id,))
+            patient = cursor.fetchone()
+            if not patient:
+                cursor.close()
+                return jsonify({"error": "Patient not found"}), 404
         
-        # Check if patient has appointments
-        cursor.execute("SELECT a_id FROM appointment WHERE p_id = %s LIMIT 1", (p_id,))
-        appointment = cursor.fetchone()
-        if appointment:
-            cursor.close()
-            conn.close()
-            return jsonify({"error": "Cannot delete patient with existing appointments"}), 400
+            # Check if patient has appointments
+            cursor.execute("SELECT a_id FROM appointment WHERE p_id = %s LIMIT 1", (p_id,))
+            appointment = cursor.fetchone()
+            if appointment:
+                cursor.close()
+                return jsonify({"error": "Cannot delete patient with existing appointments"}), 400
         
-        # Delete the patient
-        cursor.execute("DELETE FROM patient WHERE p_id = %s", (p_id,))
-        conn.commit()
-        cursor.close()
-        conn.close()
-        return jsonify({"message": "Patient deleted successfully!"})
-    except Exception as e:
-        print("❌ Error deleting patient:", e)
-        conn.rollback()
-        cursor.close()
-        conn.close()
-        return jsonify({"error": f"Failed to delete patient: {str(e)}"}), 500
+            # Delete the patient
+            cursor.execute("DELETE FROM patient WHERE p_id = %s", (p_id,))
+            directory.remove(cursor, "patient", p_id)
+            conn.commit()
+            cursor.close()
+            response_cache.bump("patients")
+            return jsonify({"message": "Patient deleted successfully!"})
+        except Exception as e:
+            print("❌ Error deleting patient:", e)
+            conn.rollback()
+            cursor.close()
+            return jsonify({"error": f"Failed to delete patient: {str(e)}"}), 500
 
 @app.route("/health_records/<int:patient_id>", methods=["GET"])
 def get_health_records(patient_id):
-    conn = get_connection()
-    if not conn:
-        return jsonify({"error": "Database connection failed"}), 500
-
-    cursor = conn.cursor(dictionary=True)
-    sql = """
-        SELECT a.date, d.d_name AS doctor, h.symptoms, h.prescription
-        FROM health_record h
-        JOIN appointment a ON h.appointment_id = a.appointment_id
-        JOIN doctor d ON a.doctor_id = d.doctor_id
-        WHERE a.patient_id = %s
-        ORDER BY a.date DESC
-    """
-    cursor.execute(sql, (patient_id,))
-    data = cursor.fetchall()
-    cursor.close()
-    conn.close()
+    with db_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        sql = """
+            SELECT a.date, d.d_name AS doctor, h.symptoms, h.prescription
+            FROM health_record h
+            JOIN appointment a ON h.appointment_id = a.appointment_id
+            JOIN doctor d ON a.doctor_id = d.doctor_id
+            WHERE a.patient_id = %s
+            ORDER BY a.date DESC
+        """
+        cursor.execute(sql, (patient_id,))
+        data = cursor.fetchall()
+        cursor.close()
 
     return jsonify(data)
 
@@ -320,27 +517,35 @@ def get_health_records(patient_id):
 # DOCTOR ROUTES
 # ----------------------------
 @app.route("/doctors", methods=["GET"])
+@response_cache.cached("doctors")
 def get_doctors():
-    conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM doctor")
-    data = convert_dates(cursor.fetchall())
-    cursor.close()
-    conn.close()
+    with db_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute("SELECT * FROM doctor")
+        data = serializer.fetch(cursor)
+        cursor.close()
     return jsonify(data)
 
 
 @app.route("/doctors", methods=["POST"])
 def add_doctor():
     data = request.json
-    conn = get_connection()
-    cursor = conn.cursor()
-    sql = """INSERT INTO doctor (d_name, specialization, availability, contact)
-             VALUES (%s, %s, %s, %s)"""
-    cursor.execute(sql, (data["d_name"], data["specialization"], data["availability"], data["contact"]))
-    conn.commit()
-    cursor.close()
-    conn.close()
+    with db_connection() as conn:
+        directory.ensure_directory(conn)
+        cursor = conn.cursor()
+        try:
+            directory.check_available(cursor, "doctor", data["contact"])
+            sql = """INSERT INTO doctor (d_name, specialization, availability, contact)
+                     VALUES (%s, %s, %s, %s)"""
+            cursor.execute(sql, (data["d_name"], data["specialization"], data["availability"], data["contact"]))
+            directory.upsert(cursor, "doctor", cursor.lastrowid, data["contact"])
+        except directory.ContactTaken as taken:
+            conn.rollback()
+            return _contact_taken_error(taken)
+        finally:
+            cursor.close()
+        conn.commit()
+    response_cache.bump("doctors")
     return jsonify({"message": "Doctor added successfully!"})
 
 
@@ -348,133 +553,120 @@ def add_doctor():
 # ADMIN ROUTES
 # ----------------------------
 @app.route("/admins", methods=["GET"])
+@response_cache.cached("admins")
 def get_admins():
-    conn = get_connection()
-    if not conn:
-        return jsonify({"error": "Database connection failed"}), 500
-    
-    cursor = conn.cursor(dictionary=True)
-    try:
-        # Check if admin table exists, if not create it and add default admin
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS admin (
-                admin_id INT AUTO_INCREMENT PRIMARY KEY,
-                admin_name VARCHAR(100) NOT NULL,
-                contact VARCHAR(10) NOT NULL UNIQUE,
-                CHECK (contact REGEXP '^[0-9]{10}$')
-            )
-        """)
-        
-        # Check if admin exists, if not add default admin
-        cursor.execute("SELECT admin_id FROM admin WHERE contact = '1234567890'")
-        admin_exists = cursor.fetchone()
-        if not admin_exists:
+    with db_connection() as conn:
+        directory.ensure_directory(conn)
+        cursor = conn.cursor(dictionary=True)
+        try:
+            # Check if admin table exists, if not create it and add default admin
             cursor.execute("""
-                INSERT INTO admin (admin_name, contact)
-                VALUES ('System Admin', '1234567890')
+                CREATE TABLE IF NOT EXISTS admin (
+                    admin_id INT AUTO_INCREMENT PRIMARY KEY,
+                    admin_name VARCHAR(100) NOT NULL,
+                    contact VARCHAR(10) NOT NULL UNIQUE,
+                    CHECK (contact REGEXP '^[0-9]{10}$')
+                )
             """)
-            conn.commit()
         
-        cursor.execute("SELECT * FROM admin")
-        data = convert_dates(cursor.fetchall())
-        cursor.close()
-        conn.close()
-        return jsonify(data)
-    except Exception as e:
-        print("❌ Error fetching admins:", e)
-        cursor.close()
-        conn.close()
-        return jsonify({"error": f"Failed to fetch admins: {str(e)}"}), 500
+            # Check if admin exists, if not add default admin
+            cursor.execute("SELECT admin_id FROM admin WHERE contact = '1234567890'")
+            admin_exists = cursor.fetchone()
+            if not admin_exists:
+                cursor.execute("""
+                    INSERT INTO admin (admin_name, contact)
+                    VALUES ('System Admin', '1234567890')
+                """)
+                directory.upsert(cursor, "admin", cursor.lastrowid, "1234567890")
+                conn.commit()
+        
+            cursor.execute("SELECT * FROM admin")
+            data = serializer.fetch(cursor)
+            cursor.close()
+            return jsonify(data)
+        except Exception as e:
+            print("❌ Error fetching admins:", e)
+            cursor.close()
+            return jsonify({"error": f"Failed to fetch admins: {str(e)}"}), 500
 
 @app.route("/doctors/<int:d_id>", methods=["DELETE"])
 def delete_doctor(d_id):
-    conn = get_connection()
-    if not conn:
-        return jsonify({"error": "Database connection failed"}), 500
-    
-    cursor = conn.cursor(dictionary=True)
-    try:
-        # Check if doctor exists
-        cursor.execute("SELECT d_id FROM doctor WHERE d_id = %s", (d_id,))
-        doctor = cursor.fetchone()
-        if not doctor:
-            cursor.close()
-            conn.close()
-            return jsonify({"error": "Doctor not found"}), 404
+    with db_connection() as conn:
+        directory.ensure_directory(conn)
+        cursor = conn.cursor(dictionary=True)
+        try:
+            # Check if doctor exists
+            cursor.execute("SELECT d_id FROM doctor WHERE d_id = %s", (d_id,))
+            doctor = cursor.fetchone()
+            if not doctor:
+                cursor.close()
+                return jsonify({"error": "Doctor not found"}), 404
         
-        # Check if doctor has appointments
-        cursor.execute("SELECT a_id FROM appointment WHERE d_id = %s LIMIT 1", (d_id,))
-        appointment = cursor.fetchone()
-        if appointment:
-            cursor.close()
-            conn.close()
-            return jsonify({"error": "Cannot delete doctor with existing appointments"}), 400
+            # Check if doctor has appointments
+            cursor.execute("SELECT a_id FROM appointment WHERE d_id = %s LIMIT 1", (d_id,))
+            appointment = cursor.fetchone()
+            if appointment:
+                cursor.close()
+                return jsonify({"error": "Cannot delete doctor with existing appointments"}), 400
         
-        # Delete the doctor
-        cursor.execute("DELETE FROM doctor WHERE d_id = %s", (d_id,))
-        conn.commit()
-        cursor.close()
-        conn.close()
-        return jsonify({"message": "Doctor deleted successfully!"})
-    except Exception as e:
-        print("❌ Error deleting doctor:", e)
-        conn.rollback()
-        cursor.close()
-        conn.close()
-        return jsonify({"error": f"Failed to delete doctor: {str(e)}"}), 500
+            # Delete the doctor
+            cursor.execute("DELETE FROM doctor WHERE d_id = %s", (d_id,))
+            directory.remove(cursor, "doctor", d_id)
+            conn.commit()
+            cursor.close()
+            response_cache.bump("doctors", f"slots:{d_id}")
+            return jsonify({"message": "Doctor deleted successfully!"})
+        except Exception as e:
+            print("❌ Error deleting doctor:", e)
+            conn.rollback()
+            cursor.close()
+            return jsonify({"error": f"Failed to delete doctor: {str(e)}"}), 500
 
 
 # ----------------------------
 # APPOINTMENT ROUTES
 # ----------------------------
 
+# Filters shared by the appointment and queue listings: ?date_from=&date_to=&doctor=&patient=&status=
+APPOINTMENT_FILTERS = {
+    "date_from": ("a.date >= %s", parse_date_arg),
+    "date_to": ("a.date <= %s", parse_date_arg),
+    "doctor": ("a.d_id = %s", parse_int_arg),
+    "patient": ("a.p_id = %s", parse_int_arg),
+    "status": ("a.{a_status} = %s", None),
+}
+APPOINTMENT_KEYSET = Keyset(("a.date", "ASC", "date"), ("a.time", "ASC", "time"), ("a.a_id", "ASC", "id"))
+
+
 @app.route("/appointments", methods=["GET"])
 def get_appointments():
-    # Auto-complete past appointments before fetching
-    auto_complete_past_appointments()
-    
+    """List appointments. Supports the APPOINTMENT_FILTERS and ?limit=&after= pagination."""
     try:
-        conn = mysql.connector.connect(
-            host="localhost",
-            user="root",
-            password="root",
-            database="clinic"
-        )
-        cursor = conn.cursor()
-
-        cursor.execute("""
-            SELECT 
-                a.a_id AS id,
-                p.p_name AS patient,
-                d.d_name AS doctor,
-                DATE(a.date) AS date,       -- ✅ only date part
-                a.time AS time,
-                a.status AS status,
-                COALESCE(q.token_no, 0) AS token_no
-            FROM appointment a
-            JOIN patient p ON a.p_id = p.p_id
-            JOIN doctor d ON a.d_id = d.d_id
-            LEFT JOIN queue q ON a.a_id = q.a_id
-            ORDER BY a.date ASC, a.time ASC, q.token_no ASC;
-        """)
-
-        rows = cursor.fetchall()
-        cols = [desc[0] for desc in cursor.description]
-
-        data = []
-        for row in rows:
-            row_dict = {}
-            for col, val in zip(cols, row):
-                # Convert all non-serializable types to strings
-                if isinstance(val, (datetime, timedelta, date, time)):
-                    val = str(val)
-                row_dict[col] = val
-            data.append(row_dict)
+        with db_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+
+            rows, next_cursor = fetch_page(cursor, schema.sql(conn, """
+                SELECT 
+                    a.a_id AS id,
+                    p.p_name AS patient,
+                    d.d_name AS doctor,
+                    DATE(a.date) AS date,       -- ✅ only date part
+                    a.time AS time,
+                    a.{a_status} AS status,
+                    COALESCE(q.token_no, 0) AS token_no
+                FROM appointment a
+                JOIN patient p ON a.p_id = p.p_id
+                JOIN doctor d ON a.d_id = d.d_id
+                LEFT JOIN queue q ON a.a_id = q.a_id
+            """), APPOINTMENT_KEYSET, build_filters(APPOINTMENT_FILTERS, schema.columns(conn)))
+
+            data = serialize(rows, cursor.description)
+            cursor.close()
 
-        cursor.close()
-        conn.close()
+            return page_response(data, next_cursor)
 
-        return jsonify(data)
+    except PageError as e:
+        return jsonify({"error": str(e)}), 400
 
     except Exception as e:
         print("❌ Error fetching appointments:", e)
@@ -484,234 +676,266 @@ def get_appointments():
 @app.route("/appointments", methods=["POST"])
 def add_appointment():
     data = request.json
-    conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
+    with db_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
     
-    # Real-time validation: Prevent booking appointments in the past
-    try:
-        appointment_date = datetime.strptime(data["date"], "%Y-%m-%d").date()
-        appointment_time_str = data.get("time", "")
+        # Real-time validation: Prevent booking appointments in the past
+        try:
+            appointment_date = datetime.strptime(data["date"], "%Y-%m-%d").date()
+            appointment_time_str = data.get("time", "")
         
-        # Parse time - handle both H:M and H:M:S formats
-        if isinstance(appointment_time_str, str):
-            try:
-                appointment_time = datetime.strptime(appointment_time_str, "%H:%M").time()
-            except ValueError:
-                appointment_time = datetime.strptime(appointment_time_str, "%H:%M:%S").time()
-        else:
-            appointment_time = appointment_time_str
-    except (ValueError, KeyError) as e:
-        cursor.close()
-        conn.close()
-        return jsonify({"error": f"Invalid date or time format: {str(e)}"}), 400
+            # Parse time - handle both H:M and H:M:S formats
+            if isinstance(appointment_time_str, str):
+                try:
+                    appointment_time = datetime.strptime(appointment_time_str, "%H:%M").time()
+                except ValueError:
+                    appointment_time = datetime.strptime(appointment_time_str, "%H:%M:%S").time()
+            else:
+                appointment_time = appointment_time_str
+        except (ValueError, KeyError) as e:
+            cursor.close()
+            return jsonify({"error": f"Invalid date or time format: {str(e)}"}), 400
 
-    # Real-time validation: Prevent booking in the past
-    now = datetime.now()
-    appointment_datetime = datetime.combine(appointment_date, appointment_time)
+        # Real-time validation: Prevent booking in the past
+        now = datetime.now()
+        appointment_datetime = datetime.combine(appointment_date, appointment_time)
     
-    # Only validate for Scheduled/Waiting appointments (allow past for Completed)
-    appointment_status = data.get("a_status") or data.get("status", "Scheduled")
-    if appointment_status in ["Scheduled", "Waiting"] and appointment_datetime < now:
-        cursor.close()
-        conn.close()
-        return jsonify({
-            "error": "Cannot create appointment in the past",
-            "details": {
-                "requested_datetime": appointment_datetime.isoformat(),
-                "current_datetime": now.isoformat()
-            }
-        }), 400
+        # Only validate for Scheduled/Waiting appointments (allow past for Completed)
+        appointment_status = data.get("a_status") or data.get("status", "Scheduled")
+        if appointment_status in ["Scheduled", "Waiting"] and appointment_datetime < now:
+            cursor.close()
+            return jsonify({
+                "error": "Cannot create appointment in the past",
+                "details": {
+                    "requested_datetime": appointment_datetime.isoformat(),
+                    "current_datetime": now.isoformat()
+                }
+            }), 400
     
-    sql = """INSERT INTO appointment (p_id, d_id, date, time, priority, a_status)
-             VALUES (%s, %s, %s, %s, %s, %s)"""
-    cursor.execute(sql, (data["p_id"], data["d_id"], data["date"], data["time"], data.get("priority"), appointment_status))
-    conn.commit()
-
-    cursor.execute("SELECT LAST_INSERT_ID() as a_id")
-    a_id = cursor.fetchone()["a_id"]
-
-    cursor.execute("SELECT payment_status FROM billing WHERE a_id=%s", (a_id,))
-    bill = cursor.fetchone()
-    if bill and bill["payment_status"].lower() == "paid":
-        cursor.execute("INSERT INTO queue (a_id, q_status) VALUES (%s, %s)", (a_id, "Waiting"))
+        # Active appointments take their slot capacity in the same transaction as the INSERT,
+        # so complete/delete releasing it later keeps the counter in step with occupancy
+        token_no = None
+        if appointment_status in ["Scheduled", "Waiting"]:
+            try:
+                token_no = claim_slot(conn, cursor, data["d_id"], appointment_date, appointment_time)
+            except SlotFull as full:
+                conn.rollback()
+                cursor.close()
+                return _slot_full_response(full)
+
+        sql = schema.sql(conn, """INSERT INTO appointment (p_id, d_id, date, time, priority, {a_status})
+                 VALUES (%s, %s, %s, %s, %s, %s)""")
+        cursor.execute(sql, (data["p_id"], data["d_id"], data["date"], data["time"], data.get("priority"), appointment_status))
+        a_id = cursor.lastrowid
+
+        cursor.execute("SELECT payment_status FROM billing WHERE a_id=%s", (a_id,))
+        bill = cursor.fetchone()
+        if bill and bill["payment_status"].lower() == "paid":
+            if token_no is None:
+                token_no = allocate_token(conn, cursor, data["d_id"], appointment_date, appointment_time)
+            cursor.execute(
+                schema.sql(conn, "INSERT INTO queue (a_id, token_no, {q_status}) VALUES (%s, %s, %s)"),
+                (a_id, token_no, "Waiting"),
+            )
         conn.commit()
 
-    cursor.close()
-    conn.close()
-    return jsonify({"message": "Appointment created successfully!"})
+        cursor.close()
+        _sync_live_queue(conn, a_id)
+        response_cache.bump(f"slots:{data['d_id']}")
+        return jsonify({"message": "Appointment created successfully!"})
 
 @app.route("/appointments/<int:a_id>/complete", methods=["POST"])
 def complete_appointment(a_id):
-    conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
+    with db_connection() as conn:
+        ensure_reservation_table(conn)
+        cursor = conn.cursor(dictionary=True)
 
-    # Fetch appointment details
-    cursor.execute("SELECT date, time, status FROM appointment WHERE a_id=%s", (a_id,))
-    appointment = cursor.fetchone()
+        # Fetch appointment details
+        cursor.execute(
+            schema.sql(conn, "SELECT p_id, d_id, date, time, {a_status} AS status FROM appointment WHERE a_id=%s"),
+            (a_id,),
+        )
+        appointment = cursor.fetchone()
 
-    if not appointment:
-        cursor.close()
-        conn.close()
-        return jsonify({"error": "Appointment not found"}), 404
+        if not appointment:
+            cursor.close()
+            return jsonify({"error": "Appointment not found"}), 404
 
-    if appointment["status"] == "Completed":
-        cursor.close()
-        conn.close()
-        return jsonify({"message": "Appointment already completed"}), 400
-
-    # Convert time if it's a timedelta
-    appt_time = appointment["time"]
-    if isinstance(appt_time, timedelta):
-        total_seconds = appt_time.total_seconds()
-        hours = int(total_seconds // 3600)
-        minutes = int((total_seconds % 3600) // 60)
-        seconds = int(total_seconds % 60)
-        appt_time = time(hours, minutes, seconds)
-
-    # Combine date and time
-    appointment_datetime = datetime.combine(appointment["date"], appt_time)
-    current_time = datetime.now()
-
-    # Prevent marking before actual time
-    if current_time < appointment_datetime:
-        cursor.close()
-        conn.close()
-        return jsonify({"error": "Appointment cannot be marked as completed before scheduled time"}), 400
+        if appointment["status"] == "Completed":
+            cursor.close()
+            return jsonify({"message": "Appointment already completed"}), 400
 
-    # Update status
-    cursor.execute("UPDATE appointment SET status='Completed' WHERE a_id=%s", (a_id,))
+        appt_time = as_time(appointment["time"])
 
-    try:
-        queue_status_column = _get_queue_status_column(conn)
-        cursor.execute(
-            f"UPDATE queue SET {queue_status_column}=%s WHERE a_id=%s",
-            ("Completed", a_id),
-        )
-    except RuntimeError:
-        # Queue table might not exist; ignore gracefully
-        pass
+        # Combine date and time
+        appointment_datetime = datetime.combine(appointment["date"], appt_time)
+        current_time = datetime.now()
 
-    conn.commit()
+        # Prevent marking before actual time
+        if current_time < appointment_datetime:
+            cursor.close()
+            return jsonify({"error": "Appointment cannot be marked as completed before scheduled time"}), 400
 
-    cursor.close()
-    conn.close()
-    return jsonify({"message": "Appointment marked as completed"}), 200
+        # Update status
+        cursor.execute(schema.sql(conn, "UPDATE appointment SET {a_status}='Completed' WHERE a_id=%s"), (a_id,))
+        if appointment["status"] in ("Scheduled", "Waiting"):
+            release_slot(cursor, appointment["d_id"], appointment["date"], appt_time)
+        cursor.execute(schema.sql(conn, "UPDATE queue SET {q_status}=%s WHERE a_id=%s"), ("Completed", a_id))
 
-@app.route("/book_appointment", methods=["POST"])
-def book_appointment():
-    data = request.json
-    conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
+        conn.commit()
+
+        cursor.close()
+        _sync_live_queue(conn, a_id, removed=True)
+        response_cache.bump(f"slots:{appointment['d_id']}")
+        _publish_queue_change("completed", a_id, appointment["d_id"], appointment["p_id"], appointment["date"], appt_time)
+        return jsonify({"message": "Appointment marked as completed"}), 200
 
-    # Validate date and time format
+def _parse_booking(data, now):
+    """Validate one booking; return ((p_id, d_id, date, time), None) or (None, error body)."""
     try:
+        p_id, d_id = int(data["p_id"]), int(data["d_id"])
         appointment_date = datetime.strptime(data["date"], "%Y-%m-%d").date()
-        requested_time = datetime.strptime(data["time"], "%H:%M").time()
-    except ValueError:
-        try:
-            requested_time = datetime.strptime(data["time"], "%H:%M:%S").time()
-        except ValueError:
-            cursor.close()
-            conn.close()
-            return jsonify({"error": "Invalid date or time format"}), 400
+        requested_time = as_time(data["time"])
+    except (KeyError, TypeError, ValueError):
+        requested_time = None
+    if requested_time is None:
+        return None, {"error": "Invalid date or time format"}
 
     # Real-time validation: Prevent booking in the past
-    now = datetime.now()
     appointment_datetime = datetime.combine(appointment_date, requested_time)
-    
     if appointment_datetime < now:
-        cursor.close()
-        conn.close()
-        return jsonify({
+        return None, {
             "error": "Cannot book appointment in the past",
             "details": {
                 "requested_datetime": appointment_datetime.isoformat(),
                 "current_datetime": now.isoformat()
             }
-        }), 400
-
-    # Normalize requested time to 30-min slot window [slot_start, slot_end)
-    slot_minute = 0 if requested_time.minute < 30 else 30
-    slot_start = time(requested_time.hour, slot_minute, 0)
-    # Compute slot_end
-    slot_start_dt = datetime.combine(appointment_date, slot_start)
-    slot_end_dt = slot_start_dt + timedelta(minutes=30)
-    slot_end = slot_end_dt.time()
-
-    # Count existing bookings in the same half-hour slot for the doctor
-    cursor.execute(
-        """
-        SELECT COUNT(*) AS cnt
-        FROM appointment
-        WHERE d_id = %s
-          AND date = %s
-          AND time >= %s AND time < %s
-          AND status IN ('Scheduled','Waiting')
-        """,
-        (data["d_id"], data["date"], slot_start, slot_end),
-    )
-    count_row = cursor.fetchone()
-    existing_in_slot = count_row["cnt"] if count_row else 0
+        }
+    return (p_id, d_id, appointment_date, requested_time), None
 
-    if existing_in_slot >= 5:
-        cursor.close()
-        conn.close()
-        return jsonify({
-            "error": "Selected time slot is full",
-            "details": {
-                "slot_start": slot_start.strftime("%H:%M"),
-                "slot_end": slot_end.strftime("%H:%M"),
-                "capacity": 5
-            }
-        }), 400
 
-    # Proceed with booking
-    sql = """INSERT INTO appointment (p_id, d_id, date, time, status)
-             VALUES (%s, %s, %s, %s, %s)"""
-    values = (data["p_id"], data["d_id"], data["date"], data["time"], "Scheduled")
-    cursor.execute(sql, values)
-    
-    # Get the appointment ID
-    a_id = cursor.lastrowid
-    
-    # Add to queue table with Waiting status
-    try:
-        # Get the next token number for this time slot (not for the entire date)
-        # This ensures the first appointment in each time slot gets token 1 for that slot
-        cursor.execute("""
-            SELECT COALESCE(MAX(q.token_no), 0) + 1 AS next_token
-            FROM queue q
-            JOIN appointment a ON q.a_id = a.a_id
-            WHERE a.date = %s
-              AND a.time >= %s 
-              AND a.time < %s
-              AND a.status IN ('Scheduled', 'Waiting')
-        """, (appointment_date, slot_start, slot_end))
-        token_result = cursor.fetchone()
-        token_no = token_result["next_token"] if token_result else 1
-        
-        cursor.execute("""
-            INSERT INTO queue (a_id, token_no, status)
-            VALUES (%s, %s, 'Waiting')
-        """, (a_id, token_no))
-    except Exception as e:
-        # If queue table doesn't exist or has issues, continue without it
-        print(f"Note: Could not add to queue: {e}")
-    
-    conn.commit()
-    cursor.close()
-    conn.close()
+SLOT_FULL_STATUS = 409  # every booking route refuses a full slot with this
+
 
-    return jsonify({"message": "Appointment booked successfully!"})
+def _slot_full_error(full):
+    return {
+        "error": "Selected time slot is full",
+        "details": {
+            "slot_start": full.slot_start.strftime("%H:%M"),
+            "slot_end": full.slot_end.strftime("%H:%M"),
+            "capacity": full.capacity
+        }
+    }
+
+
+def _slot_full_response(full):
+    return jsonify(_slot_full_error(full)), SLOT_FULL_STATUS
+
+
+@app.route("/book_appointment", methods=["POST"])
+def book_appointment():
+    booking, error = _parse_booking(request.json or {}, datetime.now())
+    if error:
+        return jsonify(error), 400
+    p_id, d_id, appointment_date, requested_time = booking
+
+    # Capacity check, appointment insert and token assignment happen atomically
+    # against the slot's reservation counter (see reservations.py)
+    with db_connection() as conn:
+        try:
+            a_id, token_no = reserve_and_book(conn, p_id, d_id, appointment_date, requested_time)
+        except SlotFull as full:
+            return _slot_full_response(full)
+        _sync_live_queue(conn, a_id)
+
+    response_cache.bump(f"slots:{d_id}")
+    _publish_queue_change("booked", a_id, d_id, p_id, appointment_date, requested_time)
+    return jsonify({"message": "Appointment booked successfully!", "a_id": a_id, "token_no": token_no})
+
+
+BULK_LIMIT = 500
+
+
+def _existing_ids(cursor, table, column, ids):
+    if not ids:
+        return set()
+    placeholders = ", ".join(["%s"] * len(ids))
+    cursor.execute(f"SELECT {column} FROM {table} WHERE {column} IN ({placeholders})", tuple(ids))
+    return {row[0] for row in cursor.fetchall()}
+
+
+@app.route("/book_appointment/bulk", methods=["POST"])
+def book_appointments_bulk():
+    """Book up to BULK_LIMIT appointments in one transaction.
+
+    Body: {"appointments": [{"p_id", "d_id", "date", "time"}, ...]}. Each item
+    is validated and capacity-checked like /book_appointment; the response has
+    one result per item, in order, and items that fail don't stop the rest.
+    """
+    items = (request.json or {}).get("appointments")
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "Expected a non-empty 'appointments' list"}), 400
+    if len(items) > BULK_LIMIT:
+        return jsonify({"error": f"At most {BULK_LIMIT} appointments per request"}), 400
+
+    now = datetime.now()
+    results = [None] * len(items)
+    valid = []
+    for index, item in enumerate(items):
+        booking, error = _parse_booking(item if isinstance(item, dict) else {}, now)
+        if error:
+            results[index] = {"index": index, "ok": False, **error}
+        else:
+            valid.append((index, booking))
+
+    booked = []
+    if valid:
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                patients = _existing_ids(cursor, "patient", "p_id", {b[0] for _, b in valid})
+                doctors = _existing_ids(cursor, "doctor", "d_id", {b[1] for _, b in valid})
+            finally:
+                cursor.close()
+            to_book = []
+            for index, booking in valid:
+                if booking[0] not in patients:
+                    results[index] = {"index": index, "ok": False, "error": "Patient not found"}
+                elif booking[1] not in doctors:
+                    results[index] = {"index": index, "ok": False, "error": "Doctor not found"}
+                else:
+                    to_book.append((index, booking))
+
+            if to_book:
+                outcomes = reserve_and_book_many(conn, [booking for _, booking in to_book])
+                for (index, booking), outcome in zip(to_book, outcomes):
+                    if isinstance(outcome, SlotFull):
+                        results[index] = {"index": index, "ok": False, "status": SLOT_FULL_STATUS, **_slot_full_error(outcome)}
+                    else:
+                        a_id, token_no = outcome
+                        results[index] = {"index": index, "ok": True, "a_id": a_id, "token_no": token_no}
+                        booked.append((a_id, booking))
+                _sync_live_queue_many(conn, [a_id for a_id, _ in booked])
+
+    for d_id in {booking[1] for _, booking in booked}:
+        response_cache.bump(f"slots:{d_id}")
+    for a_id, (p_id, d_id, appointment_date, requested_time) in booked:
+        _publish_queue_change("booked", a_id, d_id, p_id, appointment_date, requested_time)
+    return jsonify({"booked": len(booked), "failed": len(items) - len(booked), "results": results})
 
 @app.route("/doctors/<int:d_id>/available_slots", methods=["GET"])
+@response_cache.cached(lambda d_id: f"slots:{d_id}")
 def get_available_slots(d_id):
     """Return available half-hour slots for a doctor on a given date.
-    Query params: date=YYYY-MM-DD
+    Query params: date=YYYY-MM-DD, or from=YYYY-MM-DD&to=YYYY-MM-DD for a range
+    of up to 31 days answered in one call.
     Business rule: max 5 appointments per 30-minute slot, counts Scheduled/Waiting.
     Working hours assumed 09:00-17:30.
     Real-time: Filters out past time slots for today.
     """
+    if request.args.get("from") or request.args.get("to"):
+        return _get_available_slots_range(d_id)
+
     query_date = request.args.get("date")
     if not query_date:
         return jsonify({"error": "Missing required query param: date"}), 400
@@ -731,178 +955,256 @@ def get_available_slots(d_id):
             "message": "Cannot book appointments for past dates"
         })
 
-    # Get current time for filtering past slots on today
-    now = datetime.now()
-
-    # Generate half-hour slots from 09:00 to 17:30 (exclusive end 18:00)
-    work_start = datetime.combine(day, time(9, 0, 0))
-    work_end = datetime.combine(day, time(18, 0, 0))
-
-    conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
-
-    available = []
-    current = work_start
-    while current < work_end:
-        slot_start = current.time()
-        slot_end = (current + timedelta(minutes=30)).time()
+    with db_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        counts = fetch_slot_counts(cursor, d_id, day, day, schema.columns(conn))
+        cursor.close()
 
-        # Real-time filtering: Skip past time slots for today
-        if day == today:
-            slot_datetime = datetime.combine(day, slot_start)
-            if slot_datetime < now:
-                current += timedelta(minutes=30)
-                continue
+    return jsonify({
+        "date": query_date,
+        "doctor_id": d_id,
+        "slots": available_slots(day, counts)
+    })
 
-        cursor.execute(
-            """
-            SELECT COUNT(*) AS cnt
-            FROM appointment
-            WHERE d_id = %s
-              AND date = %s
-              AND time >= %s AND time < %s
-              AND status IN ('Scheduled','Waiting')
-            """,
-            (d_id, day, slot_start, slot_end),
-        )
-        row = cursor.fetchone()
-        cnt = row["cnt"] if row else 0
-        if cnt < 5:
-            available.append({
-                "start": slot_start.strftime("%H:%M"),
-                "end": slot_end.strftime("%H:%M"),
-                "remaining": 5 - cnt,
-            })
 
-        current += timedelta(minutes=30)
+def _get_available_slots_range(d_id):
+    """Availability for every day in [from, to] from a single grouped query."""
+    try:
+        start_day = datetime.strptime(request.args.get("from", ""), "%Y-%m-%d").date()
+        end_day = datetime.strptime(request.args.get("to", ""), "%Y-%m-%d").date()
+    except ValueError:
+        return jsonify({"error": "Invalid date range. Use from=YYYY-MM-DD&to=YYYY-MM-DD"}), 400
+
+    if end_day < start_day:
+        return jsonify({"error": "'to' must not be before 'from'"}), 400
+    if (end_day - start_day).days >= MAX_RANGE_DAYS:
+        return jsonify({"error": f"Date range is limited to {MAX_RANGE_DAYS} days"}), 400
+
+    # Past dates never have bookable slots, so don't query them
+    query_start = max(start_day, date.today())
+    counts = {}
+    if query_start <= end_day:
+        with db_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            counts = fetch_slot_counts(cursor, d_id, query_start, end_day, schema.columns(conn))
+            cursor.close()
 
-    cursor.close()
-    conn.close()
+    now = datetime.now()
+    days = []
+    day = start_day
+    while day <= end_day:
+        days.append({"date": day.isoformat(), "slots": available_slots(day, counts, now)})
+        day += timedelta(days=1)
 
     return jsonify({
-        "date": query_date,
         "doctor_id": d_id,
-        "slots": available
+        "from": start_day.isoformat(),
+        "to": end_day.isoformat(),
+        "days": days
     })
 
 @app.route("/all_appointments/<int:patient_id>")
 def all_appointments(patient_id):
-    conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
+    with db_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
 
-    query = """
-        SELECT 
-            a.a_id,
-            a.date,
-            a.time,
-            a.status,
-            d.d_name AS doctor
-        FROM appointment a
-        JOIN doctor d ON a.d_id = d.d_id
-        WHERE a.p_id = %s
-        ORDER BY a.date DESC, a.time DESC;
-    """
-    cursor.execute(query, (patient_id,))
-    result = cursor.fetchall()
+        query = """
+            SELECT 
+                a.a_id,
+                a.date,
+                a.time,
+                a.{a_status} AS status,
+                d.d_name AS doctor
+            FROM appointment a
+            JOIN doctor d ON a.d_id = d.d_id
+        """
+        clauses, params = build_filters({
+            "date_from": ("a.date >= %s", parse_date_arg),
+            "date_to": ("a.date <= %s", parse_date_arg),
+            "doctor": ("a.d_id = %s", parse_int_arg),
+            "status": ("a.{a_status} = %s", None),
+        }, schema.columns(conn))
+        result, next_cursor = fetch_page(
+            cursor,
+            schema.sql(conn, query),
+            Keyset(("a.date", "DESC", "date"), ("a.time", "DESC", "time"), ("a.a_id", "DESC", "a_id")),
+            (["a.p_id = %s"] + clauses, [patient_id] + params),
+        )
 
-    cursor.close()
-    conn.close()
-    return jsonify(result)
+        data = serialize(result, cursor.description)
+        cursor.close()
+        return page_response(data, next_cursor)
+
+
+# One patient's appointments, read through idx_appointment_patient_date (p_id, date, time)
+# so the work grows with that patient's history rather than the whole appointment table.
+PATIENT_APPOINTMENTS_SQL = """
+    SELECT
+        a.a_id AS id,
+        a.d_id,
+        d.d_name AS doctor,
+        a.date,
+        a.time,
+        a.{a_status} AS status,
+        COALESCE(q.token_no, 0) AS token_no
+    FROM appointment a
+    JOIN doctor d ON a.d_id = d.d_id
+    LEFT JOIN queue q ON a.a_id = q.a_id
+"""
+# scope -> (WHERE clause on top of a.p_id, keyset); upcoming runs soonest first, past most recent first
+PATIENT_APPOINTMENT_SCOPES = {
+    "upcoming": (
+        "a.date >= %s AND a.{a_status} IN ('Scheduled','Waiting')",
+        Keyset(("a.date", "ASC", "date"), ("a.time", "ASC", "time"), ("a.a_id", "ASC", "id")),
+    ),
+    "past": (
+        "(a.date < %s OR a.{a_status} NOT IN ('Scheduled','Waiting'))",
+        Keyset(("a.date", "DESC", "date"), ("a.time", "DESC", "time"), ("a.a_id", "DESC", "id")),
+    ),
+}
+PATIENT_APPOINTMENTS_PAGE = 50
+
+
+def patient_appointments_first_page(scope):
+    """SQL for the first page of a scope, taking (p_id, today, limit + 1); also EXPLAINed by migrations.py."""
+    where, keyset = PATIENT_APPOINTMENT_SCOPES[scope]
+    return f"{PATIENT_APPOINTMENTS_SQL}\nWHERE a.p_id = %s AND {where}\n{keyset.order_by()}\nLIMIT %s"
+
+
+def _fetch_patient_appointments(conn, cursor, p_id, scope, limit):
+    """First page of a patient's upcoming/past list and its next cursor, as the scoped endpoint would return."""
+    keyset = PATIENT_APPOINTMENT_SCOPES[scope][1]
+    rows, next_cursor = first_page(
+        cursor, schema.sql(conn, patient_appointments_first_page(scope)), (p_id, date.today()), keyset, limit
+    )
+    return serialize(rows, cursor.description), next_cursor
+
+
+@app.route("/patients/<int:p_id>/appointments/<any(upcoming, past):scope>", methods=["GET"])
+def get_patient_appointments(p_id, scope):
+    """A patient's upcoming or past appointments, PATIENT_APPOINTMENTS_PAGE per page (?limit=&after=)."""
+    where, keyset = PATIENT_APPOINTMENT_SCOPES[scope]
+    try:
+        with db_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            rows, next_cursor = fetch_page(
+                cursor,
+                schema.sql(conn, PATIENT_APPOINTMENTS_SQL),
+                keyset,
+                (["a.p_id = %s", schema.sql(conn, where)], [p_id, date.today()]),
+                default_limit=PATIENT_APPOINTMENTS_PAGE,
+            )
+            rows = serialize(rows, cursor.description)
+            cursor.close()
+    except PageError as e:
+        return jsonify({"error": str(e)}), 400
+    return page_response(rows, next_cursor)
+
+
+@app.route("/patients/<int:p_id>/appointments/next", methods=["GET"])
+def get_patient_next_appointment(p_id):
+    """The patient's soonest Scheduled/Waiting appointment, or null."""
+    with db_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        rows, _ = _fetch_patient_appointments(conn, cursor, p_id, "upcoming", 1)
+        cursor.close()
+    return jsonify(rows[0] if rows else None)
 
 
 @app.route("/consultations/<int:c_id>/complete", methods=["PUT"])
 def complete_consultation(c_id):
-    conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
+    with db_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
 
-    # Fetch the associated appointment date
-    cursor.execute("""
-        SELECT a.date 
-        FROM consultation c
-        JOIN appointment a ON c.a_id = a.a_id
-        WHERE c.c_id = %s
-    """, (c_id,))
-    result = cursor.fetchone()
+        # Fetch the associated appointment date
+        cursor.execute("""
+            SELECT a.date 
+            FROM consultation c
+            JOIN appointment a ON c.a_id = a.a_id
+            WHERE c.c_id = %s
+        """, (c_id,))
+        result = cursor.fetchone()
 
-    if not result:
-        conn.close()
-        return jsonify({"error": "Consultation not found"}), 404
+        if not result:
+            return jsonify({"error": "Consultation not found"}), 404
 
-    appt_date = result["date"]
-    today = date.today()
+        appt_date = result["date"]
+        today = date.today()
 
-    # ❌ Prevent marking future consultations as complete
-    if appt_date > today:
-        conn.close()
-        return jsonify({"error": "Cannot complete consultation scheduled for a future date"}), 400
+        # ❌ Prevent marking future consultations as complete
+        if appt_date > today:
+            return jsonify({"error": "Cannot complete consultation scheduled for a future date"}), 400
 
-    # ✅ Mark as completed
-    cursor.execute("UPDATE consultation SET status='Completed' WHERE c_id=%s", (c_id,))
-    conn.commit()
-    conn.close()
+        # ✅ Mark as completed
+        cursor.execute("UPDATE consultation SET status='Completed' WHERE c_id=%s", (c_id,))
+        conn.commit()
 
-    return jsonify({"message": f"Consultation {c_id} marked as completed"})
+        return jsonify({"message": f"Consultation {c_id} marked as completed"})
 
 # ----------------------------
 # DOCTOR-SPECIFIC APPOINTMENTS
 # ----------------------------
 @app.route("/doctor/<int:d_id>/appointments", methods=["GET"])
 def get_doctor_appointments(d_id):
-    conn = get_connection()
-    if not conn:
-        return jsonify({"error": "Database connection failed"}), 500
-
-    cursor = conn.cursor(dictionary=True)
-    try:
-        cursor.execute("""
-            SELECT a.a_id, a.date, a.time, a.a_status, a.priority,
-                   p.p_name AS patient, d.d_name AS doctor
-            FROM appointment a
-            JOIN patient p ON a.p_id = p.p_id
-            JOIN doctor d ON a.d_id = d.d_id
-            WHERE a.d_id = %s
-            ORDER BY a.date DESC, a.time ASC
-        """, (d_id,))
-        data = convert_dates(cursor.fetchall())
-        cursor.close()
-        conn.close()
-        return jsonify(data)
-    except Exception as e:
-        print("❌ Error fetching doctor appointments:", e)
-        return jsonify({"error": "Error fetching doctor appointments"}), 500
+    with db_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        try:
+            cursor.execute(schema.sql(conn, """
+                SELECT a.a_id, a.date, a.time, a.{a_status} AS a_status, a.priority,
+                       p.p_name AS patient, d.d_name AS doctor
+                FROM appointment a
+                JOIN patient p ON a.p_id = p.p_id
+                JOIN doctor d ON a.d_id = d.d_id
+                WHERE a.d_id = %s
+                ORDER BY a.date DESC, a.time ASC
+            """), (d_id,))
+            data = serializer.fetch(cursor)
+            cursor.close()
+            return jsonify(data)
+        except Exception as e:
+            print("❌ Error fetching doctor appointments:", e)
+            return jsonify({"error": "Error fetching doctor appointments"}), 500
 
 
 # ----------------------------
 # CONSULTATION ROUTES
 # ----------------------------
+# Newest first; the doctor dashboard's consultations list continues here with ?doctor=&after=
+CONSULTATION_KEYSET = Keyset(("a.date", "DESC", "date"), ("c.c_id", "DESC", "id"))
+
+
 @app.route("/consultations", methods=["GET"])
 def get_consultations():
     try:
-        conn = get_connection()
-        cursor = conn.cursor(dictionary=True)
+        with db_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+
+            consultations, next_cursor = fetch_page(cursor, """
+                SELECT 
+                    c.c_id AS id,
+                    c.a_id,  -- include appointment ID
+                    p.p_name AS patient,
+                    d.d_name AS doctor,
+                    DATE(a.date) AS date,
+                    c.symptoms,
+                    c.prescription
+                FROM consultation c
+                JOIN appointment a ON c.a_id = a.a_id
+                JOIN patient p ON a.p_id = p.p_id
+                JOIN doctor d ON a.d_id = d.d_id
+            """, CONSULTATION_KEYSET, build_filters({
+                "date_from": ("a.date >= %s", parse_date_arg),
+                "date_to": ("a.date <= %s", parse_date_arg),
+                "doctor": ("a.d_id = %s", parse_int_arg),
+                "patient": ("a.p_id = %s", parse_int_arg),
+            }))
 
-        cursor.execute("""
-            SELECT 
-                c.c_id AS id,
-                c.a_id,  -- include appointment ID
-                p.p_name AS patient,
-                d.d_name AS doctor,
-                DATE(a.date) AS date,
-                c.symptoms,
-                c.prescription
-            FROM consultation c
-            JOIN appointment a ON c.a_id = a.a_id
-            JOIN patient p ON a.p_id = p.p_id
-            JOIN doctor d ON a.d_id = d.d_id
-            ORDER BY a.date DESC;
-        """)
-        consultations = cursor.fetchall()
-
-        cursor.close()
-        conn.close()
+            cursor.close()
 
-        return jsonify(consultations)
+            return page_response(consultations, next_cursor)
 
+    except PageError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         print("Error fetching consultations:", e)
         return jsonify({"error": "Failed to fetch consultations"}), 500
@@ -910,102 +1212,101 @@ def get_consultations():
 @app.route("/consultations", methods=["POST"])
 def add_consultation():
     data = request.json
-    conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
+    with db_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
     
-    # Check if consultation already exists for this appointment
-    cursor.execute("SELECT c_id FROM consultation WHERE a_id = %s", (data["a_id"],))
-    existing = cursor.fetchone()
-    if existing:
-        cursor.close()
-        conn.close()
-        return jsonify({"error": "Consultation already exists for this appointment"}), 400
+        # Check if consultation already exists for this appointment
+        cursor.execute("SELECT c_id FROM consultation WHERE a_id = %s", (data["a_id"],))
+        existing = cursor.fetchone()
+        if existing:
+            cursor.close()
+            return jsonify({"error": "Consultation already exists for this appointment"}), 400
     
-    # Insert consultation with symptoms and prescription (matching database schema)
-    sql = """INSERT INTO consultation (a_id, symptoms, prescription)
-             VALUES (%s, %s, %s)"""
-    cursor.execute(sql, (data["a_id"], data["symptoms"], data["prescription"]))
-    conn.commit()
-    cursor.close()
-    conn.close()
-    return jsonify({"message": "Consultation added successfully!"})
+        # Insert consultation with symptoms and prescription (matching database schema)
+        sql = """INSERT INTO consultation (a_id, symptoms, prescription)
+                 VALUES (%s, %s, %s)"""
+        cursor.execute(sql, (data["a_id"], data["symptoms"], data["prescription"]))
+        conn.commit()
+        cursor.close()
+        return jsonify({"message": "Consultation added successfully!"})
 
 @app.route("/consultations/<int:c_id>", methods=["DELETE"])
 def delete_consultation(c_id):
-    conn = get_connection()
-    if not conn:
-        return jsonify({"error": "Database connection failed"}), 500
-    
-    cursor = conn.cursor(dictionary=True)
-    try:
-        # Check if consultation exists
-        cursor.execute("SELECT c_id FROM consultation WHERE c_id = %s", (c_id,))
-        consultation = cursor.fetchone()
-        if not consultation:
-            cursor.close()
-            conn.close()
-            return jsonify({"error": "Consultation not found"}), 404
+    with db_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        try:
+            # Check if consultation exists
+            cursor.execute("SELECT c_id FROM consultation WHERE c_id = %s", (c_id,))
+            consultation = cursor.fetchone()
+            if not consultation:
+                cursor.close()
+                return jsonify({"error": "Consultation not found"}), 404
         
-        # Delete the consultation
-        cursor.execute("DELETE FROM consultation WHERE c_id = %s", (c_id,))
-        conn.commit()
-        cursor.close()
-        conn.close()
-        return jsonify({"message": "Consultation deleted successfully!"})
-    except Exception as e:
-        print("❌ Error deleting consultation:", e)
-        cursor.close()
-        conn.close()
-        return jsonify({"error": "Failed to delete consultation"}), 500
+            # Delete the consultation
+            cursor.execute("DELETE FROM consultation WHERE c_id = %s", (c_id,))
+            conn.commit()
+            cursor.close()
+            return jsonify({"message": "Consultation deleted successfully!"})
+        except Exception as e:
+            print("❌ Error deleting consultation:", e)
+            cursor.close()
+            return jsonify({"error": "Failed to delete consultation"}), 500
 
 @app.route("/appointments/<int:a_id>", methods=["DELETE"])
 def delete_appointment(a_id):
-    conn = get_connection()
-    if not conn:
-        return jsonify({"error": "Database connection failed"}), 500
-    
-    cursor = conn.cursor(dictionary=True)
-    try:
-        # Check if appointment exists
-        cursor.execute("SELECT a_id FROM appointment WHERE a_id = %s", (a_id,))
-        appointment = cursor.fetchone()
-        if not appointment:
-            cursor.close()
-            conn.close()
-            return jsonify({"error": "Appointment not found"}), 404
-        
-        # Delete all related records first (in correct order to avoid foreign key constraints)
-        # 1. Delete from queue (if exists)
+    with db_connection() as conn:
+        ensure_reservation_table(conn)
+        cursor = conn.cursor(dictionary=True)
         try:
-            cursor.execute("DELETE FROM queue WHERE a_id = %s", (a_id,))
-        except Exception as e:
-            print(f"Note: No queue entries or queue table doesn't exist: {e}")
+            # Check if appointment exists
+            cursor.execute(
+                schema.sql(conn, "SELECT a_id, p_id, d_id, date, time, {a_status} AS status FROM appointment WHERE a_id = %s"),
+                (a_id,),
+            )
+            appointment = cursor.fetchone()
+            if not appointment:
+                cursor.close()
+                return jsonify({"error": "Appointment not found"}), 404
+
+            # Free its place in the slot so the capacity can be booked again
+            if appointment["status"] in ("Scheduled", "Waiting"):
+                release_slot(cursor, appointment["d_id"], appointment["date"], as_time(appointment["time"]))
         
-        # 2. Delete from billing (if exists)
-        try:
-            cursor.execute("DELETE FROM billing WHERE a_id = %s", (a_id,))
-        except Exception as e:
-            print(f"Note: No billing entries or billing table doesn't exist: {e}")
+            # Delete all related records first (in correct order to avoid foreign key constraints)
+            # 1. Delete from queue (if exists)
+            try:
+                cursor.execute("DELETE FROM queue WHERE a_id = %s", (a_id,))
+            except Exception as e:
+                print(f"Note: No queue entries or queue table doesn't exist: {e}")
         
-        # 3. Delete from consultation (if exists)
-        try:
-            cursor.execute("DELETE FROM consultation WHERE a_id = %s", (a_id,))
-        except Exception as e:
-            print(f"Note: No consultation entries: {e}")
+            # 2. Delete from billing (if exists)
+            try:
+                cursor.execute("DELETE FROM billing WHERE a_id = %s", (a_id,))
+            except Exception as e:
+                print(f"Note: No billing entries or billing table doesn't exist: {e}")
         
-        # 4. Finally, delete the appointment itself
-        cursor.execute("DELETE FROM appointment WHERE a_id = %s", (a_id,))
-        conn.commit()
-        cursor.close()
-        conn.close()
-        return jsonify({"message": "Appointment deleted successfully!"})
-    except Exception as e:
-        print("❌ Error deleting appointment:", e)
-        print(f"Error details: {str(e)}")
-        conn.rollback()
-        cursor.close()
-        conn.close()
-        return jsonify({"error": f"Failed to delete appointment: {str(e)}"}), 500
+            # 3. Delete from consultation (if exists)
+            try:
+                cursor.execute("DELETE FROM consultation WHERE a_id = %s", (a_id,))
+            except Exception as e:
+                print(f"Note: No consultation entries: {e}")
+        
+            # 4. Finally, delete the appointment itself
+            cursor.execute("DELETE FROM appointment WHERE a_id = %s", (a_id,))
+            conn.commit()
+            cursor.close()
+            _sync_live_queue(conn, a_id, removed=True)
+            response_cache.bump(f"slots:{appointment['d_id']}")
+            _publish_queue_change(
+                "deleted", a_id, appointment["d_id"], appointment["p_id"], appointment["date"], appointment["time"]
+            )
+            return jsonify({"message": "Appointment deleted successfully!"})
+        except Exception as e:
+            print("❌ Error deleting appointment:", e)
+            print(f"Error details: {str(e)}")
+            conn.rollback()
+            cursor.close()
+            return jsonify({"error": f"Failed to delete appointment: {str(e)}"}), 500
 
 
 # ----------------------------
@@ -1013,27 +1314,28 @@ def delete_appointment(a_id):
 # ----------------------------
 @app.route("/billing", methods=["GET"])
 def get_billing():
-    conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM billing")
-    data = convert_dates(cursor.fetchall())
-    cursor.close()
-    conn.close()
-    return jsonify(data)
+    with db_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        rows, next_cursor = fetch_page(cursor, "SELECT * FROM billing", Keyset(("b_id", "ASC", "b_id")), build_filters({
+            "appointment": ("a_id = %s", parse_int_arg),
+            "status": ("payment_status = %s", None),
+        }))
+        data = serialize(rows, cursor.description)
+        cursor.close()
+        return page_response(data, next_cursor)
 
 
 @app.route("/billing", methods=["POST"])
 def add_billing():
     data = request.json
-    conn = get_connection()
-    cursor = conn.cursor()
-    sql = """INSERT INTO billing (a_id, billing_date, amount, payment_status)
-             VALUES (%s, %s, %s, %s)"""
-    cursor.execute(sql, (data["a_id"], data["billing_date"], data["amount"], data["payment_status"]))
-    conn.commit()
-    cursor.close()
-    conn.close()
-    return jsonify({"message": "Bill added successfully!"})
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        sql = """INSERT INTO billing (a_id, billing_date, amount, payment_status)
+                 VALUES (%s, %s, %s, %s)"""
+        cursor.execute(sql, (data["a_id"], data["billing_date"], data["amount"], data["payment_status"]))
+        conn.commit()
+        cursor.close()
+        return jsonify({"message": "Bill added successfully!"})
 
 
 # ----------------------------
@@ -1041,503 +1343,691 @@ def add_billing():
 # ----------------------------
 @app.route("/queue", methods=["GET"])
 def get_queue():
-    conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
-    status_column = _get_queue_status_column(conn)
-    cursor.execute(f"""
-        SELECT q.q_id,
-               q.{status_column} AS q_status,
-               q.token_no,
-               a.a_id,
-               a.date,
-               a.time,
-               a.status AS appointment_status,
-               p.p_name,
-               d.d_name
-        FROM queue q
-        JOIN appointment a ON q.a_id = a.a_id
-        JOIN patient p ON a.p_id = p.p_id
-        JOIN doctor d ON a.d_id = d.d_id
-        ORDER BY a.date ASC, a.time ASC
-    """)
-    data = convert_dates(cursor.fetchall())
-    cursor.close()
-    conn.close()
-    return jsonify(data)
+    with db_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        filters = dict(APPOINTMENT_FILTERS, queue_status=("q.{q_status} = %s", None))
+        rows, next_cursor = fetch_page(cursor, schema.sql(conn, """
+            SELECT q.q_id,
+                   q.{q_status} AS q_status,
+                   q.token_no,
+                   a.a_id,
+                   a.date,
+                   a.time,
+                   a.{a_status} AS appointment_status,
+                   p.p_name,
+                   d.d_name
+            FROM queue q
+            JOIN appointment a ON q.a_id = a.a_id
+            JOIN patient p ON a.p_id = p.p_id
+            JOIN doctor d ON a.d_id = d.d_id
+        """), Keyset(("a.date", "ASC", "date"), ("a.time", "ASC", "time"), ("q.q_id", "ASC", "q_id")),
+            build_filters(filters, schema.columns(conn)))
+        data = serialize(rows, cursor.description)
+        cursor.close()
+        return page_response(data, next_cursor)
 
 
 @app.route("/queue/<int:q_id>", methods=["PUT"])
 def update_queue(q_id):
     data = request.json
-    conn = get_connection()
-    cursor = conn.cursor()
-    status_column = _get_queue_status_column(conn)
-    new_status = data.get("q_status") or data.get("status")
-    if not new_status:
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        new_status = data.get("q_status") or data.get("status")
+        if not new_status:
+            cursor.close()
+            return jsonify({"error": "Missing queue status value"}), 400
+        cursor.execute(schema.sql(conn, "UPDATE queue SET {q_status}=%s WHERE q_id=%s"), (new_status, q_id))
+        conn.commit()
+        cursor.execute("""
+            SELECT a.a_id, a.d_id, a.p_id, a.date, a.time
+            FROM queue q
+            JOIN appointment a ON q.a_id = a.a_id
+            WHERE q.q_id = %s
+        """, (q_id,))
+        changed = cursor.fetchone()
         cursor.close()
-        conn.close()
-        return jsonify({"error": "Missing queue status value"}), 400
-    cursor.execute(f"UPDATE queue SET {status_column}=%s WHERE q_id=%s", (new_status, q_id))
-    conn.commit()
-    cursor.close()
-    conn.close()
-    return jsonify({"message": "Queue updated successfully!"})
+        if changed:
+            _sync_live_queue(conn, changed[0])
+            _publish_queue_change("queue_updated", *changed)
+        return jsonify({"message": "Queue updated successfully!"})
+
+
+@app.route("/queue/bulk", methods=["PUT"])
+def update_queue_bulk():
+    """Change the status of up to BULK_LIMIT queue entries in one transaction.
+
+    Body: {"updates": [{"q_id", "q_status" | "status"}, ...]}. Entries sharing a
+    status are updated with one statement; a status the column rejects fails
+    only its own entries. The response has one result per update, in order.
+    """
+    updates = (request.json or {}).get("updates")
+    if not isinstance(updates, list) or not updates:
+        return jsonify({"error": "Expected a non-empty 'updates' list"}), 400
+    if len(updates) > BULK_LIMIT:
+        return jsonify({"error": f"At most {BULK_LIMIT} updates per request"}), 400
+
+    results = [None] * len(updates)
+    by_status = {}
+    seen = set()
+    for index, item in enumerate(updates):
+        item = item if isinstance(item, dict) else {}
+        new_status = item.get("q_status") or item.get("status")
+        try:
+            q_id = int(item["q_id"])
+        except (KeyError, TypeError, ValueError):
+            results[index] = {"index": index, "ok": False, "error": "Missing or invalid q_id"}
+            continue
+        if not new_status:
+            results[index] = {"index": index, "q_id": q_id, "ok": False, "error": "Missing queue status value"}
+        elif q_id in seen:
+            results[index] = {"index": index, "q_id": q_id, "ok": False, "error": "Duplicate q_id in request"}
+        else:
+            seen.add(q_id)
+            by_status.setdefault(new_status, []).append((index, q_id))
+
+    if not seen:
+        return jsonify({"updated": 0, "failed": len(updates), "results": results})
+
+    changed = []
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            # One read for every entry: unknown q_ids are reported, the rest carry what the events need
+            placeholders = ", ".join(["%s"] * len(seen))
+            cursor.execute(f"""
+                SELECT q.q_id, a.a_id, a.d_id, a.p_id, a.date, a.time
+                FROM queue q
+                JOIN appointment a ON q.a_id = a.a_id
+                WHERE q.q_id IN ({placeholders})
+            """, tuple(seen))
+            rows = {row[0]: row[1:] for row in cursor.fetchall()}
+
+            for new_status, entries in by_status.items():
+                found = [(index, q_id) for index, q_id in entries if q_id in rows]
+                for index, q_id in entries:
+                    if q_id not in rows:
+                        results[index] = {"index": index, "q_id": q_id, "ok": False, "error": "Queue entry not found"}
+                if not found:
+                    continue
+                cursor.execute("SAVEPOINT bulk_status")
+                try:
+                    cursor.execute(
+                        schema.sql(conn, "UPDATE queue SET {q_status}=%s WHERE q_id IN ("
+                                   + ", ".join(["%s"] * len(found)) + ")"),
+                        (new_status, *(q_id for _, q_id in found)),
+                    )
+                except mysql.connector.Error as e:
+                    cursor.execute("ROLLBACK TO SAVEPOINT bulk_status")
+                    for index, q_id in found:
+                        results[index] = {"index": index, "q_id": q_id, "ok": False, "error": str(e)}
+                    continue
+                for index, q_id in found:
+                    results[index] = {"index": index, "q_id": q_id, "ok": True, "status": new_status}
+                    changed.append(rows[q_id])
+            conn.commit()
+        except mysql.connector.Error:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+        _sync_live_queue_many(conn, [row[0] for row in changed])
+
+    for row in changed:
+        _publish_queue_change("queue_updated", *row)
+    updated = sum(1 for result in results if result["ok"])
+    return jsonify({"updated": updated, "failed": len(updates) - updated, "results": results})
 
 
 @app.route("/queue/live", methods=["GET"])
 def get_live_queue():
-    """Return appointments happening in the current time slot (current time ± 30 minutes)."""
-    # Auto-complete past appointments before fetching live queue
-    auto_complete_past_appointments()
-    
-    conn = get_connection()
-    if not conn:
-        return jsonify({"error": "Database connection failed"}), 500
-    
-    cursor = conn.cursor(dictionary=True)
+    """Return appointments happening in the current time slot (current time ± 30 minutes).
+
+    ?doctor=<d_id> narrows it to one doctor's queue.
+    """
     try:
-        now = datetime.now()
-        today = now.date()
-        current_time = now.time()
-        
-        # Calculate current time slot (30-minute window)
-        # Round down to nearest 30-minute slot
-        slot_minute = 0 if current_time.minute < 30 else 30
-        slot_start = time(current_time.hour, slot_minute, 0)
-        slot_end_dt = datetime.combine(today, slot_start) + timedelta(minutes=30)
-        slot_end = slot_end_dt.time()
-        
-        # Query appointments in the current time slot
-        status_column = _get_queue_status_column(conn)
-        cursor.execute(f"""
-            SELECT 
-                a.a_id,
-                a.date,
-                a.time,
-                a.status AS appointment_status,
-                p.p_name AS patient_name,
-                p.p_id AS patient_id,
-                d.d_name AS doctor_name,
-                d.d_id AS doctor_id,
-                q.token_no,
-                q.{status_column} AS queue_status,
-                q.q_id
-            FROM appointment a
-            JOIN patient p ON a.p_id = p.p_id
-            JOIN doctor d ON a.d_id = d.d_id
-            LEFT JOIN queue q ON a.a_id = q.a_id
-            WHERE a.date = %s
-              AND a.time >= %s 
-              AND a.time < %s
-              AND a.status IN ('Scheduled', 'Waiting')
-            ORDER BY a.time ASC, q.token_no ASC
-        """, (today, slot_start, slot_end))
-        
-        appointments = cursor.fetchall()
-        
-        # Convert dates/times to strings using convert_dates helper
-        converted_appointments = convert_dates(appointments)
-        
-        # Ensure time is formatted as HH:MM
-        for apt in converted_appointments:
-            if apt.get('time'):
-                time_val = apt['time']
-                if isinstance(time_val, timedelta):
-                    total_seconds = int(time_val.total_seconds())
-                    hours = total_seconds // 3600
-                    minutes = (total_seconds % 3600) // 60
-                    apt['time'] = f"{hours:02d}:{minutes:02d}"
-                elif isinstance(time_val, time):
-                    apt['time'] = time_val.strftime("%H:%M")
-                elif isinstance(time_val, str) and ':' in time_val:
-                    # Already a string, just ensure it's in HH:MM format
-                    parts = time_val.split(':')
-                    if len(parts) >= 2:
-                        apt['time'] = f"{parts[0].zfill(2)}:{parts[1].zfill(2)}"
-        
-        cursor.close()
-        conn.close()
-        
-        return jsonify({
-            "current_time": now.isoformat(),
-            "time_slot": {
-                "start": slot_start.strftime("%H:%M"),
-                "end": slot_end.strftime("%H:%M")
-            },
-            "appointments": converted_appointments,
-            "count": len(converted_appointments),
-            "message": f"No appointments scheduled from {slot_start.strftime('%H:%M')} to {slot_end.strftime('%H:%M')}" if len(converted_appointments) == 0 else None
-        })
-        
+        return jsonify(current_live_queue(datetime.now(), d_id=request.args.get("doctor", type=int)))
+    except DatabaseUnavailable:
+        raise
     except Exception as e:
         print("❌ Error fetching live queue:", e)
-        try:
-            cursor.close()
-        except:
-            pass
-        try:
-            conn.close()
-        except:
-            pass
         return jsonify({"error": f"Failed to fetch live queue: {str(e)}"}), 500
 
 
-def _normalize_time(value):
-    """Normalize various MySQL time representations to datetime.time."""
-    if isinstance(value, str):
-        for fmt in ("%H:%M:%S", "%H:%M"):
-            try:
-                return datetime.strptime(value, fmt).time()
-            except ValueError:
-                continue
-        return None
-    if isinstance(value, timedelta):
-        total_seconds = int(value.total_seconds())
-        hours = total_seconds // 3600
-        minutes = (total_seconds % 3600) // 60
-        seconds = total_seconds % 60
-        return time(hours, minutes, seconds)
-    if isinstance(value, time):
-        return value
-    return None
-
-
-def _normalize_date(value):
-    """Normalize various MySQL date representations to datetime.date."""
-    if isinstance(value, str):
-        try:
-            return datetime.strptime(value, "%Y-%m-%d").date()
-        except ValueError:
-            return None
-    return value
+def current_live_queue(now, conn=None, d_id=None):
+    """The /queue/live payload for `now`: from memory when built, else from MySQL (on `conn` if given)."""
+    today = now.date()
+    slot_start, slot_end = slot_window(today, now.time())
+    if live_queue.is_current(today):
+        appointments = live_queue.live(slot_start, d_id)
+    else:
+        appointments = _fetch_live_queue(today, slot_start, slot_end, conn, d_id)
+    return live_queue_payload(now, slot_start, slot_end, appointments)
+
+
+def live_queue_payload(now, slot_start, slot_end, appointments):
+    """Build the /queue/live response (also used by async_app.py)."""
+    # SQL rows carry TIME as timedelta, live queue entries as time; both go out as HH:MM
+    converted_appointments = serialize(appointments, overrides={"time": format_hhmm})
+
+    return {
+        "current_time": now.isoformat(),
+        "time_slot": {
+            "start": slot_start.strftime("%H:%M"),
+            "end": slot_end.strftime("%H:%M")
+        },
+        "appointments": converted_appointments,
+        "count": len(converted_appointments),
+        "message": f"No appointments scheduled from {slot_start.strftime('%H:%M')} to {slot_end.strftime('%H:%M')}" if len(converted_appointments) == 0 else None
+    }
+
+
+LIVE_QUEUE_SQL = """
+    SELECT 
+        a.a_id,
+        a.date,
+        a.time,
+        a.{a_status} AS appointment_status,
+        p.p_name AS patient_name,
+        p.p_id AS patient_id,
+        d.d_name AS doctor_name,
+        d.d_id AS doctor_id,
+        q.token_no,
+        q.{q_status} AS queue_status,
+        q.q_id
+    FROM appointment a
+    JOIN patient p ON a.p_id = p.p_id
+    JOIN doctor d ON a.d_id = d.d_id
+    LEFT JOIN queue q ON a.a_id = q.a_id
+    WHERE a.date = %s
+      AND a.time >= %s 
+      AND a.time < %s
+      AND a.{a_status} IN ('Scheduled', 'Waiting')
+    ORDER BY a.time ASC, q.token_no ASC
+"""
+# /queue/live?doctor=: the same rows for one doctor, read through idx_appointment_doctor_slot
+LIVE_QUEUE_DOCTOR_SQL = LIVE_QUEUE_SQL.replace("WHERE a.date = %s", "WHERE a.d_id = %s AND a.date = %s")
+
+
+def live_queue_query(today, slot_start, slot_end, d_id=None):
+    """(sql, params) for the live queue of every doctor or of `d_id`; shared with the async app."""
+    if d_id is None:
+        return LIVE_QUEUE_SQL, (today, slot_start, slot_end)
+    return LIVE_QUEUE_DOCTOR_SQL, (d_id, today, slot_start, slot_end)
+
+
+def _fetch_live_queue(today, slot_start, slot_end, conn=None, d_id=None):
+    """SQL path for /queue/live, used until the in-memory live queue has been built."""
+    if conn is None:
+        with db_connection() as conn:
+            return _fetch_live_queue(today, slot_start, slot_end, conn, d_id)
+    sql, params = live_queue_query(today, slot_start, slot_end, d_id)
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute(schema.sql(conn, sql), params)
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+@app.route("/queue/engine", methods=["GET"])
+def get_live_queue_engine():
+    """In-memory live queue stats; `?check=1` also compares it with the database."""
+    result = live_queue.stats()
+    if request.args.get("check") in ("1", "true"):
+        with db_connection() as conn:
+            result["check"] = live_queue.check(conn)
+    return jsonify(result)
+
+
+def _patient_queue_payload(appointment_id, appt_date, appt_time, appointment_status, doctor_id, doctor_name,
+                           queue_status, queue_id, ahead_count, is_first_in_slot):
+    """Build the /queue/patient response from an appointment's place in its slot."""
+    queue_status = queue_status or "Waiting"
+    position = ahead_count + 1
+    normalized_status = queue_status.lower()
+    if normalized_status in ("in progress", "consulting"):
+        ahead_count = 0
+        position = 0
+
+    average_slot_minutes = 15
+    now = datetime.now()
+    estimated_wait = ahead_count * average_slot_minutes
+
+    appointment_dt = None
+    if appt_date and appt_time:
+        appointment_dt = datetime.combine(appt_date, appt_time)
+        if normalized_status in ("in progress", "consulting"):
+            estimated_wait = 0
+        elif appointment_dt > now:
+            minutes_until = int((appointment_dt - now).total_seconds() // 60)
+            estimated_wait = max(estimated_wait, minutes_until)
+
+    response = {
+        "inQueue": True,
+        "queueStatus": queue_status,
+        "position": position,
+        "aheadCount": ahead_count,
+        "estimatedWaitMinutes": max(0, estimated_wait),
+        "isFirstInSlot": is_first_in_slot,
+        "appointment": {
+            "id": appointment_id,
+            "date": appt_date.isoformat() if appt_date else None,
+            "time": appt_time.strftime("%H:%M") if appt_time else None,
+            "status": appointment_status,
+        },
+        "doctor": {
+            "id": doctor_id,
+            "name": doctor_name,
+        },
+        "queueId": queue_id,
+        "lastUpdated": datetime.now().isoformat(),
+    }
+
+    if appointment_dt:
+        response["expectedStartTime"] = appointment_dt.isoformat()
+    return response
 
 
 @app.route("/queue/patient/<int:p_id>", methods=["GET"])
 def get_patient_queue_status(p_id):
-    # Auto-complete past appointments before fetching patient queue status
-    auto_complete_past_appointments()
-    
-    conn = get_connection()
-    if not conn:
-        return jsonify({"error": "Database connection failed"}), 500
+    now = datetime.now()
+    payload = _patient_queue_status_from_memory(p_id, now)
+    if payload is not None:
+        return jsonify(payload)
+    with db_connection() as conn:
+        try:
+            return jsonify(_patient_queue_status_from_db(conn, p_id, now))
+        except Exception as e:
+            print("❌ Error computing patient queue status:", e)
+            return jsonify({"error": "Failed to fetch queue status"}), 500
 
-    cursor = conn.cursor(dictionary=True)
-    try:
-        # First, get the EARLIEST upcoming appointment for this patient
-        # This ensures we show the next appointment, not just any appointment in queue
-        # We need to check if appointment is in current time slot OR future
-        now = datetime.now()
-        today = date.today()
-        current_time = now.time()
-        
-        # Calculate current time slot (30-minute window)
-        # Round down to nearest 30-minute slot
-        slot_minute = 0 if current_time.minute < 30 else 30
-        slot_start = time(current_time.hour, slot_minute, 0)
-        slot_end_dt = datetime.combine(today, slot_start) + timedelta(minutes=30)
-        slot_end = slot_end_dt.time()
-        
-        # Query: Get appointments that are either:
-        # 1. In the current time slot (for today)
-        # 2. Future appointments (date > today OR date = today AND time >= slot_end)
-        cursor.execute("""
-            SELECT a.a_id AS appointment_id,
-                   a.date AS appointment_date,
-                   a.time AS appointment_time,
-                   a.status AS appointment_status,
-                   a.p_id,
-                   a.d_id AS doctor_id,
-                   p.p_name,
-                   d.d_name
-            FROM appointment a
-            JOIN patient p ON a.p_id = p.p_id
-            JOIN doctor d ON a.d_id = d.d_id
-            WHERE a.p_id = %s 
-              AND a.status IN ('Scheduled', 'Waiting')
-              AND (
-                a.date > %s 
-                OR (a.date = %s AND a.time >= %s AND a.time < %s)
-                OR (a.date = %s AND a.time >= %s)
-              )
-            ORDER BY a.date ASC, a.time ASC
-            LIMIT 1
-        """, (p_id, today, today, slot_start, slot_end, today, slot_end))
-        target = cursor.fetchone()
-        
-        # Debug: Check all upcoming appointments for this patient
-        cursor.execute("""
-            SELECT a.a_id, a.date, a.time, a.status
-            FROM appointment a
-            WHERE a.p_id = %s 
-              AND a.status IN ('Scheduled', 'Waiting')
-            ORDER BY a.date ASC, a.time ASC
-        """, (p_id,))
-        all_appointments = cursor.fetchall()
-        print(f"DEBUG: All appointments for patient {p_id}: {all_appointments}")
-        
-        # Debug: Print what we found
-        if target:
-            print(f"DEBUG: Found earliest upcoming appointment for patient {p_id}: Date={target['appointment_date']}, Time={target['appointment_time']}, ID={target['appointment_id']}")
-        else:
-            print(f"DEBUG: No upcoming appointments found for patient {p_id}")
-        
-        if not target:
-            return jsonify({"inQueue": False})
-        
-        # Now check if this appointment is in the queue table
-        status_column = _get_queue_status_column(conn)
-        status_condition = f"q.{status_column}"
-        cursor.execute(
-            f"""
-            SELECT q.*,
-                   q.{status_column} AS queue_status
-            FROM queue q
-            WHERE q.a_id = %s
-            """,
-            (target["appointment_id"],),
-        )
-        queue_entry = cursor.fetchone()
-        
-        # If not in queue table, add it
-        if not queue_entry:
-            # Get the next token number for this date
-            cursor.execute("""
-                SELECT COALESCE(MAX(token_no), 0) + 1 AS next_token
-                FROM queue q
-                JOIN appointment a ON q.a_id = a.a_id
-                WHERE a.date = %s
-            """, (target["appointment_date"],))
-            token_result = cursor.fetchone()
-            token_no = token_result["next_token"] if token_result else 1
-            
-            cursor.execute("""
-                INSERT INTO queue (a_id, token_no, status)
-                VALUES (%s, %s, 'Waiting')
-            """, (target["appointment_id"], token_no))
-            conn.commit()
-            
-            # Re-fetch the queue entry
-            cursor.execute(
-                f"""
-                SELECT q.*,
-                       q.{status_column} AS queue_status
-                FROM queue q
-                WHERE q.a_id = %s
-                """,
-                (target["appointment_id"],),
-            )
-            queue_entry = cursor.fetchone()
 
-        if not target:
-            return jsonify({"inQueue": False})
-
-        # Get queue status from queue_entry, default to "Waiting"
-        queue_status = (queue_entry.get("queue_status") if queue_entry else None) or "Waiting"
-        appt_date_raw = target.get("appointment_date") or target.get("date")
-        appt_time_raw = target.get("appointment_time") or target.get("time")
-        doctor_id = target.get("doctor_id") or target.get("d_id")
-        target_appt_id = target.get("appointment_id") or target.get("a_id")
-
-        appt_date = _normalize_date(appt_date_raw)
-        appt_time = _normalize_time(appt_time_raw)
-
-        # Calculate time slot for this appointment
-        slot_start = None
-        slot_end = None
-        if appt_time:
-            appt_time_obj = appt_time if isinstance(appt_time, time) else _normalize_time(appt_time)
-            if appt_time_obj:
-                slot_minute = 0 if appt_time_obj.minute < 30 else 30
-                slot_start = time(appt_time_obj.hour, slot_minute, 0)
-                slot_end_dt = datetime.combine(appt_date, slot_start) + timedelta(minutes=30)
-                slot_end = slot_end_dt.time()
-
-        # Get queue for appointments in the same time slot (for position calculation)
-        if slot_start and slot_end:
-            cursor.execute(
-                f"""
-                SELECT q.*,
-                       q.{status_column} AS queue_status,
-                       a.a_id,
-                       a.time
-                FROM queue q
-                JOIN appointment a ON q.a_id = a.a_id
-                WHERE a.d_id = %s 
-                  AND a.date = %s 
-                  AND a.time >= %s 
-                  AND a.time < %s
-                  AND a.status IN ('Scheduled', 'Waiting')
-                  AND {status_condition} IN ('Waiting','In Progress','Consulting')
-                ORDER BY a.time ASC, q.token_no ASC
-                """,
-                (doctor_id, appt_date_raw, slot_start, slot_end),
-            )
-            time_slot_queue = cursor.fetchall()
-        else:
-            # Fallback to all appointments if we can't determine time slot
-            cursor.execute(
-                f"""
-                SELECT q.*,
-                       q.{status_column} AS queue_status,
-                       a.a_id,
-                       a.time
-                FROM queue q
-                JOIN appointment a ON q.a_id = a.a_id
-                WHERE a.d_id = %s AND a.date = %s AND {status_condition} IN ('Waiting','In Progress','Consulting')
-                ORDER BY a.time ASC
-                """,
-                (doctor_id, appt_date_raw),
-            )
-            time_slot_queue = cursor.fetchall()
+def _patient_queue_status_from_memory(p_id, now):
+    """Queue status from the in-memory live queue, or None when only the database can answer."""
+    if not live_queue.is_current(now.date()):
+        return None
+    # Today's appointments come before any future one, so a hit here is the earliest upcoming
+    entry = live_queue.next_for_patient(p_id, slot_start_for(now.time()))
+    # Appointments without a queue row yet take the SQL path, which creates one
+    if not entry or entry["q_id"] is None:
+        return None
+    ahead_count = live_queue.ahead_of(entry)
+    log.debug("Queue status for patient %s: appointment %s, %s ahead (live queue)",
+              p_id, entry["a_id"], ahead_count)
+    return _patient_queue_payload(
+        entry["a_id"], entry["date"], entry["time"], entry["appointment_status"],
+        entry["doctor_id"], entry["doctor_name"], entry["queue_status"], entry["q_id"],
+        ahead_count, is_first_in_slot=ahead_count == 0,
+    )
 
-        ahead_count = 0
-        for entry in time_slot_queue:
-            if entry["a_id"] == target_appt_id:
-                break
-            ahead_count += 1
-
-        queue_status = queue_status or "Waiting"
-        position = ahead_count + 1
-        normalized_status = queue_status.lower()
-        if normalized_status in ("in progress", "consulting"):
-            ahead_count = 0
-            position = 0
 
-        average_slot_minutes = 15
-        now = datetime.now()
-        estimated_wait = ahead_count * average_slot_minutes
-
-        # Check if patient is first in their time slot
-        is_first_in_slot = False
-        if appt_date and appt_time:
-            # Calculate the time slot for this appointment (30-minute window)
-            appt_time_obj = appt_time if isinstance(appt_time, time) else _normalize_time(appt_time)
-            if appt_time_obj:
-                slot_minute = 0 if appt_time_obj.minute < 30 else 30
-                slot_start = time(appt_time_obj.hour, slot_minute, 0)
-                slot_end_dt = datetime.combine(appt_date, slot_start) + timedelta(minutes=30)
-                slot_end = slot_end_dt.time()
-                
-                # Check if there are any appointments before this one in the same time slot
-                # (earlier time OR same time but lower token number)
-                cursor.execute(
-                    f"""
-                    SELECT COUNT(*) as count
-                    FROM queue q
-                    JOIN appointment a ON q.a_id = a.a_id
-                    WHERE a.d_id = %s 
-                      AND a.date = %s
-                      AND a.time >= %s 
-                      AND a.time < %s
-                      AND a.status IN ('Scheduled', 'Waiting')
-                      AND {status_condition} IN ('Waiting', 'In Progress', 'Consulting')
-                      AND (
-                        a.time < %s
-                        OR (a.time = %s AND q.token_no < %s)
-                      )
-                    """,
-                    (doctor_id, appt_date_raw, slot_start, slot_end, appt_time_obj, appt_time_obj, queue_entry.get("token_no") if queue_entry else 999999)
-                )
-                earlier_in_slot = cursor.fetchone()
-                is_first_in_slot = (earlier_in_slot["count"] if earlier_in_slot else 0) == 0
-
-        appointment_dt = None
-        if appt_date and appt_time:
-            appointment_dt = datetime.combine(appt_date, appt_time)
-            if normalized_status in ("in progress", "consulting"):
-                estimated_wait = 0
-            elif appointment_dt > now:
-                minutes_until = int((appointment_dt - now).total_seconds() // 60)
-                estimated_wait = max(estimated_wait, minutes_until)
-
-        # Debug: Log the appointment being returned
-        print(f"DEBUG: Returning queue status for patient {p_id}: Appointment ID={target_appt_id}, Date={appt_date.isoformat() if appt_date else appt_date_raw}, Time={appt_time.strftime('%H:%M') if appt_time else appt_time_raw}, IsFirstInSlot={is_first_in_slot}")
-        
-        response = {
-            "inQueue": True,
-            "queueStatus": queue_status,
-            "position": position,
-            "aheadCount": ahead_count,
-            "estimatedWaitMinutes": max(0, estimated_wait),
-            "isFirstInSlot": is_first_in_slot,
-            "appointment": {
-                "id": target_appt_id,
-                "date": appt_date.isoformat() if appt_date else str(appt_date_raw),
-                "time": appt_time.strftime("%H:%M") if appt_time else str(appt_time_raw),
-                "status": target.get("appointment_status"),
-            },
-            "doctor": {
-                "id": doctor_id,
-                "name": target["d_name"],
-            },
-            "queueId": queue_entry.get("q_id") if queue_entry else None,
-            "lastUpdated": datetime.now().isoformat(),
-        }
+# The patient's earliest upcoming appointment (current slot or later) and its place
+# in that doctor's slot, in one round trip. `ahead_count` sums the still-active
+# queue rows ordered before it; rows without a queue entry never count.
+PATIENT_QUEUE_SQL = """
+    WITH target AS (
+        SELECT a.a_id, a.date, a.time, a.{a_status} AS status, a.d_id, d.d_name,
+               SEC_TO_TIME(FLOOR(TIME_TO_SEC(a.time) / %(slot_seconds)s) * %(slot_seconds)s) AS slot_start
+        FROM appointment a
+        JOIN doctor d ON a.d_id = d.d_id
+        WHERE a.p_id = %(p_id)s
+          AND a.{a_status} IN ('Scheduled', 'Waiting')
+          AND (a.date > %(today)s OR (a.date = %(today)s AND a.time >= %(slot_start)s))
+        ORDER BY a.date ASC, a.time ASC
+        LIMIT 1
+    ),
+    slot_queue AS (
+        SELECT a.a_id, q.q_id, q.token_no, q.{q_status} AS queue_status,
+               SUM(q.{q_status} IN ('Waiting', 'In Progress', 'Consulting'))
+                   OVER (w ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING) AS ahead
+        FROM target t
+        JOIN appointment a
+          ON a.d_id = t.d_id
+         AND a.date = t.date
+         AND a.time >= t.slot_start
+         AND a.time < ADDTIME(t.slot_start, SEC_TO_TIME(%(slot_seconds)s))
+         AND a.{a_status} IN ('Scheduled', 'Waiting')
+        LEFT JOIN queue q ON q.a_id = a.a_id
+        WINDOW w AS (ORDER BY a.time, q.token_no, a.a_id)
+    )
+    SELECT t.a_id AS appointment_id,
+           t.date AS appointment_date,
+           t.time AS appointment_time,
+           t.status AS appointment_status,
+           t.d_id AS doctor_id,
+           t.d_name,
+           s.q_id,
+           s.queue_status,
+           COALESCE(s.ahead, 0) AS ahead_count,
+           COALESCE(s.ahead, 0) = 0 AS is_first_in_slot
+    FROM target t
+    JOIN slot_queue s ON s.a_id = t.a_id
+"""
+
+
+def _fetch_patient_queue_row(conn, cursor, p_id, today, slot_start):
+    cursor.execute(schema.sql(conn, PATIENT_QUEUE_SQL), {
+        "p_id": p_id,
+        "today": today,
+        "slot_start": slot_start,
+        "slot_seconds": SLOT_MINUTES * 60,
+    })
+    return cursor.fetchone()
 
-        if appointment_dt:
-            response["expectedStartTime"] = appointment_dt.isoformat()
 
-        return jsonify(response)
+def _patient_queue_status_from_db(conn, p_id, now):
+    cursor = conn.cursor(dictionary=True)
+    try:
+        today = now.date()
+        slot_start = slot_start_for(now.time())
+        target = _fetch_patient_queue_row(conn, cursor, p_id, today, slot_start)
+        if not target:
+            return {"inQueue": False}
 
-    except Exception as e:
-        print("❌ Error computing patient queue status:", e)
-        return jsonify({"error": "Failed to fetch queue status"}), 500
+        # Appointments created before every booking got a queue row: add one, then re-read
+        if target["q_id"] is None:
+            token_no = allocate_token(
+                conn, cursor, target["doctor_id"], target["appointment_date"],
+                as_time(target["appointment_time"]),
+            )
+            # A concurrent poll may have added the row first (queue.a_id is unique);
+            # then roll back so the token goes unused
+            cursor.execute(schema.sql(conn, """
+                INSERT IGNORE INTO queue (a_id, token_no, {q_status})
+                VALUES (%s, %s, 'Waiting')
+            """), (target["appointment_id"], token_no))
+            if cursor.rowcount == 1:
+                conn.commit()
+                _sync_live_queue(conn, target["appointment_id"])
+            else:
+                conn.rollback()
+
+            target = _fetch_patient_queue_row(conn, cursor, p_id, today, slot_start)
+            if not target:
+                return {"inQueue": False}
+
+        log.debug("Queue status for patient %s: appointment %s, %s ahead (database)",
+                  p_id, target["appointment_id"], target["ahead_count"])
+        return _patient_queue_payload(
+            target["appointment_id"],
+            as_date(target["appointment_date"]),
+            as_time(target["appointment_time"]),
+            target["appointment_status"],
+            target["doctor_id"],
+            target["d_name"],
+            target["queue_status"],
+            target["q_id"],
+            int(target["ahead_count"]),
+            bool(target["is_first_in_slot"]),
+        )
     finally:
         cursor.close()
-        conn.close()
-
-@app.route('/get_patient_data', methods=['GET'])
-def get_patient_data():
-    p_id = request.args.get('p_id')
-    conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
 
+# The three independent reads behind /get_patient_data, in response order
+PATIENT_DATA_SQL = {
     # Upcoming Appointments (Scheduled + date >= today)
-    cursor.execute("""
-        SELECT a.a_id, a.date, a.time, a.status, d.d_name
+    "upcoming": """
+        SELECT a.a_id, a.date, a.time, a.{a_status} AS status, d.d_name
         FROM appointment a
         JOIN doctor d ON a.d_id = d.d_id
-        WHERE a.p_id = %s AND a.status = 'Scheduled' AND a.date >= CURDATE()
+        WHERE a.p_id = %s AND a.{a_status} = 'Scheduled' AND a.date >= CURDATE()
         ORDER BY a.date ASC
-    """, (p_id,))
-    upcoming = cursor.fetchall()
-
+    """,
     # Past Appointments (Completed OR date < today)
-    cursor.execute("""
-        SELECT a.a_id, a.date, a.time, a.status, d.d_name
+    "past": """
+        SELECT a.a_id, a.date, a.time, a.{a_status} AS status, d.d_name
         FROM appointment a
         JOIN doctor d ON a.d_id = d.d_id
-        WHERE a.p_id = %s AND (a.status = 'Completed' OR a.date < CURDATE())
+        WHERE a.p_id = %s AND (a.{a_status} = 'Completed' OR a.date < CURDATE())
         ORDER BY a.date DESC
-    """, (p_id,))
-    past = cursor.fetchall()
-
+    """,
     # Consultations (linked to completed appointments)
-    cursor.execute("""
+    "consultations": """
         SELECT c.c_id, c.symptoms, c.prescription, a.date, d.d_name
         FROM consultation c
         JOIN appointment a ON c.a_id = a.a_id
         JOIN doctor d ON a.d_id = d.d_id
         WHERE a.p_id = %s
         ORDER BY a.date DESC
-    """, (p_id,))
-    consultations = cursor.fetchall()
+    """,
+}
 
-    cursor.close()
-    conn.close()
 
-    return jsonify({
+def patient_data_payload(upcoming, past, consultations):
+    return {
         "upcoming_count": len(upcoming),
         "past_count": len(past),
         "consultation_count": len(consultations),
         "upcoming": upcoming,
         "past": past,
         "consultations": consultations
+    }
+
+
+@app.route('/get_patient_data', methods=['GET'])
+def get_patient_data():
+    p_id = request.args.get('p_id')
+    with db_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        results = {}
+        for name, sql in PATIENT_DATA_SQL.items():
+            cursor.execute(schema.sql(conn, sql), (p_id,))
+            results[name] = serializer.fetch(cursor)
+        cursor.close()
+
+        return jsonify(patient_data_payload(**results))
+
+
+# ----------------------------
+# DASHBOARD BUNDLES
+# ----------------------------
+# Everything one dashboard needs on first load, read on a single pooled
+# connection; later refreshes use the individual endpoints.
+DASHBOARD_LIST_LIMIT = 50
+
+DOCTOR_DAY_SQL = """
+    SELECT a.a_id, a.p_id, p.p_name AS patient, a.date, a.time, a.{a_status} AS a_status,
+           q.q_id, COALESCE(q.token_no, 0) AS token_no, q.{q_status} AS queue_status,
+           c.c_id
+    FROM appointment a
+    JOIN patient p ON a.p_id = p.p_id
+    LEFT JOIN queue q ON a.a_id = q.a_id
+    LEFT JOIN consultation c ON a.a_id = c.a_id
+    WHERE a.d_id = %s AND a.date = %s
+    ORDER BY a.time ASC, token_no ASC, a.a_id ASC
+"""
+# Completed appointments still waiting for a consultation record; later pages
+# come from /doctors/<d_id>/pending_consultations
+DOCTOR_PENDING_SELECT = """
+    SELECT a.a_id, a.p_id, p.p_name AS patient, a.date, a.time, a.{a_status} AS a_status
+    FROM appointment a
+    JOIN patient p ON a.p_id = p.p_id
+    LEFT JOIN consultation c ON a.a_id = c.a_id
+"""
+DOCTOR_PENDING_WHERE = "a.d_id = %s AND a.{a_status} = 'Completed' AND c.c_id IS NULL"
+DOCTOR_PENDING_KEYSET = Keyset(("a.date", "DESC", "date"), ("a.time", "DESC", "time"), ("a.a_id", "DESC", "a_id"))
+DOCTOR_PENDING_CONSULTATIONS_SQL = (
+    f"{DOCTOR_PENDING_SELECT}WHERE {DOCTOR_PENDING_WHERE}\n{DOCTOR_PENDING_KEYSET.order_by()}\nLIMIT %s"
+)
+# Later pages come from /consultations?doctor=<d_id> (same CONSULTATION_KEYSET order)
+DOCTOR_CONSULTATIONS_SQL = """
+    SELECT c.c_id AS id, c.a_id, p.p_name AS patient, d.d_name AS doctor,
+           DATE(a.date) AS date, c.symptoms, c.prescription
+    FROM appointment a
+    JOIN consultation c ON c.a_id = a.a_id
+    JOIN patient p ON a.p_id = p.p_id
+    JOIN doctor d ON a.d_id = d.d_id
+    WHERE a.d_id = %s
+    ORDER BY a.date DESC, c.c_id DESC
+    LIMIT %s
+"""
+
+
+@app.route("/dashboard/patient/<int:p_id>", methods=["GET"])
+def get_patient_dashboard(p_id):
+    """Patient home: profile, upcoming/past appointments, queue status and the live queue."""
+    now = datetime.now()
+    with db_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        try:
+            cursor.execute("SELECT * FROM patient WHERE p_id=%s", (p_id,))
+            patient = cursor.fetchone()
+            if not patient:
+                return jsonify({"error": "Patient not found"}), 404
+            upcoming, upcoming_next = _fetch_patient_appointments(conn, cursor, p_id, "upcoming", PATIENT_APPOINTMENTS_PAGE)
+            past, past_next = _fetch_patient_appointments(conn, cursor, p_id, "past", PATIENT_APPOINTMENTS_PAGE)
+        finally:
+            cursor.close()
+
+        queue = _patient_queue_status_from_memory(p_id, now)
+        if queue is None:
+            queue = _patient_queue_status_from_db(conn, p_id, now)
+        # The live queue the patient cares about is their doctor's
+        live = current_live_queue(now, conn, queue["doctor"]["id"] if queue.get("inQueue") else None)
+
+    return jsonify({
+        "patient": patient,
+        "upcoming": upcoming,
+        "upcoming_next_cursor": upcoming_next,
+        "past": past,
+        "past_next_cursor": past_next,
+        "queue": queue,
+        "live_queue": live,
+    })
+
+
+@app.route("/dashboard/doctor/<int:d_id>", methods=["GET"])
+def get_doctor_dashboard(d_id):
+    """Doctor day view (?date=YYYY-MM-DD, default today): the day's appointments with
+    queue and consultation state, completed appointments without a consultation, and
+    the doctor's most recent consultations."""
+    try:
+        day = parse_date_arg(request.args["date"]) if request.args.get("date") else date.today()
+    except PageError as e:
+        return jsonify({"error": str(e)}), 400
+
+    with db_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        try:
+            cursor.execute("SELECT d_id, d_name, specialization, availability FROM doctor WHERE d_id=%s", (d_id,))
+            doctor = cursor.fetchone()
+            if not doctor:
+                return jsonify({"error": "Doctor not found"}), 404
+            cursor.execute(schema.sql(conn, DOCTOR_DAY_SQL), (d_id, day))
+            appointments = serializer.fetch(cursor)
+            pending, pending_next = first_page(
+                cursor, schema.sql(conn, DOCTOR_PENDING_CONSULTATIONS_SQL), (d_id,),
+                DOCTOR_PENDING_KEYSET, DASHBOARD_LIST_LIMIT,
+            )
+            pending = serialize(pending, cursor.description)
+            consultations, consultations_next = first_page(
+                cursor, DOCTOR_CONSULTATIONS_SQL, (d_id,), CONSULTATION_KEYSET, DASHBOARD_LIST_LIMIT
+            )
+            consultations = serialize(consultations, cursor.description)
+        finally:
+            cursor.close()
+
+    return jsonify({
+        "doctor": doctor,
+        "date": day.isoformat(),
+        "appointments": appointments,
+        "pending_consultations": pending,
+        "pending_consultations_next_cursor": pending_next,
+        "consultations": consultations,
+        "consultations_next_cursor": consultations_next,
     })
 
+
+@app.route("/doctors/<int:d_id>/pending_consultations", methods=["GET"])
+def get_doctor_pending_consultations(d_id):
+    """Completed appointments still without a consultation, newest first,
+    DASHBOARD_LIST_LIMIT per page (?limit=&after=)."""
+    try:
+        with db_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            rows, next_cursor = fetch_page(
+                cursor,
+                schema.sql(conn, DOCTOR_PENDING_SELECT),
+                DOCTOR_PENDING_KEYSET,
+                ([schema.sql(conn, DOCTOR_PENDING_WHERE)], [d_id]),
+                default_limit=DASHBOARD_LIST_LIMIT,
+            )
+            rows = serialize(rows, cursor.description)
+            cursor.close()
+    except PageError as e:
+        return jsonify({"error": str(e)}), 400
+    return page_response(rows, next_cursor)
+
+# ----------------------------
+# EXPORT ROUTES (admin)
+# ----------------------------
+# Streamed straight from an unbuffered cursor (see streaming.py), so memory use
+# doesn't grow with table size. Same filters as the matching list endpoints.
+def _export(select_sql, filter_spec, keyset, filename):
+    # Placeholders stay in: the stream fills them on its own connection (one pool slot per export)
+    clauses, params = build_filters(filter_spec)
+    sql = select_sql
+    if clauses:
+        sql += "\nWHERE " + "\n  AND ".join(clauses)
+    sql += "\n" + keyset.order_by()
+    return stream_json(sql, tuple(params), filename=filename)
+
+
+@app.route("/export/appointments", methods=["GET"])
+def export_appointments():
+    return _export("""
+        SELECT a.a_id AS id,
+               p.p_name AS patient,
+               d.d_name AS doctor,
+               a.date,
+               a.time,
+               a.{a_status} AS status,
+               COALESCE(q.token_no, 0) AS token_no
+        FROM appointment a
+        JOIN patient p ON a.p_id = p.p_id
+        JOIN doctor d ON a.d_id = d.d_id
+        LEFT JOIN queue q ON a.a_id = q.a_id
+    """, APPOINTMENT_FILTERS, APPOINTMENT_KEYSET, "appointments.json")
+
+
+@app.route("/export/consultations", methods=["GET"])
+def export_consultations():
+    return _export("""
+        SELECT c.c_id AS id,
+               c.a_id,
+               p.p_name AS patient,
+               d.d_name AS doctor,
+               a.date,
+               c.symptoms,
+               c.prescription
+        FROM consultation c
+        JOIN appointment a ON c.a_id = a.a_id
+        JOIN patient p ON a.p_id = p.p_id
+        JOIN doctor d ON a.d_id = d.d_id
+    """, {
+        "date_from": ("a.date >= %s", parse_date_arg),
+        "date_to": ("a.date <= %s", parse_date_arg),
+        "doctor": ("a.d_id = %s", parse_int_arg),
+        "patient": ("a.p_id = %s", parse_int_arg),
+    }, Keyset(("a.date", "DESC", "date"), ("c.c_id", "DESC", "id")), "consultations.json")
+
+
+@app.route("/export/billing", methods=["GET"])
+def export_billing():
+    return _export("SELECT * FROM billing", {
+        "appointment": ("a_id = %s", parse_int_arg),
+        "status": ("payment_status = %s", None),
+    }, Keyset(("b_id", "ASC", "b_id")), "billing.json")
+
+
 # ----------------------------
 # RUN SERVER
 # ----------------------------
 if __name__ == '__main__':
+   # The debug reloader also runs this block in its file-watcher process;
+   # only the serving child should schedule background jobs.
+   configure_logging(default_level="DEBUG")
+   if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+       start_background_jobs()
    app.run(debug=True, port=5050)
 
@@ -0,0 +1,407 @@
+"""Asyncio serving mode for the read-heavy polling endpoints.
+
+The Flask app blocks one thread per request while MySQL answers, so a few
+hundred patients polling their queue position need a few hundred threads.
+This app serves the same responses from a single event loop on
+mysql.connector.aio, and issues independent reads of one request
+concurrently (asyncio.gather) on separate pooled connections:
+
+    GET /queue/live[?doctor=<d_id>]
+    GET /queue/patient/<p_id>
+    GET /doctors/<d_id>/available_slots?date=... | ?from=...&to=...
+    GET /get_patient_data?p_id=...
+    GET /events/queue[?doctor=&patient=&slot=]
+
+/events/queue is the same stream as app.py's, but an open stream here is a
+suspended coroutine rather than a held worker thread, so any number of
+dashboards can stay connected. It reads the events app.py relays through
+the `queue_event` table, so run app.py with MEDIQUEUE_EVENT_RELAY=mysql
+(server.py's default with several workers).
+
+Everything else (bookings, login, admin) stays on app.py; route the paths
+above to this process at the proxy. It needs Quart and an ASGI server,
+which are optional:
+
+    pip install quart hypercorn
+    hypercorn async_app:app --bind 0.0.0.0:5051
+
+The async pool takes MEDIQUEUE_DB_* like db.py; MEDIQUEUE_ASYNC_POOL_SIZE
+(default 10, max 32) sets its size. It never writes: an appointment that
+has no queue row yet is reported as Waiting, and app.py (or the next
+booking) creates the row.
+"""
+import asyncio
+import os
+from collections import deque
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timedelta
+
+import mysql.connector
+from mysql.connector.aio.pooling import MySQLConnectionPool
+
+import schema
+from app import (
+    PATIENT_DATA_SQL,
+    PATIENT_QUEUE_SQL,
+    _patient_queue_payload,
+    live_queue_payload,
+    live_queue_query,
+    patient_data_payload,
+)
+from db import DB_CONFIG, POOL_TIMEOUT, DatabaseUnavailable
+from events import (
+    HEARTBEAT_SECONDS,
+    HISTORY_SIZE,
+    KEEPALIVE,
+    RELAY_BATCH,
+    RELAY_POLL_SECONDS,
+    RELAY_READ_SQL,
+    RELAY_START_SQL,
+    RESYNC,
+    RelayPosition,
+    resume_from,
+    sse_event,
+    stream_preamble,
+    subscription_topics,
+)
+from log_config import get_logger
+from serializer import as_date, as_time, serialize
+from slots import MAX_RANGE_DAYS, SLOT_MINUTES, available_slots, slot_counts, slot_counts_query, slot_start_for, slot_window
+
+try:
+    from quart import Quart, Response, jsonify, request
+except ImportError:  # optional dependency, see the module docstring
+    Quart = None
+
+POOL_SIZE = max(1, min(32, int(os.environ.get("MEDIQUEUE_ASYNC_POOL_SIZE", "10"))))
+POOL_NAME = "mediqueue-aio"
+
+log = get_logger("async_app")
+
+
+# ----------------------------
+# POOL
+# ----------------------------
+class AsyncPool:
+    """mysql.connector.aio pool that waits (up to POOL_TIMEOUT) for a free connection.
+
+    Like db.py's pool, the connector fails at once when every connection is
+    out; the semaphore queues callers instead.
+    """
+
+    def __init__(self, size=POOL_SIZE, timeout=POOL_TIMEOUT):
+        self.size = size
+        self.timeout = timeout
+        self._pool = None
+        self._slots = asyncio.Semaphore(size)
+        self._init_lock = asyncio.Lock()
+
+    async def _ensure_pool(self):
+        if self._pool is None:
+            async with self._init_lock:
+                if self._pool is None:
+                    pool = MySQLConnectionPool(pool_size=self.size, pool_name=POOL_NAME, **DB_CONFIG)
+                    await pool.initialize_pool()
+                    self._pool = pool
+        return self._pool
+
+    @asynccontextmanager
+    async def connection(self):
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            raise DatabaseUnavailable(f"No free async connection within {self.timeout}s")
+        try:
+            try:
+                conn = await (await self._ensure_pool()).get_connection()
+            except mysql.connector.Error as e:
+                raise DatabaseUnavailable(str(e)) from e
+            try:
+                yield conn
+            finally:
+                await conn.close()
+        finally:
+            self._slots.release()
+
+    async def fetchall(self, sql, params):
+        """Run one read on its own connection and return its rows as dicts."""
+        async with self.connection() as conn:
+            cursor = await conn.cursor(dictionary=True)
+            try:
+                await cursor.execute(sql, params)
+                return await cursor.fetchall()
+            finally:
+                await cursor.close()
+
+    async def fetchone(self, sql, params):
+        rows = await self.fetchall(sql, params)
+        return rows[0] if rows else None
+
+    async def close(self):
+        if self._pool is not None:
+            await self._pool.close_pool()
+            self._pool = None
+
+
+# ----------------------------
+# EVENT FEED
+# ----------------------------
+class EventFeed:
+    """Queue events relayed through `queue_event`, fanned out to this process's streams.
+
+    One task polls the table every RELAY_POLL_SECONDS, however many streams
+    are open; each stream waits on a condition for events on its topics.
+    """
+
+    def __init__(self, db, poll_seconds=RELAY_POLL_SECONDS, history_size=HISTORY_SIZE):
+        self.db = db
+        self.poll_seconds = poll_seconds
+        self.position = None
+        self.closed = False
+        self._history = deque(maxlen=history_size)  # (seq, topics, payload)
+        self._horizon = 0  # events up to this seq may be missing from the history
+        self._cond = asyncio.Condition()
+        self._task = None
+
+    @property
+    def last_id(self):
+        return self.position.last if self.position is not None else 0
+
+    async def _read(self, sql, params):
+        async with self.db.connection() as conn:
+            cursor = await conn.cursor()
+            try:
+                await cursor.execute(sql, params)
+                rows = await cursor.fetchall()
+                await conn.rollback()  # end the read snapshot so the next poll sees new commits
+                return rows
+            finally:
+                await cursor.close()
+
+    async def poll(self):
+        """Read new rows and wake the streams they concern; return how many events went out."""
+        if self.position is None:
+            (last, step), = await self._read(RELAY_START_SQL, ())
+            self.position = RelayPosition(int(last), int(step))
+            self._horizon = self.position.last
+            return 0
+        events = self.position.accept(await self._read(RELAY_READ_SQL, (self.position.last, RELAY_BATCH)))
+        if events:
+            async with self._cond:
+                for event in events:
+                    if len(self._history) == self._history.maxlen:
+                        self._horizon = self._history[0][0]
+                    self._history.append(event)
+                self._cond.notify_all()
+        return len(events)
+
+    async def _run(self):
+        while not self.closed:
+            try:
+                await self.poll()
+            except (mysql.connector.Error, DatabaseUnavailable) as e:
+                log.error("Cannot poll queue events: %s", e)
+            await asyncio.sleep(self.poll_seconds)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self.closed = False
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        self.closed = True
+        async with self._cond:
+            self._cond.notify_all()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _pending(self, topics, after):
+        return [(seq, payload) for seq, event_topics, payload in self._history
+                if seq > after and event_topics & topics]
+
+    async def wait(self, topics, after, timeout=HEARTBEAT_SECONDS):
+        """Return events on `topics` newer than `after`, waiting up to `timeout` seconds for one."""
+        async with self._cond:
+            try:
+                await asyncio.wait_for(
+                    self._cond.wait_for(lambda: self.closed or self._pending(topics, after)), timeout
+                )
+            except asyncio.TimeoutError:
+                pass
+            return self._pending(topics, after)
+
+    async def stream(self, topics, after=None):
+        """Yield Server-Sent Events for `topics` until the client goes away or the feed closes."""
+        topics = frozenset(topics)
+        last, resync = resume_from(after, self.last_id, self._horizon)
+        yield stream_preamble(last)
+        if resync:
+            yield sse_event(last, RESYNC)
+        while not self.closed:
+            events = await self.wait(topics, last)
+            if last < self._horizon:
+                last = self.last_id
+                yield sse_event(last, RESYNC)
+                continue
+            if not events:
+                yield KEEPALIVE
+                continue
+            for seq, payload in events:
+                last = seq
+                yield sse_event(seq, payload)
+
+
+def resolve_schema():
+    """Read the status column names once, on a short-lived sync connection."""
+    conn = mysql.connector.connect(**DB_CONFIG)
+    try:
+        return schema.refresh(conn)
+    finally:
+        conn.close()
+
+
+# ----------------------------
+# APP
+# ----------------------------
+def create_app():
+    if Quart is None:
+        raise RuntimeError("async_app needs Quart: pip install quart hypercorn")
+
+    api = Quart(__name__)
+    db = AsyncPool()
+    feed = EventFeed(db)
+    columns = {}
+
+    @api.before_serving
+    async def startup():
+        columns.update(await asyncio.to_thread(resolve_schema))
+        feed.start()
+
+    @api.after_serving
+    async def shutdown():
+        await feed.close()
+        await db.close()
+
+    @api.errorhandler(DatabaseUnavailable)
+    async def database_unavailable(e):
+        log.error("Database connection error: %s", e)
+        return jsonify({"error": "Database connection failed"}), 500
+
+    @api.route("/queue/live", methods=["GET"])
+    async def get_live_queue():
+        now = datetime.now()
+        today = now.date()
+        slot_start, slot_end = slot_window(today, now.time())
+        sql, params = live_queue_query(today, slot_start, slot_end, request.args.get("doctor", type=int))
+        rows = await db.fetchall(sql.format(**columns), params)
+        return jsonify(live_queue_payload(now, slot_start, slot_end, rows))
+
+    @api.route("/queue/patient/<int:p_id>", methods=["GET"])
+    async def get_patient_queue_status(p_id):
+        now = datetime.now()
+        target = await db.fetchone(PATIENT_QUEUE_SQL.format(**columns), {
+            "p_id": p_id,
+            "today": now.date(),
+            "slot_start": slot_start_for(now.time()),
+            "slot_seconds": SLOT_MINUTES * 60,
+        })
+        if not target:
+            return jsonify({"inQueue": False})
+        return jsonify(_patient_queue_payload(
+            target["appointment_id"],
+            as_date(target["appointment_date"]),
+            as_time(target["appointment_time"]),
+            target["appointment_status"],
+            target["doctor_id"],
+            target["d_name"],
+            target["queue_status"],
+            target["q_id"],
+            int(target["ahead_count"]),
+            bool(target["is_first_in_slot"]),
+        ))
+
+    @api.route("/doctors/<int:d_id>/available_slots", methods=["GET"])
+    async def get_available_slots(d_id):
+        if request.args.get("from") or request.args.get("to"):
+            return await _available_slots_range(d_id)
+
+        query_date = request.args.get("date")
+        if not query_date:
+            return jsonify({"error": "Missing required query param: date"}), 400
+        try:
+            day = datetime.strptime(query_date, "%Y-%m-%d").date()
+        except ValueError:
+            return jsonify({"error": "Invalid date format. Use YYYY-MM-DD"}), 400
+        if day < date.today():
+            return jsonify({
+                "date": query_date,
+                "doctor_id": d_id,
+                "slots": [],
+                "message": "Cannot book appointments for past dates"
+            })
+
+        counts = slot_counts(await db.fetchall(*slot_counts_query(d_id, day, day, columns)))
+        return jsonify({"date": query_date, "doctor_id": d_id, "slots": available_slots(day, counts)})
+
+    async def _available_slots_range(d_id):
+        try:
+            start_day = datetime.strptime(request.args.get("from", ""), "%Y-%m-%d").date()
+            end_day = datetime.strptime(request.args.get("to", ""), "%Y-%m-%d").date()
+        except ValueError:
+            return jsonify({"error": "Invalid date range. Use from=YYYY-MM-DD&to=YYYY-MM-DD"}), 400
+        if end_day < start_day:
+            return jsonify({"error": "'to' must not be before 'from'"}), 400
+        if (end_day - start_day).days >= MAX_RANGE_DAYS:
+            return jsonify({"error": f"Date range is limited to {MAX_RANGE_DAYS} days"}), 400
+
+        query_start = max(start_day, date.today())
+        counts = {}
+        if query_start <= end_day:
+            counts = slot_counts(await db.fetchall(*slot_counts_query(d_id, query_start, end_day, columns)))
+        now = datetime.now()
+        days = [start_day + timedelta(days=n) for n in range((end_day - start_day).days + 1)]
+        return jsonify({
+            "doctor_id": d_id,
+            "from": start_day.isoformat(),
+            "to": end_day.isoformat(),
+            "days": [{"date": day.isoformat(), "slots": available_slots(day, counts, now)} for day in days],
+        })
+
+    @api.route("/get_patient_data", methods=["GET"])
+    async def get_patient_data():
+        p_id = request.args.get("p_id")
+        # Independent reads: run them side by side on separate connections
+        results = await asyncio.gather(*(
+            db.fetchall(sql.format(**columns), (p_id,)) for sql in PATIENT_DATA_SQL.values()
+        ))
+        return jsonify(patient_data_payload(*(serialize(rows) for rows in results)))
+
+    @api.route("/events/queue", methods=["GET"])
+    async def queue_events():
+        """Stream queue changes as Server-Sent Events; same parameters as app.py's /events/queue."""
+        last_id = request.headers.get("Last-Event-ID", type=int)
+        response = Response(
+            feed.stream(subscription_topics(request.args), last_id),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+        response.timeout = None  # the stream stays open until the client leaves
+        return response
+
+    api.db = db
+    api.feed = feed
+    return api
+
+
+app = create_app() if Quart is not None else None
+
+
+if __name__ == "__main__":
+    if app is None:
+        raise SystemExit("async_app needs Quart: pip install quart hypercorn")
+    app.run(port=5051)
@@ -0,0 +1,173 @@
+"""Sync (Flask, thread per request) versus async (async_app.py) at high concurrency.
+
+Sends the same --requests GETs per endpoint through both apps' test
+clients. The sync app runs --concurrency threads over its pool, as a
+threaded server would. The async app runs --concurrency tasks on one event
+loop over the async pool. Both report throughput and latency percentiles.
+The in-memory live queue is not built, so both apps answer /queue/live
+from MySQL.
+
+    python benchmarks/async_benchmark.py --concurrency 200 --requests 5000
+
+Needs Quart (pip install quart) and a seeded `clinic` database; the
+MEDIQUEUE_DB_* variables select the server. Each side is limited by its own
+pool: MEDIQUEUE_DB_POOL_SIZE for sync, MEDIQUEUE_ASYNC_POOL_SIZE for async.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import app as sync_api  # noqa: E402
+import async_app  # noqa: E402
+import schema  # noqa: E402
+from db import POOL_SIZE, db_connection  # noqa: E402
+from endpoint_benchmark import Fixtures, percentile  # noqa: E402
+
+# Each endpoint returns the path of one GET
+ENDPOINTS = {
+    "queue_live": lambda fx, rng: "/queue/live",
+    "queue_patient": lambda fx, rng: f"/queue/patient/{rng.choice(fx.patients)}",
+    "available_slots": lambda fx, rng: f"/doctors/{rng.choice(fx.doctors)}/available_slots?date={fx.today}",
+    "patient_data": lambda fx, rng: f"/get_patient_data?p_id={rng.choice(fx.patients)}",
+}
+
+
+def summarize(latencies, errors, elapsed):
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "requests_per_s": round(len(latencies) / elapsed, 1) if elapsed else None,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50), 3),
+            "p95": round(percentile(latencies, 95), 3),
+            "p99": round(percentile(latencies, 99), 3),
+        },
+    }
+
+
+def run_sync(paths, concurrency):
+    lock = threading.Lock()
+    next_index = [0]
+    latencies = []
+    errors = [0]
+
+    def worker():
+        client = sync_api.app.test_client()
+        while True:
+            with lock:
+                i = next_index[0]
+                next_index[0] += 1
+            if i >= len(paths):
+                break
+            started = time.perf_counter()
+            status = client.get(paths[i]).status_code
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            with lock:
+                latencies.append(elapsed_ms)
+                errors[0] += status >= 500
+
+    pool = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return summarize(latencies, errors[0], time.perf_counter() - started)
+
+
+async def run_async(api, paths, concurrency):
+    client = api.test_client()
+    queue = asyncio.Queue()
+    for path in paths:
+        queue.put_nowait(path)
+    latencies = []
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        while not queue.empty():
+            path = queue.get_nowait()
+            started = time.perf_counter()
+            response = await client.get(path)
+            latencies.append((time.perf_counter() - started) * 1000)
+            errors += response.status_code >= 500
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+
+async def run_async_side(plans, concurrency, warmup):
+    api = async_app.create_app()
+    results = {}
+    async with api.test_app():  # runs before_serving / after_serving
+        for name, paths in plans.items():
+            if warmup:
+                await run_async(api, paths[:warmup], concurrency)
+            results[name] = await run_async(api, paths, concurrency)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS), help="comma-separated subset to run")
+    parser.add_argument("--concurrency", type=int, default=200, help="threads (sync) and tasks (async)")
+    parser.add_argument("--requests", type=int, default=5000, help="requests per endpoint and side")
+    parser.add_argument("--warmup", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write the JSON report here as well as to stdout")
+    args = parser.parse_args()
+
+    if async_app.Quart is None:
+        raise SystemExit("async_benchmark needs Quart: pip install quart")
+    names = [name.strip() for name in args.endpoints.split(",") if name.strip()]
+    unknown = set(names) - set(ENDPOINTS)
+    if unknown:
+        parser.error(f"unknown endpoint(s): {', '.join(sorted(unknown))}")
+
+    with db_connection() as conn:
+        schema.refresh(conn)
+    fixtures = Fixtures(offset_days=0, days=1)
+    rng = random.Random(args.seed)
+    # Both sides get the identical request sequence
+    plans = {name: [ENDPOINTS[name](fixtures, rng) for _ in range(args.requests)] for name in names}
+
+    sync_results = {}
+    for name, paths in plans.items():
+        if args.warmup:
+            run_sync(paths[:args.warmup], args.concurrency)
+        sync_results[name] = run_sync(paths, args.concurrency)
+    async_results = asyncio.run(run_async_side(plans, args.concurrency, args.warmup))
+
+    report = {
+        "concurrency": args.concurrency,
+        "requests": args.requests,
+        "sync_pool_size": POOL_SIZE,
+        "async_pool_size": async_app.POOL_SIZE,
+        "endpoints": {
+            name: {
+                "sync": sync_results[name],
+                "async": async_results[name],
+                "speedup": round(async_results[name]["requests_per_s"] / sync_results[name]["requests_per_s"], 2),
+            }
+            for name in names
+        },
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
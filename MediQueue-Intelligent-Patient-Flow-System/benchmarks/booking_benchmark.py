@@ -0,0 +1,196 @@
+"""Concurrent booking benchmark for the slot reservation engine.
+
+Hammers reserve_and_book() from many threads against a range of far-future
+dates, then checks that no slot was oversubscribed and no token repeated.
+
+    python benchmarks/booking_benchmark.py --threads 32 --attempts 5000
+
+Needs a seeded `clinic` database (run database.py first); the MEDIQUEUE_DB_*
+variables select the server. Rows created by the run are removed afterwards
+unless --keep is given.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from db import db_connection  # noqa: E402
+from reservations import SlotFull, reserve_and_book  # noqa: E402
+from slots import SLOT_CAPACITY, day_slots  # noqa: E402
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run(args):
+    first_day = date.today() + timedelta(days=args.offset_days)
+    days = [first_day + timedelta(days=i) for i in range(args.days)]
+    slot_starts = [start for start, _ in day_slots()]
+    rng = random.Random(args.seed)
+    targets = [(rng.choice(days), rng.choice(slot_starts)) for _ in range(args.attempts)]
+
+    lock = threading.Lock()
+    next_index = [0]
+    results = {"booked": 0, "full": 0, "errors": 0}
+    latencies = []
+
+    def worker():
+        while True:
+            with lock:
+                i = next_index[0]
+                next_index[0] += 1
+            if i >= len(targets):
+                return
+            day, slot_start = targets[i]
+            started = time.perf_counter()
+            outcome = "booked"
+            try:
+                with db_connection() as conn:
+                    reserve_and_book(conn, args.patient, args.doctor, day, slot_start)
+            except SlotFull:
+                outcome = "full"
+            except Exception as e:
+                outcome = "errors"
+                print("❌ Booking failed:", e)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            with lock:
+                results[outcome] += 1
+                latencies.append(elapsed_ms)
+
+    threads = [threading.Thread(target=worker) for _ in range(args.threads)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    report = {
+        "threads": args.threads,
+        "attempts": args.attempts,
+        "slots_targeted": len(days) * len(slot_starts),
+        "elapsed_s": round(elapsed, 3),
+        "attempts_per_s": round(args.attempts / elapsed, 1),
+        "bookings_per_s": round(results["booked"] / elapsed, 1),
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50), 3),
+            "p95": round(percentile(latencies, 95), 3),
+            "p99": round(percentile(latencies, 99), 3),
+        },
+        **results,
+    }
+    report.update(verify(args.doctor, days[0], days[-1]))
+    if not args.keep:
+        cleanup(args.doctor, days[0], days[-1])
+    return report
+
+
+def verify(d_id, first_day, last_day):
+    """Count oversubscribed slots, duplicate tokens and drifted counters in the range."""
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            SELECT COUNT(*) FROM (
+                SELECT a.date, HOUR(a.time) AS h, FLOOR(MINUTE(a.time) / 30) AS half
+                FROM appointment a
+                WHERE a.d_id = %s AND a.date BETWEEN %s AND %s
+                  AND a.status IN ('Scheduled','Waiting')
+                GROUP BY a.date, h, half
+                HAVING COUNT(*) > %s
+            ) oversubscribed
+            """,
+            (d_id, first_day, last_day, SLOT_CAPACITY),
+        )
+        overbooked_slots = cursor.fetchone()[0]
+        cursor.execute(
+            """
+            SELECT COUNT(*) FROM (
+                SELECT a.date, HOUR(a.time) AS h, FLOOR(MINUTE(a.time) / 30) AS half, q.token_no
+                FROM queue q
+                JOIN appointment a ON a.a_id = q.a_id
+                WHERE a.d_id = %s AND a.date BETWEEN %s AND %s
+                GROUP BY a.date, h, half, q.token_no
+                HAVING COUNT(*) > 1
+            ) duplicated
+            """,
+            (d_id, first_day, last_day),
+        )
+        duplicate_tokens = cursor.fetchone()[0]
+        cursor.execute(
+            """
+            SELECT COUNT(*)
+            FROM slot_reservation r
+            WHERE r.d_id = %s AND r.date BETWEEN %s AND %s
+              AND r.booked <> (
+                SELECT COUNT(*) FROM appointment a
+                WHERE a.d_id = r.d_id AND a.date = r.date
+                  AND a.time >= r.slot_start
+                  AND a.time < ADDTIME(r.slot_start, '00:30:00')
+                  AND a.status IN ('Scheduled','Waiting')
+              )
+            """,
+            (d_id, first_day, last_day),
+        )
+        drifted_counters = cursor.fetchone()[0]
+        cursor.close()
+    return {
+        "overbooked_slots": overbooked_slots,
+        "duplicate_tokens": duplicate_tokens,
+        "drifted_counters": drifted_counters,
+    }
+
+
+def cleanup(d_id, first_day, last_day):
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            DELETE q FROM queue q JOIN appointment a ON a.a_id = q.a_id
+            WHERE a.d_id = %s AND a.date BETWEEN %s AND %s
+            """,
+            (d_id, first_day, last_day),
+        )
+        cursor.execute(
+            "DELETE FROM appointment WHERE d_id = %s AND date BETWEEN %s AND %s",
+            (d_id, first_day, last_day),
+        )
+        cursor.execute(
+            "DELETE FROM slot_reservation WHERE d_id = %s AND date BETWEEN %s AND %s",
+            (d_id, first_day, last_day),
+        )
+        conn.commit()
+        cursor.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--attempts", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=7, help="number of days to spread bookings over")
+    parser.add_argument("--offset-days", type=int, default=3650, help="how far in the future the run books")
+    parser.add_argument("--doctor", type=int, default=1)
+    parser.add_argument("--patient", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--keep", action="store_true", help="leave the booked rows in place")
+    args = parser.parse_args()
+
+    report = run(args)
+    print(json.dumps(report, indent=2))
+    ok = report["overbooked_slots"] == 0 and report["duplicate_tokens"] == 0 and report["drifted_counters"] == 0
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
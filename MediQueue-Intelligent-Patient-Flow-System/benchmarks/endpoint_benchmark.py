@@ -0,0 +1,248 @@
+"""Endpoint benchmark: drives the hot API routes through Flask's test client.
+
+Each scenario sends --requests requests from --threads threads (one test
+client per thread) against the real app and database, and reports
+throughput, latency percentiles, status codes and SQL statements per request.
+The statement counts come from the Server-Timing header added by
+sql_trace.py, so MEDIQUEUE_SQL_TRACE must stay enabled.
+
+    python benchmarks/endpoint_benchmark.py --threads 8 --requests 2000 --output bench.json
+    python benchmarks/endpoint_benchmark.py --scenarios queue_live,queue_patient --baseline bench.json
+
+Scenarios: queue_live, queue_patient, available_slots, book_appointment,
+appointments, send_otp. Bookings go to far-future dates (--offset-days) and
+are deleted through DELETE /appointments/<id> afterwards unless --keep is
+given. --baseline compares against an earlier JSON report.
+
+Needs a seeded `clinic` database with migrations applied; the MEDIQUEUE_DB_*
+variables select the server. Keep --threads at or below MEDIQUEUE_DB_POOL_SIZE.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import app as api  # noqa: E402
+import schema  # noqa: E402
+import sql_trace  # noqa: E402
+from db import POOL_SIZE, db_connection  # noqa: E402
+from slots import day_slots  # noqa: E402
+
+SERVER_TIMING_DB = re.compile(r'db;dur=([\d.]+);desc="(\d+) statements')
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+# ----------------------------
+# FIXTURES
+# ----------------------------
+class Fixtures:
+    """Existing ids to aim requests at, loaded once before the run."""
+
+    def __init__(self, offset_days, days):
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT p_id, contact FROM patient WHERE contact IS NOT NULL LIMIT 2000")
+            rows = cursor.fetchall()
+            cursor.execute("SELECT d_id FROM doctor")
+            self.doctors = [d_id for (d_id,) in cursor.fetchall()]
+            cursor.close()
+        if not rows or not self.doctors:
+            raise SystemExit("The database needs at least one patient and one doctor (run database.py)")
+        self.patients = [p_id for p_id, _ in rows]
+        self.contacts = [contact for _, contact in rows]
+        self.today = date.today().isoformat()
+        first_day = date.today() + timedelta(days=offset_days)
+        self.booking_days = [(first_day + timedelta(days=i)).isoformat() for i in range(days)]
+        self.slot_times = [start.strftime("%H:%M") for start, _ in day_slots()]
+
+
+# Each scenario returns (method, path, json body or None) for one request
+SCENARIOS = {
+    "queue_live": lambda fx, rng: ("GET", "/queue/live", None),
+    "queue_patient": lambda fx, rng: ("GET", f"/queue/patient/{rng.choice(fx.patients)}", None),
+    "available_slots": lambda fx, rng: (
+        "GET", f"/doctors/{rng.choice(fx.doctors)}/available_slots?date={fx.today}", None,
+    ),
+    "book_appointment": lambda fx, rng: ("POST", "/book_appointment", {
+        "p_id": rng.choice(fx.patients),
+        "d_id": rng.choice(fx.doctors),
+        "date": rng.choice(fx.booking_days),
+        "time": rng.choice(fx.slot_times),
+    }),
+    "appointments": lambda fx, rng: ("GET", "/appointments?limit=50", None),
+    "send_otp": lambda fx, rng: ("POST", "/send_otp", {"contact": rng.choice(fx.contacts)}),
+}
+
+
+# ----------------------------
+# RUNNER
+# ----------------------------
+def run_scenario(name, fixtures, threads, requests, seed, booked):
+    build = SCENARIOS[name]
+    lock = threading.Lock()
+    next_index = [0]
+    latencies = []
+    statements = []
+    db_ms = []
+    statuses = Counter()
+
+    def worker(worker_id):
+        client = api.app.test_client()
+        rng = random.Random(f"{seed}-{name}-{worker_id}")
+        while True:
+            with lock:
+                if next_index[0] >= requests:
+                    break
+                next_index[0] += 1
+            method, path, body = build(fixtures, rng)
+            started = time.perf_counter()
+            response = client.open(path, method=method, json=body)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            timing = SERVER_TIMING_DB.search(response.headers.get("Server-Timing", ""))
+            with lock:
+                latencies.append(elapsed_ms)
+                statuses[response.status_code] += 1
+                if timing:
+                    db_ms.append(float(timing.group(1)))
+                    statements.append(int(timing.group(2)))
+                if name == "book_appointment" and response.status_code == 200:
+                    booked.append(response.get_json()["a_id"])
+
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    started = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "elapsed_s": round(elapsed, 3),
+        "requests_per_s": round(len(latencies) / elapsed, 1) if elapsed else None,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50), 3),
+            "p95": round(percentile(latencies, 95), 3),
+            "p99": round(percentile(latencies, 99), 3),
+            "max": round(latencies[-1], 3) if latencies else 0.0,
+        },
+        "statements_per_request": round(sum(statements) / len(statements), 2) if statements else None,
+        "max_statements": max(statements) if statements else None,
+        "db_ms_per_request": round(sum(db_ms) / len(db_ms), 3) if db_ms else None,
+        "status": {str(code): n for code, n in sorted(statuses.items())},
+    }
+
+
+def cleanup(booked):
+    client = api.app.test_client()
+    failed = sum(client.delete(f"/appointments/{a_id}").status_code != 200 for a_id in booked)
+    if failed:
+        print(f"⚠️ {failed} benchmark appointment(s) could not be deleted", file=sys.stderr)
+
+
+def compare(report, baseline_path):
+    """Per scenario, current / baseline for throughput and p50/p99 (p99 > 1 means slower)."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)["scenarios"]
+    ratios = {}
+    for name, result in report["scenarios"].items():
+        before = baseline.get(name)
+        if not before:
+            continue
+        ratios[name] = {
+            "requests_per_s": round(result["requests_per_s"] / before["requests_per_s"], 3),
+            "p50": round(result["latency_ms"]["p50"] / before["latency_ms"]["p50"], 3),
+            "p99": round(result["latency_ms"]["p99"] / before["latency_ms"]["p99"], 3),
+            "statements_per_request": (result["statements_per_request"], before["statements_per_request"]),
+        }
+    return ratios
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma-separated subset to run")
+    parser.add_argument("--threads", type=int, default=8, help="keep at or below MEDIQUEUE_DB_POOL_SIZE")
+    parser.add_argument("--requests", type=int, default=1000, help="requests per scenario")
+    parser.add_argument("--warmup", type=int, default=50, help="unmeasured requests per scenario")
+    parser.add_argument("--offset-days", type=int, default=400, help="first booking date, in days from today")
+    parser.add_argument("--days", type=int, default=30, help="booking dates to spread over")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write the JSON report here as well as to stdout")
+    parser.add_argument("--baseline", help="earlier JSON report to compare against")
+    parser.add_argument("--keep", action="store_true", help="leave the booked appointments in place")
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(names) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(sorted(unknown))}")
+
+    if not sql_trace.ENABLED:
+        print("⚠️ MEDIQUEUE_SQL_TRACE=0: statements per request will not be reported", file=sys.stderr)
+
+    # What start_background_jobs() would do, without the scheduler thread
+    with db_connection() as conn:
+        schema.refresh(conn)
+        api.live_queue.rebuild(conn)
+    fixtures = Fixtures(args.offset_days, args.days)
+
+    booked = []
+    report = {
+        "meta": {
+            "started_at": datetime.now().isoformat(timespec="seconds"),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "threads": args.threads,
+            "requests": args.requests,
+            "pool_size": POOL_SIZE,
+            "live_queue": api.live_queue.stats()["enabled"],
+        },
+        "scenarios": {},
+    }
+    try:
+        for name in names:
+            if args.warmup:
+                run_scenario(name, fixtures, args.threads, args.warmup, args.seed + 1, booked)
+            report["scenarios"][name] = run_scenario(name, fixtures, args.threads, args.requests, args.seed, booked)
+    finally:
+        if not args.keep:
+            cleanup(booked)
+
+    if args.baseline:
+        report["baseline"] = {"path": args.baseline, "ratios": compare(report, args.baseline)}
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
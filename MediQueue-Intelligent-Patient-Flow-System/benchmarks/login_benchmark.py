@@ -0,0 +1,178 @@
+"""Login lookup benchmark: user_directory versus probing patient/doctor/admin.
+
+Seeds --users synthetic patients (contacts 80xxxxxxxx), then resolves random
+contacts from many threads, once with the single directory lookup send_otp
+uses and once with the old three-table loop, and reports lookups/s and
+latency percentiles for both. A share of the contacts (--miss-ratio) is
+unknown, which is the worst case for the old loop.
+
+    python benchmarks/login_benchmark.py --users 100000 --threads 16 --lookups 20000
+
+Needs a seeded `clinic` database with migrations applied; the MEDIQUEUE_DB_*
+variables select the server. Synthetic users are removed afterwards unless
+--keep is given.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import directory  # noqa: E402
+from db import db_connection  # noqa: E402
+
+BENCH_NAME = "bench-login"
+CONTACT_PREFIX = "80"
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def contact_for(i):
+    return f"{CONTACT_PREFIX}{i:08d}"
+
+
+def seed(users, batch_size):
+    with db_connection() as conn:
+        directory.ensure_directory(conn)
+        cursor = conn.cursor()
+        for start in range(0, users, batch_size):
+            rows = [(BENCH_NAME, 30, "Other", contact_for(i)) for i in range(start, min(users, start + batch_size))]
+            cursor.executemany(
+                "INSERT IGNORE INTO patient (p_name, age, gender, contact) VALUES (%s, %s, %s, %s)", rows
+            )
+            conn.commit()
+        cursor.execute(
+            """
+            INSERT IGNORE INTO user_directory (contact, role, user_id)
+            SELECT contact, 'patient', p_id FROM patient WHERE p_name = %s
+            """,
+            (BENCH_NAME,),
+        )
+        conn.commit()
+        cursor.close()
+
+
+def cleanup():
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            DELETE d FROM user_directory d
+            JOIN patient p ON d.role = 'patient' AND d.user_id = p.p_id
+            WHERE p.p_name = %s
+            """,
+            (BENCH_NAME,),
+        )
+        cursor.execute("DELETE FROM patient WHERE p_name = %s", (BENCH_NAME,))
+        conn.commit()
+        cursor.close()
+
+
+def directory_lookup(cursor, contact):
+    return directory.lookup(cursor, contact)
+
+
+def legacy_lookup(cursor, contact):
+    for role, table, id_column in directory.ROLES:
+        cursor.execute(f"SELECT {id_column} FROM {table} WHERE contact = %s", (contact,))
+        row = cursor.fetchone()
+        if row:
+            return role, row[0]
+    return None
+
+
+def measure(lookup, contacts, threads):
+    lock = threading.Lock()
+    next_index = [0]
+    latencies = []
+    found = [0]
+
+    def worker():
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            while True:
+                with lock:
+                    i = next_index[0]
+                    next_index[0] += 1
+                if i >= len(contacts):
+                    break
+                started = time.perf_counter()
+                hit = lookup(cursor, contacts[i])
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                with lock:
+                    latencies.append(elapsed_ms)
+                    found[0] += hit is not None
+            cursor.close()
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    started = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "elapsed_s": round(elapsed, 3),
+        "lookups_per_s": round(len(contacts) / elapsed, 1),
+        "found": found[0],
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50), 3),
+            "p95": round(percentile(latencies, 95), 3),
+            "p99": round(percentile(latencies, 99), 3),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--threads", type=int, default=16, help="keep at or below MEDIQUEUE_DB_POOL_SIZE")
+    parser.add_argument("--lookups", type=int, default=20000)
+    parser.add_argument("--miss-ratio", type=float, default=0.1, help="share of lookups for unknown contacts")
+    parser.add_argument("--batch", type=int, default=1000, help="rows per INSERT while seeding")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--keep", action="store_true", help="leave the synthetic users in place")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    contacts = [
+        contact_for(args.users + rng.randrange(args.users)) if rng.random() < args.miss_ratio
+        else contact_for(rng.randrange(args.users))
+        for _ in range(args.lookups)
+    ]
+
+    started = time.perf_counter()
+    seed(args.users, args.batch)
+    seeded_s = time.perf_counter() - started
+    try:
+        report = {
+            "users": args.users,
+            "threads": args.threads,
+            "lookups": args.lookups,
+            "miss_ratio": args.miss_ratio,
+            "seed_s": round(seeded_s, 3),
+            "directory": measure(directory_lookup, contacts, args.threads),
+            "legacy": measure(legacy_lookup, contacts, args.threads),
+        }
+    finally:
+        if not args.keep:
+            cleanup()
+    report["speedup"] = round(report["directory"]["lookups_per_s"] / report["legacy"]["lookups_per_s"], 2)
+    print(json.dumps(report, indent=2))
+    # Both strategies must agree on which contacts exist
+    sys.exit(0 if report["directory"]["found"] == report["legacy"]["found"] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""Micro-benchmark: row serialization for large list responses, old versus new.
+
+Builds --rows synthetic rows shaped like an /appointments page (ints,
+strings, DATE, TIME as timedelta, a DECIMAL and some NULLs) and times, over
+--repeat runs:
+
+    legacy   convert_dates (isinstance on every cell) + Flask's stdlib encoder
+    plan     serializer.serialize with a cursor.description plan + the same encoder
+    fast     serializer.serialize + FastJSONProvider (orjson when installed)
+
+    python benchmarks/serializer_benchmark.py --rows 50000 --repeat 7
+
+Reports the median conversion, encoding and total time per run, the total
+per row, and the peak memory of one run (tracemalloc), as JSON. Needs no
+database.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from flask import Flask  # noqa: E402
+from flask.json.provider import DefaultJSONProvider  # noqa: E402
+from mysql.connector import FieldType  # noqa: E402
+
+import serializer  # noqa: E402
+
+# name, FieldType, as a dictionary cursor would describe an /appointments row plus a billing amount
+DESCRIPTION = [
+    ("id", FieldType.LONG),
+    ("patient", FieldType.VAR_STRING),
+    ("doctor", FieldType.VAR_STRING),
+    ("date", FieldType.DATE),
+    ("time", FieldType.TIME),
+    ("status", FieldType.STRING),
+    ("token_no", FieldType.LONGLONG),
+    ("amount", FieldType.NEWDECIMAL),
+]
+
+
+def legacy_convert_dates(rows):
+    """The helper serializer.py replaced, kept here as the baseline."""
+    for row in rows:
+        for key, value in row.items():
+            if isinstance(value, (date, datetime, timedelta)):
+                row[key] = str(value)
+    return rows
+
+
+def make_rows(count, seed):
+    rng = random.Random(seed)
+    start = date(2026, 1, 1)
+    statuses = ("Scheduled", "Waiting", "Completed", "Cancelled")
+    return [
+        {
+            "id": i,
+            "patient": f"Patient {rng.randrange(100000)}",
+            "doctor": f"Dr. {rng.choice('ABCDEFGH')}",
+            "date": start + timedelta(days=rng.randrange(365)),
+            "time": timedelta(hours=rng.randrange(9, 18), minutes=rng.choice((0, 10, 20, 30, 40, 50))),
+            "status": rng.choice(statuses),
+            "token_no": rng.randrange(1, 6) if rng.random() > 0.1 else None,
+            "amount": Decimal(rng.randrange(20000)) / 100 if rng.random() > 0.3 else None,
+        }
+        for i in range(count)
+    ]
+
+
+def make_variants():
+    """name -> (convert rows, Flask app whose JSON provider encodes them)."""
+    stdlib_app = Flask("legacy")
+    stdlib_app.json = DefaultJSONProvider(stdlib_app)
+    fast_app = Flask("fast")
+    serializer.install(fast_app)
+    return {
+        "legacy": (legacy_convert_dates, stdlib_app),
+        "plan": (lambda rows: serializer.serialize(rows, DESCRIPTION), stdlib_app),
+        "fast": (lambda rows: serializer.serialize(rows, DESCRIPTION), fast_app),
+    }
+
+
+def run_once(convert, app, rows):
+    started = time.perf_counter()
+    data = convert(rows)
+    converted = time.perf_counter()
+    with app.app_context():
+        body = app.json.response(data).get_data()
+    return converted - started, time.perf_counter() - converted, body
+
+
+def measure(convert, app, rows_count, seed, repeat):
+    convert_times, encode_times = [], []
+    body = None
+    for _ in range(repeat):
+        rows = make_rows(rows_count, seed)  # fresh rows: serialization converts in place
+        convert_s, encode_s, body = run_once(convert, app, rows)
+        convert_times.append(convert_s)
+        encode_times.append(encode_s)
+
+    rows = make_rows(rows_count, seed)
+    tracemalloc.start()
+    run_once(convert, app, rows)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    total = statistics.median(c + e for c, e in zip(convert_times, encode_times))
+    return {
+        "convert_ms": round(statistics.median(convert_times) * 1000, 3),
+        "encode_ms": round(statistics.median(encode_times) * 1000, 3),
+        "total_ms": round(total * 1000, 3),
+        "us_per_row": round(total * 1e6 / rows_count, 3),
+        "peak_kib": round(peak / 1024, 1),
+        "body_bytes": len(body),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write the JSON report here as well as to stdout")
+    args = parser.parse_args()
+
+    results = {
+        name: measure(convert, app, args.rows, args.seed, args.repeat)
+        for name, (convert, app) in make_variants().items()
+    }
+    baseline = results["legacy"]["total_ms"]
+    for result in results.values():
+        result["speedup"] = round(baseline / result["total_ms"], 2) if result["total_ms"] else None
+
+    report = {
+        "rows": args.rows,
+        "repeat": args.repeat,
+        "orjson": serializer.orjson is not None,
+        "variants": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
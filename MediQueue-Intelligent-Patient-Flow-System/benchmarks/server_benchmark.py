@@ -0,0 +1,197 @@
+"""Load test: how throughput scales with the number of server.py workers.
+
+For each worker count in --workers, starts `server.py` on a local port,
+waits for /healthz, then has --connections client processes (one
+keep-alive HTTP connection each, so the client is not GIL-bound) send GETs
+for --duration seconds. The GETs are spread over the live queue, patient
+queue status and available slots. It then stops the server with SIGTERM
+(a graceful drain) and moves on.
+
+    python benchmarks/server_benchmark.py --workers 1,2,4,8 --threads 8 --connections 64 --duration 20
+
+Reports requests/s, p50/p95/p99 latency and errors per worker count, plus
+the scaling relative to a single worker, as JSON. Needs gunicorn and a
+seeded `clinic` database; the MEDIQUEUE_DB_* variables select the server
+and are passed on to it.
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import random
+import signal
+import subprocess
+import sys
+import time
+from datetime import date
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from db import DB_CONFIG  # noqa: E402
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def load_ids():
+    import mysql.connector
+
+    conn = mysql.connector.connect(**DB_CONFIG)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT p_id FROM patient LIMIT 2000")
+        patients = [p_id for (p_id,) in cursor.fetchall()]
+        cursor.execute("SELECT d_id FROM doctor")
+        doctors = [d_id for (d_id,) in cursor.fetchall()]
+        cursor.close()
+    finally:
+        conn.close()
+    if not patients or not doctors:
+        raise SystemExit("The database needs at least one patient and one doctor (run database.py)")
+    return patients, doctors
+
+
+def request_paths(patients, doctors, seed, count):
+    rng = random.Random(seed)
+    today = date.today().isoformat()
+    builders = (
+        lambda: "/queue/live",
+        lambda: f"/queue/patient/{rng.choice(patients)}",
+        lambda: f"/doctors/{rng.choice(doctors)}/available_slots?date={today}",
+    )
+    return [rng.choice(builders)() for _ in range(count)]
+
+
+# ----------------------------
+# CLIENT
+# ----------------------------
+def client(port, paths, deadline):
+    """One keep-alive connection sending `paths` in a loop until `deadline`; returns (latencies ms, errors)."""
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    latencies = []
+    errors = 0
+    i = 0
+    while time.time() < deadline:
+        path = paths[i % len(paths)]
+        i += 1
+        started = time.perf_counter()
+        try:
+            conn.request("GET", path)
+            response = conn.getresponse()
+            response.read()
+            ok = response.status < 500
+        except (OSError, http.client.HTTPException):
+            ok = False
+            conn.close()
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        latencies.append((time.perf_counter() - started) * 1000)
+        errors += not ok
+    conn.close()
+    return latencies, errors
+
+
+# ----------------------------
+# SERVER
+# ----------------------------
+def start_server(workers, threads, port):
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "server.py"),
+         "--workers", str(workers), "--threads", str(threads), "--bind", f"127.0.0.1:{port}"],
+        cwd=ROOT,
+    )
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"server.py exited with {process.returncode}")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            conn.request("GET", "/healthz")
+            if conn.getresponse().status == 200:
+                conn.close()
+                return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise SystemExit("server.py did not become healthy within 60s")
+
+
+def stop_server(process):
+    process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(timeout=60)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def run(workers, args, paths_per_client):
+    process = start_server(workers, args.threads, args.port)
+    try:
+        # Warm every worker's pool and caches before measuring
+        warm_deadline = time.time() + args.warmup
+        with multiprocessing.get_context("spawn").Pool(args.connections) as pool:
+            pool.starmap(client, [(args.port, paths, warm_deadline) for paths in paths_per_client])
+            deadline = time.time() + args.duration
+            started = time.perf_counter()
+            results = pool.starmap(client, [(args.port, paths, deadline) for paths in paths_per_client])
+            elapsed = time.perf_counter() - started
+    finally:
+        stop_server(process)
+
+    latencies = sorted(ms for client_latencies, _ in results for ms in client_latencies)
+    return {
+        "workers": workers,
+        "requests": len(latencies),
+        "errors": sum(errors for _, errors in results),
+        "requests_per_s": round(len(latencies) / elapsed, 1),
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50), 3),
+            "p95": round(percentile(latencies, 95), 3),
+            "p99": round(percentile(latencies, 99), 3),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated worker counts to try")
+    parser.add_argument("--threads", type=int, default=8, help="threads per worker")
+    parser.add_argument("--connections", type=int, default=32, help="concurrent client connections")
+    parser.add_argument("--duration", type=float, default=15, help="measured seconds per worker count")
+    parser.add_argument("--warmup", type=float, default=3, help="unmeasured seconds per worker count")
+    parser.add_argument("--port", type=int, default=5099)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write the JSON report here as well as to stdout")
+    args = parser.parse_args()
+
+    worker_counts = [int(n) for n in args.workers.split(",") if n.strip()]
+    patients, doctors = load_ids()
+    paths_per_client = [request_paths(patients, doctors, args.seed + i, 500) for i in range(args.connections)]
+
+    results = [run(workers, args, paths_per_client) for workers in worker_counts]
+    baseline = results[0]["requests_per_s"] / results[0]["workers"]
+    for result in results:
+        # 1.0 = throughput grew linearly with the number of workers
+        result["scaling_efficiency"] = round(result["requests_per_s"] / (baseline * result["workers"]), 3)
+
+    report = {
+        "threads_per_worker": args.threads,
+        "connections": args.connections,
+        "duration_s": args.duration,
+        "cpus": os.cpu_count(),
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
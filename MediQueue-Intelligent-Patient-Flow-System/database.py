@@ -1,6 +1,8 @@
 import mysql.connector
 from datetime import date, datetime, time, timedelta
 
+from migrations import migrate
+
 # ---------- CONNECT TO MYSQL ----------
 conn = mysql.connector.connect(
     host="localhost",
@@ -240,6 +242,10 @@ VALUES ('System Admin', '1234567890');
 
 # ---------- COMMIT & CLOSE ----------
 conn.commit()
+
+# Bring the fresh schema up to the latest migration: indexes and the slot_reservation, user_directory and queue_event tables
+migrate(conn)
+
 cursor.close()
 conn.close()
 
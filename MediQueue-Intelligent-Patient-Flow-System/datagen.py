@@ -0,0 +1,307 @@
+"""Synthetic clinic data at realistic volumes, for benchmarks and plan checks.
+
+Adds doctors, patients and --days of appointment history (plus
+--future-days of bookings) to an existing database created by database.py.
+Unlike database.py nothing is dropped. Every slot of every generated doctor
+is filled to about --fill of SLOT_CAPACITY. Each appointment gets matching
+rows elsewhere:
+
+- past ones are mostly Completed, with a consultation, a bill and a
+  completed queue token;
+- today's and future ones are Scheduled, with a waiting token and a
+  pending bill;
+- a few are Cancelled, without a token.
+
+slot_reservation counters are written for today and later, so the booking
+engine sees the same occupancy.
+
+    python datagen.py --doctors 50 --patients 200000 --days 365 --fill 0.7
+    python datagen.py --method infile ...     LOAD DATA LOCAL INFILE instead of executemany
+
+Rows are written in chunked transactions of --batch appointments. Ids are
+assigned here, continuing from the current maximum, so related rows never
+need reading back. Run it on a quiet database. The same --seed, --anchor and
+parameters give the same data on the same starting database, so benchmark
+runs stay comparable.
+"""
+import argparse
+import csv
+import itertools
+import os
+import random
+import sys
+import tempfile
+import time as _time
+from datetime import date, datetime, time, timedelta
+
+import mysql.connector
+
+import directory
+import schema
+from db import DB_CONFIG
+from reservations import ensure_reservation_table
+from slots import SLOT_CAPACITY, day_slots
+
+FIRST_NAMES = ("Aarav", "Priya", "Rohan", "Ananya", "Vikram", "Isha", "Arjun", "Kavya", "Nikhil", "Meera",
+               "Siddharth", "Pooja", "Aditya", "Neha", "Kabir", "Divya", "Rahul", "Sneha", "Karan", "Riya")
+LAST_NAMES = ("Sharma", "Verma", "Patel", "Iyer", "Mehta", "Singh", "Reddy", "Nair", "Gupta", "Joshi",
+              "Kulkarni", "Das", "Rao", "Bose", "Khan", "Menon")
+SPECIALIZATIONS = ("General Physician", "Pediatrics", "Dermatology", "Cardiology", "Orthopedics", "ENT",
+                   "Gynecology", "Neurology")
+SYMPTOMS = ("Fever", "Cough", "Headache", "Back pain", "Rash", "Sore throat", "Fatigue", "Chest pain")
+PRESCRIPTIONS = ("Paracetamol 500mg twice a day", "Cough syrup twice a day", "Rest and fluids",
+                 "Ibuprofen 400mg after meals", "Antihistamine at night", "Follow-up in two weeks")
+FEES = (300.00, 500.00, 800.00)
+MINUTE_OFFSETS = (0, 10, 20)  # appointments start at :00/:10/:20 within their 30-minute slot
+
+# Generated contacts are the prefix plus the row id, so they stay unique across runs
+DOCTOR_CONTACT_PREFIX = "5"
+PATIENT_CONTACT_PREFIX = "6"
+
+CANCEL_RATE = 0.05
+PAID_RATE = 0.85
+
+
+# ----------------------------
+# GENERATION
+# ----------------------------
+def _name(rng):
+    return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+
+def doctor_rows(rng, first_id, count):
+    return [
+        (d_id, f"Dr. {_name(rng)}", rng.choice(SPECIALIZATIONS), "Mon-Sat 9am-6pm",
+         f"{DOCTOR_CONTACT_PREFIX}{d_id:09d}")
+        for d_id in range(first_id, first_id + count)
+    ]
+
+
+def patient_rows(rng, first_id, count):
+    return [
+        (p_id, _name(rng), rng.randint(1, 90), rng.choice(("Male", "Female", "Other")),
+         f"{PATIENT_CONTACT_PREFIX}{p_id:09d}")
+        for p_id in range(first_id, first_id + count)
+    ]
+
+
+def generate_appointments(rng, next_ids, doctor_ids, patient_ids, days, anchor, now, fill):
+    """Yield one dict of rows per (doctor, day, slot): appointments, queue, billing, consultations, counter.
+
+    `next_ids` maps each child table to an iterator of fresh primary keys.
+    """
+    slots = list(day_slots())
+    for day in days:
+        for d_id in doctor_ids:
+            for slot_start, slot_end in slots:
+                slot_over = datetime.combine(day, slot_end) <= now
+                booked = sum(rng.random() < fill for _ in range(SLOT_CAPACITY))
+                rows = {"appointment": [], "queue": [], "billing": [], "consultation": [], "counter": None}
+                token = 0
+                active = 0
+                for _ in range(booked):
+                    a_id = next(next_ids["appointment"])
+                    start = datetime.combine(day, slot_start) + timedelta(minutes=rng.choice(MINUTE_OFFSETS))
+                    if rng.random() < CANCEL_RATE:
+                        rows["appointment"].append((a_id, rng.choice(patient_ids), d_id, day, start.time(), "Cancelled"))
+                        continue
+                    token += 1
+                    status = "Completed" if slot_over else "Scheduled"
+                    rows["appointment"].append((a_id, rng.choice(patient_ids), d_id, day, start.time(), status))
+                    rows["queue"].append(
+                        (next(next_ids["queue"]), a_id, token, "Completed" if slot_over else "Waiting")
+                    )
+                    paid = slot_over and rng.random() < PAID_RATE
+                    rows["billing"].append((next(next_ids["billing"]), a_id, rng.choice(FEES), "Paid" if paid else "Pending"))
+                    if slot_over:
+                        rows["consultation"].append(
+                            (next(next_ids["consultation"]), a_id, rng.choice(SYMPTOMS), rng.choice(PRESCRIPTIONS))
+                        )
+                    else:
+                        active += 1
+                if day >= anchor and token:
+                    rows["counter"] = (d_id, day, slot_start, active, token)
+                yield rows
+
+
+# ----------------------------
+# LOADING
+# ----------------------------
+def table_columns(conn):
+    status = schema.columns(conn)
+    return {
+        "doctor": ("doctor", ("d_id", "d_name", "specialization", "availability", "contact")),
+        "patient": ("patient", ("p_id", "p_name", "age", "gender", "contact")),
+        "appointment": ("appointment", ("a_id", "p_id", "d_id", "date", "time", status["a_status"])),
+        "queue": ("queue", ("q_id", "a_id", "token_no", status["q_status"])),
+        "billing": ("billing", ("b_id", "a_id", "amount", "payment_status")),
+        "consultation": ("consultation", ("c_id", "a_id", "symptoms", "prescription")),
+        "counter": ("slot_reservation", ("d_id", "date", "slot_start", "booked", "last_token")),
+    }
+
+
+class ExecutemanyLoader:
+    """Multi-row INSERTs through cursor.executemany (mysql.connector batches them into one statement)."""
+
+    def __init__(self, conn, tables):
+        self.conn = conn
+        self.tables = tables
+
+    def load(self, kind, rows):
+        table, columns = self.tables[kind]
+        cursor = self.conn.cursor()
+        try:
+            cursor.executemany(
+                f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})", rows
+            )
+        finally:
+            cursor.close()
+
+
+class InfileLoader:
+    """Tab-separated temp files loaded with LOAD DATA LOCAL INFILE (needs local_infile=ON on the server)."""
+
+    def __init__(self, conn, tables):
+        self.conn = conn
+        self.tables = tables
+
+    def load(self, kind, rows):
+        table, columns = self.tables[kind]
+        with tempfile.NamedTemporaryFile("w", newline="", suffix=".tsv", delete=False) as f:
+            csv.writer(f, delimiter="\t", lineterminator="\n").writerows(rows)
+            path = f.name
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(
+                f"""
+                LOAD DATA LOCAL INFILE %s INTO TABLE {table}
+                FIELDS TERMINATED BY '\\t' LINES TERMINATED BY '\\n'
+                ({', '.join(columns)})
+                """,
+                (path,),
+            )
+        finally:
+            cursor.close()
+            os.unlink(path)
+
+
+LOADERS = {"executemany": ExecutemanyLoader, "infile": InfileLoader}
+# Parents first so every chunk is consistent on its own
+CHILD_ORDER = ("appointment", "queue", "billing", "consultation", "counter")
+
+
+def _max_id(cursor, table, column):
+    cursor.execute(f"SELECT COALESCE(MAX({column}), 0) FROM {table}")
+    return cursor.fetchone()[0]
+
+
+def run(args):
+    anchor = date.fromisoformat(args.anchor) if args.anchor else date.today()
+    # With --anchor the split between completed and scheduled slots is fixed at that day's start
+    now = datetime.combine(anchor, time.min) if args.anchor else datetime.now()
+    days = [anchor + timedelta(days=offset) for offset in range(-args.days, args.future_days + 1)]
+    rng = random.Random(args.seed)
+
+    conn = mysql.connector.connect(**DB_CONFIG, allow_local_infile=args.method == "infile")
+    counts = dict.fromkeys(("doctor", "patient") + CHILD_ORDER, 0)
+    started = _time.perf_counter()
+    try:
+        ensure_reservation_table(conn)
+        directory.ensure_directory(conn)
+        tables = table_columns(conn)
+        loader = LOADERS[args.method](conn, tables)
+
+        cursor = conn.cursor()
+        first_doctor = _max_id(cursor, "doctor", "d_id") + 1
+        first_patient = _max_id(cursor, "patient", "p_id") + 1
+        next_ids = {
+            kind: itertools.count(_max_id(cursor, table, columns[0]) + 1)
+            for kind, (table, columns) in tables.items()
+            if kind not in ("doctor", "patient", "counter")
+        }
+        # The generated rows are consistent by construction; skip per-row FK and unique probes
+        cursor.execute("SET SESSION foreign_key_checks = 0, unique_checks = 0")
+        cursor.close()
+
+        for kind, rows in (
+            ("doctor", doctor_rows(rng, first_doctor, args.doctors)),
+            ("patient", patient_rows(rng, first_patient, args.patients)),
+        ):
+            for i in range(0, len(rows), args.batch):
+                loader.load(kind, rows[i:i + args.batch])
+                conn.commit()
+            counts[kind] = len(rows)
+        doctor_ids = list(range(first_doctor, first_doctor + args.doctors))
+        patient_ids = list(range(first_patient, first_patient + args.patients))
+
+        pending = {kind: [] for kind in CHILD_ORDER}
+
+        def flush():
+            for kind in CHILD_ORDER:
+                if pending[kind]:
+                    loader.load(kind, pending[kind])
+                    counts[kind] += len(pending[kind])
+                    pending[kind] = []
+            conn.commit()
+            if not args.quiet:
+                elapsed = _time.perf_counter() - started
+                print(f"  {counts['appointment']:>10} appointments  ({counts['appointment'] / elapsed:,.0f}/s)",
+                      end="\r", file=sys.stderr)
+
+        for slot in generate_appointments(rng, next_ids, doctor_ids, patient_ids, days, anchor, now, args.fill):
+            for kind in ("appointment", "queue", "billing", "consultation"):
+                pending[kind].extend(slot[kind])
+            if slot["counter"]:
+                pending["counter"].append(slot["counter"])
+            if len(pending["appointment"]) >= args.batch:
+                flush()
+        flush()
+
+        cursor = conn.cursor()
+        cursor.execute("SET SESSION foreign_key_checks = 1, unique_checks = 1")
+        directory.backfill(cursor)
+        conn.commit()
+        cursor.close()
+    finally:
+        conn.close()
+
+    elapsed = _time.perf_counter() - started
+    if not args.quiet:
+        print(file=sys.stderr)
+    return {
+        "seed": args.seed,
+        "anchor": anchor.isoformat(),
+        "method": args.method,
+        "rows": counts,
+        "elapsed_s": round(elapsed, 3),
+        "appointments_per_s": round(counts["appointment"] / elapsed, 1) if elapsed else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--doctors", type=int, default=20)
+    parser.add_argument("--patients", type=int, default=50000)
+    parser.add_argument("--days", type=int, default=90, help="days of history before the anchor date")
+    parser.add_argument("--future-days", type=int, default=14, help="days of bookings after the anchor date")
+    parser.add_argument("--fill", type=float, default=0.6, help="share of each slot's capacity that is booked")
+    parser.add_argument("--batch", type=int, default=5000, help="appointments per transaction")
+    parser.add_argument("--method", choices=sorted(LOADERS), default="executemany")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--anchor", help="YYYY-MM-DD treated as today, from its first minute (default: now)")
+    parser.add_argument("--quiet", action="store_true")
+    args = parser.parse_args()
+    if not 0 <= args.fill <= 1:
+        parser.error("--fill must be between 0 and 1")
+    if args.doctors < 1 or args.patients < 1:
+        parser.error("--doctors and --patients must be at least 1")
+
+    report = run(args)
+    rows = report["rows"]
+    print(f"✅ Generated {rows['doctor']} doctors, {rows['patient']} patients and {rows['appointment']} appointments "
+          f"in {report['elapsed_s']}s ({report['appointments_per_s']}/s)")
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""Pooled MySQL connections shared by every route in app.py.
+
+Configuration comes from the environment so credentials are not hardcoded:
+
+    MEDIQUEUE_DB_HOST, MEDIQUEUE_DB_PORT, MEDIQUEUE_DB_USER,
+    MEDIQUEUE_DB_PASSWORD, MEDIQUEUE_DB_NAME
+    MEDIQUEUE_DB_POOL_SIZE      connections kept open (1-32, default 10)
+    MEDIQUEUE_DB_POOL_TIMEOUT   seconds a request waits for a free connection (default 5)
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from mysql.connector import Error, connect, pooling
+
+from log_config import get_logger
+from sql_trace import instrument
+
+log = get_logger("db")
+
+
+# ----------------------------
+# CONFIGURATION
+# ----------------------------
+DB_CONFIG = {
+    "host": os.environ.get("MEDIQUEUE_DB_HOST", "localhost"),
+    "port": int(os.environ.get("MEDIQUEUE_DB_PORT", "3306")),
+    "user": os.environ.get("MEDIQUEUE_DB_USER", "root"),
+    "password": os.environ.get("MEDIQUEUE_DB_PASSWORD", "root"),
+    "database": os.environ.get("MEDIQUEUE_DB_NAME", "clinic"),
+}
+
+# mysql.connector refuses pools larger than 32 connections
+POOL_SIZE = max(1, min(32, int(os.environ.get("MEDIQUEUE_DB_POOL_SIZE", "10"))))
+POOL_TIMEOUT = float(os.environ.get("MEDIQUEUE_DB_POOL_TIMEOUT", "5"))
+POOL_NAME = "mediqueue"
+
+
+class DatabaseUnavailable(Exception):
+    """Raised when no healthy connection could be checked out of the pool."""
+
+
+# ----------------------------
+# POOL
+# ----------------------------
+_pool = None
+_pool_lock = threading.Lock()
+# mysql.connector's pool fails immediately when exhausted; the semaphore makes
+# callers wait (up to POOL_TIMEOUT) for a connection to be handed back instead.
+_slots = threading.BoundedSemaphore(POOL_SIZE)
+
+_stats_lock = threading.Lock()
+_stats = {
+    "in_use": 0,
+    "waiting": 0,
+    "checkouts": 0,
+    "timeouts": 0,
+    "errors": 0,
+    "checkout_ms_total": 0.0,
+    "checkout_ms_max": 0.0,
+}
+
+
+def get_pool():
+    """Create the connection pool on first use and return it."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = pooling.MySQLConnectionPool(
+                    pool_name=POOL_NAME,
+                    pool_size=POOL_SIZE,
+                    pool_reset_session=True,
+                    **DB_CONFIG,
+                )
+    return _pool
+
+
+def reset_pool():
+    """Forget the current pool so the next checkout opens fresh connections.
+
+    Used after fork(): sockets inherited from the parent must never be shared.
+    """
+    global _pool, _slots
+    with _pool_lock:
+        _pool = None
+        _slots = threading.BoundedSemaphore(POOL_SIZE)
+    with _stats_lock:
+        _stats["in_use"] = 0
+        _stats["waiting"] = 0
+
+
+def _checkout():
+    """Wait for a free pool slot and return a healthy pooled connection."""
+    slots = _slots
+    started = time.perf_counter()
+    with _stats_lock:
+        _stats["waiting"] += 1
+    acquired = slots.acquire(timeout=POOL_TIMEOUT)
+    with _stats_lock:
+        _stats["waiting"] -= 1
+    if not acquired:
+        with _stats_lock:
+            _stats["timeouts"] += 1
+        raise DatabaseUnavailable(f"No database connection free after {POOL_TIMEOUT:g}s")
+
+    try:
+        # The pool pings every connection it hands out and reconnects stale ones,
+        # so a connection dropped by wait_timeout never reaches a route.
+        conn = get_pool().get_connection()
+    except Error as e:
+        slots.release()
+        with _stats_lock:
+            _stats["errors"] += 1
+        raise DatabaseUnavailable(str(e)) from e
+
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    with _stats_lock:
+        _stats["in_use"] += 1
+        _stats["checkouts"] += 1
+        _stats["checkout_ms_total"] += elapsed_ms
+        _stats["checkout_ms_max"] = max(_stats["checkout_ms_max"], elapsed_ms)
+    return conn, slots
+
+
+def _checkin(conn, slots):
+    """Hand a connection back to the pool and free its slot."""
+    try:
+        conn.close()
+    except Error as e:
+        log.error("Error returning connection to pool: %s", e)
+    finally:
+        slots.release()
+        with _stats_lock:
+            _stats["in_use"] -= 1
+
+
+@contextmanager
+def db_connection():
+    """Check a connection out of the pool for the duration of a `with` block.
+
+    Uncommitted work is rolled back if the block raises. The connection is
+    wrapped by sql_trace.instrument() so its statements are counted and timed.
+    """
+    conn, slots = _checkout()
+    try:
+        yield instrument(conn)
+    except Exception:
+        try:
+            conn.rollback()
+        except Error:
+            pass
+        raise
+    finally:
+        _checkin(conn, slots)
+
+
+# ----------------------------
+# ADVISORY LOCKS
+# ----------------------------
+class AdvisoryLock:
+    """A named MySQL lock (GET_LOCK) held on a dedicated, unpooled connection.
+
+    Elects one process among several workers: held() takes the lock if nobody
+    has it and keeps it while the connection stays open. If the holder dies its
+    connection closes and the next held() elsewhere takes over. The connection
+    is never pooled because a pool reset would release the lock.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def held(self):
+        """True if this process holds the lock, taking it (without waiting) when it is free."""
+        with self._lock:
+            try:
+                if self._conn is None or not self._conn.is_connected():
+                    self._conn = connect(**DB_CONFIG)
+                cursor = self._conn.cursor()
+                try:
+                    cursor.execute("SELECT IS_USED_LOCK(%s) = CONNECTION_ID()", (self.name,))
+                    if cursor.fetchone()[0]:
+                        return True
+                    cursor.execute("SELECT GET_LOCK(%s, 0)", (self.name,))
+                    return cursor.fetchone()[0] == 1
+                finally:
+                    cursor.close()
+            except Error as e:
+                log.error("Cannot check lock %s: %s", self.name, e)
+                self._close()
+                return False
+
+    def release(self):
+        """Give the lock up (closing the connection releases it) so another process can take over."""
+        with self._lock:
+            self._close()
+
+    def _close(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Error:
+                pass
+            self._conn = None
+
+
+def pool_stats():
+    """Return a snapshot of pool usage for monitoring."""
+    with _stats_lock:
+        snapshot = dict(_stats)
+    checkouts = snapshot["checkouts"]
+    snapshot["pool_size"] = POOL_SIZE
+    snapshot["checkout_ms_avg"] = round(snapshot["checkout_ms_total"] / checkouts, 3) if checkouts else 0.0
+    snapshot["checkout_ms_total"] = round(snapshot["checkout_ms_total"], 3)
+    snapshot["checkout_ms_max"] = round(snapshot["checkout_ms_max"], 3)
+    return snapshot
@@ -0,0 +1,147 @@
+"""Contact -> (role, id) directory used by login.
+
+`user_directory` holds one row per patient, doctor and admin keyed by
+(contact, role), so send_otp resolves a contact with a single primary-key
+lookup instead of probing three tables. The routes that create, change or
+delete those users keep it in step inside their own transaction; migration 3
+(and ensure_directory() on a fresh table) backfills it from the user tables.
+
+A contact identifies one user per role, so a second patient (or doctor)
+with a contact already in use is refused with ContactTaken. For duplicates
+that predate the directory, the backfill keeps the user with the lowest id.
+"""
+from mysql.connector import IntegrityError, errorcode
+
+DIRECTORY_TABLE_DDL = """
+    CREATE TABLE IF NOT EXISTS user_directory (
+        contact VARCHAR(15) NOT NULL,
+        role VARCHAR(10) NOT NULL,
+        user_id INT NOT NULL,
+        PRIMARY KEY (contact, role),
+        UNIQUE KEY uq_user_directory_user (role, user_id)
+    )
+"""
+
+# (role, table, id column) in login precedence: a contact shared by a patient
+# and a doctor logs in as the patient, as it always has
+ROLES = (
+    ("patient", "patient", "p_id"),
+    ("doctor", "doctor", "d_id"),
+    ("admin", "admin", "admin_id"),
+)
+
+_table_ready = False
+
+
+class ContactTaken(Exception):
+    """Raised when a contact already belongs to another user of the same role."""
+
+    def __init__(self, role, contact):
+        super().__init__(f"Contact {contact} is already registered to another {role}")
+        self.role = role
+        self.contact = contact
+
+
+LOOKUP_SQL = """
+    SELECT role, user_id FROM user_directory
+    WHERE contact = %s
+    ORDER BY FIELD(role, 'patient', 'doctor', 'admin')
+    LIMIT 1
+"""
+
+
+def lookup(cursor, contact):
+    """Return (role, user_id) for a contact, or None."""
+    cursor.execute(LOOKUP_SQL, (contact,))
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    if isinstance(row, dict):
+        return row["role"], row["user_id"]
+    return row[0], row[1]
+
+
+def check_available(cursor, role, contact, user_id=None):
+    """Raise ContactTaken unless `contact` is free for `role` (or already belongs to `user_id`).
+
+    Call before writing the user row so a taken contact costs no INSERT; upsert()
+    still catches the race with a concurrent registration.
+    """
+    if not contact:
+        return
+    cursor.execute(
+        "SELECT user_id FROM user_directory WHERE contact = %s AND role = %s",
+        (contact, role),
+    )
+    row = cursor.fetchone()
+    if row is not None:
+        owner = row["user_id"] if isinstance(row, dict) else row[0]
+        if owner != user_id:
+            raise ContactTaken(role, contact)
+
+
+def upsert(cursor, role, user_id, contact):
+    """Point (role, user_id) at `contact`, replacing its previous entry.
+
+    Raises ContactTaken if another user of `role` holds the contact; the
+    caller rolls back its transaction.
+    """
+    cursor.execute("DELETE FROM user_directory WHERE role = %s AND user_id = %s", (role, user_id))
+    if contact:
+        try:
+            cursor.execute(
+                "INSERT INTO user_directory (contact, role, user_id) VALUES (%s, %s, %s)",
+                (contact, role, user_id),
+            )
+        except IntegrityError as e:
+            if e.errno != errorcode.ER_DUP_ENTRY:
+                raise
+            raise ContactTaken(role, contact) from e
+
+
+def remove(cursor, role, user_id):
+    cursor.execute("DELETE FROM user_directory WHERE role = %s AND user_id = %s", (role, user_id))
+
+
+def backfill(cursor):
+    """Copy every user table that has a contact column into the directory."""
+    for role, table, id_column in ROLES:
+        cursor.execute(
+            """
+            SELECT 1 FROM information_schema.columns
+            WHERE table_schema = DATABASE() AND table_name = %s AND column_name = 'contact'
+            """,
+            (table,),
+        )
+        if cursor.fetchone() is None:
+            continue
+        # Ordered so the lowest id keeps a contact shared by several users
+        cursor.execute(
+            f"""
+            INSERT IGNORE INTO user_directory (contact, role, user_id)
+            SELECT contact, %s, {id_column} FROM {table}
+            WHERE contact IS NOT NULL AND contact <> ''
+            ORDER BY {id_column}
+            """,
+            (role,),
+        )
+
+
+def ensure_directory(conn):
+    """Create the directory once per process, backfilling it if it starts out empty.
+
+    DDL commits implicitly, so call this before the route's own writes.
+    """
+    global _table_ready
+    if _table_ready:
+        return
+    cursor = conn.cursor()
+    try:
+        cursor.execute(DIRECTORY_TABLE_DDL)
+        cursor.execute("SELECT 1 FROM user_directory LIMIT 1")
+        if cursor.fetchone() is None:
+            backfill(cursor)
+            conn.commit()
+    finally:
+        cursor.close()
+    _table_ready = True
@@ -0,0 +1,357 @@
+"""In-process publish/subscribe for queue changes, served as Server-Sent Events.
+
+Writes (booking, completion, queue updates, deletions, slot rollovers)
+publish a small event on a set of topics:
+
+    queue                          every change (the clinic-wide live queue)
+    doctor:<d_id>                  changes to that doctor's appointments
+    patient:<p_id>                 changes to that patient's appointments
+    slot:<d_id>:<YYYY-MM-DD>T<HH:MM>  changes inside one 30-minute slot
+
+Subscribers block on a condition variable until something they care about
+is published, so an idle dashboard costs no database work at all. close()
+ends every open stream when a worker drains; EventSource clients reconnect
+(to another worker) with Last-Event-ID. When the events after that id are
+no longer all in the history (it only keeps the last HISTORY_SIZE, and a
+restarted process has none from before), the stream opens with a
+{"type": "resync"} event instead, telling the client to refetch everything.
+
+With MEDIQUEUE_EVENT_RELAY=local (the default) an event only reaches the
+streams of the process that published it. With several worker processes set
+MEDIQUEUE_EVENT_RELAY=mysql (server.py does): events go through the
+`queue_event` table, which every worker polls every
+MEDIQUEUE_EVENT_POLL_SECONDS [1], so a booking handled by one worker reaches
+the dashboards connected to all of them.
+
+Each open stream holds a thread of a threaded server for as long as it is
+open. server.py gives every worker MEDIQUEUE_MAX_EVENT_STREAMS threads on
+top of its request threads, and streams past that are refused with 503.
+async_app.py serves the same /events/queue from its event loop off the
+relay table; route that path to it at the proxy when there are more
+dashboards than threads are worth.
+"""
+import json
+import os
+import threading
+import time as _time
+from collections import deque
+
+from mysql.connector import Error
+
+from db import DatabaseUnavailable, db_connection
+from log_config import get_logger
+
+log = get_logger("events")
+
+HEARTBEAT_SECONDS = 15
+HISTORY_SIZE = 1000  # recent events kept so reconnecting clients can catch up
+MAX_STREAMS = int(os.environ.get("MEDIQUEUE_MAX_EVENT_STREAMS", "0"))  # open streams per process [0 = no limit]
+
+RELAY = os.environ.get("MEDIQUEUE_EVENT_RELAY", "local")
+RELAY_POLL_SECONDS = float(os.environ.get("MEDIQUEUE_EVENT_POLL_SECONDS", "1"))
+RELAY_KEEP_SECONDS = 3600  # relayed events older than this are pruned
+RELAY_BATCH = 500
+GAP_WAIT_SECONDS = 2.0  # how long a missing sequence number may be an uncommitted insert
+
+EVENT_TABLE_DDL = """
+    CREATE TABLE IF NOT EXISTS queue_event (
+        seq BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+        topics VARCHAR(500) NOT NULL,
+        payload TEXT NOT NULL,
+        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        KEY idx_queue_event_created (created_at)
+    )
+"""
+
+
+class EventBroker:
+    def __init__(self, history_size=HISTORY_SIZE, max_streams=MAX_STREAMS):
+        self._cond = threading.Condition()
+        self._seq = 0
+        self._history = deque(maxlen=history_size)  # (seq, topics, payload)
+        self._horizon = 0  # events up to this seq may be missing from the history
+        self.max_streams = max_streams
+        self.subscribers = 0
+        self.closed = False
+        self.relay = None  # a MySQLEventRelay once one is running
+
+    @property
+    def last_id(self):
+        return self._seq
+
+    @property
+    def full(self):
+        """True once max_streams streams are open; each one holds a server thread."""
+        return 0 < self.max_streams <= self.subscribers
+
+    def publish(self, topics, payload):
+        """Send an event to every subscriber; through the relay (and so every process) when there is one."""
+        if self.relay is not None:
+            return self.relay.send(topics, payload)
+        with self._cond:
+            return self._append(self._seq + 1, topics, payload)
+
+    def deliver(self, seq, topics, payload):
+        """Hand local subscribers an event the relay read back; `seq` only ever increases."""
+        with self._cond:
+            return self._append(seq, topics, payload)
+
+    def advance(self, seq):
+        """Continue numbering after `seq` (the relay's position when it starts)."""
+        with self._cond:
+            self._seq = max(self._seq, seq)
+            self._horizon = max(self._horizon, seq)
+
+    def _append(self, seq, topics, payload):
+        if len(self._history) == self._history.maxlen:
+            self._horizon = self._history[0][0]
+        self._seq = seq
+        self._history.append((seq, frozenset(topics), payload))
+        self._cond.notify_all()
+        return seq
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    def _pending(self, topics, after):
+        return [(seq, payload) for seq, event_topics, payload in self._history
+                if seq > after and event_topics & topics]
+
+    def wait(self, topics, after, timeout=HEARTBEAT_SECONDS):
+        """Return events on `topics` newer than `after`, waiting up to `timeout` seconds for one."""
+        with self._cond:
+            events = self._pending(topics, after)
+            if not events:
+                self._cond.wait_for(
+                    lambda: self.closed or (self._seq > after and self._pending(topics, after)), timeout
+                )
+                events = self._pending(topics, after)
+            return events
+
+    def stream(self, topics, after=None):
+        """Yield Server-Sent Events for `topics` forever (until the client goes away)."""
+        topics = frozenset(topics)
+        with self._cond:
+            self.subscribers += 1
+            last, resync = resume_from(after, self._seq, self._horizon)
+        try:
+            yield stream_preamble(last)
+            if resync:
+                yield sse_event(last, RESYNC)
+            while not self.closed:
+                events = self.wait(topics, last)
+                if last < self._horizon:
+                    # Fell further behind than the history reaches: skip to now and have the client refetch
+                    last = self._seq
+                    yield sse_event(last, RESYNC)
+                    continue
+                if not events:
+                    yield KEEPALIVE
+                    continue
+                for seq, payload in events:
+                    last = seq
+                    yield sse_event(seq, payload)
+        finally:
+            with self._cond:
+                self.subscribers -= 1
+
+
+broker = EventBroker()
+
+
+# ----------------------------
+# CROSS-PROCESS RELAY
+# ----------------------------
+RELAY_READ_SQL = "SELECT seq, topics, payload FROM queue_event WHERE seq > %s ORDER BY seq LIMIT %s"
+RELAY_START_SQL = "SELECT COALESCE(MAX(seq), 0), @@SESSION.auto_increment_increment FROM queue_event"
+
+
+class RelayPosition:
+    """How far a reader of `queue_event` has got.
+
+    Rows commit out of order now and then, so a missing sequence number holds
+    delivery back for up to GAP_WAIT_SECONDS before it is taken to be a
+    rolled-back insert.
+    """
+
+    def __init__(self, last=0, step=1):
+        self.last = last
+        self.step = step
+        self._gap_since = None
+
+    def accept(self, rows):
+        """The events among freshly read (seq, topics, payload) rows that can be delivered now."""
+        ready = []
+        for seq, topics, payload in rows:
+            if seq != self.last + self.step:
+                now = _time.monotonic()
+                if self._gap_since is None:
+                    self._gap_since = now
+                if now - self._gap_since < GAP_WAIT_SECONDS:
+                    break
+            self._gap_since = None
+            self.last = seq
+            ready.append((seq, frozenset(topics.split()), json.loads(payload)))
+        return ready
+
+
+class MySQLEventRelay:
+    """Carries events between worker processes through the `queue_event` table.
+
+    send() inserts the event; a thread in every process reads rows past the
+    last one it saw and delivers them to its broker. Sequence numbers are the
+    table's, so a Last-Event-ID means the same on every worker.
+    """
+
+    def __init__(self, broker, poll_seconds=RELAY_POLL_SECONDS):
+        self.broker = broker
+        self.poll_seconds = poll_seconds
+        self.position = RelayPosition()
+        self._ready = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _init(self):
+        """Create the table and start after its newest row; the broker publishes through the relay from then on."""
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(EVENT_TABLE_DDL)
+                cursor.execute(RELAY_START_SQL)
+                self.position = RelayPosition(*(int(value) for value in cursor.fetchone()))
+                conn.rollback()
+            finally:
+                cursor.close()
+        self.broker.advance(self.position.last)
+        self.broker.relay = self
+        self._ready = True
+
+    def send(self, topics, payload):
+        try:
+            with db_connection() as conn:
+                cursor = conn.cursor()
+                try:
+                    cursor.execute(
+                        "INSERT INTO queue_event (topics, payload) VALUES (%s, %s)",
+                        (" ".join(sorted(topics)), json.dumps(payload, default=str)),
+                    )
+                    conn.commit()
+                    return cursor.lastrowid
+                finally:
+                    cursor.close()
+        except (Error, DatabaseUnavailable) as e:
+            # The change itself is committed; dashboards catch up on their next poll
+            log.error("Cannot relay queue event: %s", e)
+            return None
+
+    def poll(self):
+        """Deliver the rows added since the last poll; return how many were delivered."""
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(RELAY_READ_SQL, (self.position.last, RELAY_BATCH))
+                rows = cursor.fetchall()
+                conn.rollback()  # end the read snapshot so the next poll sees new commits
+            finally:
+                cursor.close()
+
+        events = self.position.accept(rows)
+        for seq, topics, payload in events:
+            self.broker.deliver(seq, topics, payload)
+        return len(events)
+
+    def _loop(self):
+        while not self._stop.wait(self.poll_seconds):
+            try:
+                if not self._ready:
+                    self._init()
+                self.poll()
+            except (Error, DatabaseUnavailable) as e:
+                log.error("Cannot poll queue events: %s", e)
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="event-relay", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self.broker.relay = None
+
+
+def prune_relayed_events(conn, keep_seconds=RELAY_KEEP_SECONDS):
+    """Delete relayed events older than `keep_seconds`; return how many went."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            "DELETE FROM queue_event WHERE created_at < NOW() - INTERVAL %s SECOND",
+            (keep_seconds,),
+        )
+        conn.commit()
+        return cursor.rowcount
+    finally:
+        cursor.close()
+
+
+KEEPALIVE = ": keepalive\n\n"
+RESYNC = {"type": "resync"}  # sent instead of events the stream can no longer replay
+
+
+def stream_preamble(last):
+    """First frame of a stream: the reconnect delay and the position to resume from."""
+    return f"retry: 3000\nid: {last}\n\n"
+
+
+def resume_from(after, current, horizon):
+    """Where a stream resuming after Last-Event-ID `after` starts, and whether the client must resync.
+
+    An id past `current` comes from before a restart (or another sequence),
+    and one before `horizon` asks for events the history no longer holds;
+    either way the gap cannot be replayed.
+    """
+    if after is None:
+        return current, False
+    if after > current or after < horizon:
+        return current, True
+    return after, False
+
+
+def sse_event(seq, payload):
+    return f"id: {seq}\nevent: queue\ndata: {json.dumps(payload, default=str)}\n\n"
+
+
+def subscription_topics(args):
+    """Topics for an /events/queue request's doctor=, patient= and (repeatable) slot= args."""
+    topics = {"broadcast"}
+    doctor = args.get("doctor", type=int)
+    patient = args.get("patient", type=int)
+    if doctor is not None:
+        topics.add(f"doctor:{doctor}")
+    if patient is not None:
+        topics.add(f"patient:{patient}")
+    for slot in args.getlist("slot"):
+        if slot:
+            topics.add(f"slot:{slot}")
+    if len(topics) == 1:
+        topics.add("queue")
+    return topics
+
+
+def queue_topics(d_id=None, p_id=None, day=None, slot_start=None):
+    """Topics an appointment change should be published on."""
+    topics = {"queue"}
+    if d_id is not None:
+        topics.add(f"doctor:{d_id}")
+        if day is not None and slot_start is not None:
+            topics.add(slot_topic(d_id, day, slot_start))
+    if p_id is not None:
+        topics.add(f"patient:{p_id}")
+    return topics
+
+
+def slot_topic(d_id, day, slot_start):
+    return f"slot:{d_id}:{day.isoformat()}T{slot_start.strftime('%H:%M')}"
@@ -1,4 +1,8 @@
 const BASE_URL = "http://127.0.0.1:5050";
+// Event streams may be served by async_app.py rather than the main API
+const EVENTS_URL = process.env.REACT_APP_EVENTS_URL || BASE_URL;
+const EVENTS_POLL_MS = 30000; // refetch interval while the server refuses a stream
+const EVENTS_RETRY_MS = 60000; // matches the Retry-After the server sends with that 503
 
 export const fetchPatients = async () => {
   const res = await fetch(`${BASE_URL}/patients`);
@@ -29,3 +33,58 @@ export const fetchBilling = async () => {
   const res = await fetch(`${BASE_URL}/billing`);
   return res.json();
 };
+
+// Topic key of the 30-minute slot holding `time` ("HH:MM[:SS]") on `date`
+// ("YYYY-MM-DD"), as /events/queue?slot= expects it
+export const slotKey = (doctorId, date, time) => {
+  if (!doctorId || !date || !time) return null;
+  const [hours, minutes] = time.split(":");
+  const slotMinutes = Math.floor(parseInt(minutes, 10) / 30) * 30;
+  return `${doctorId}:${date.slice(0, 10)}T${hours.padStart(2, "0")}:${String(slotMinutes).padStart(2, "0")}`;
+};
+
+// Subscribe to pushed queue changes (Server-Sent Events). `filters` may hold
+// doctor / patient ids and slot keys (a value or a list); onChange is called
+// for every event. A server with all its stream slots taken answers 503 and
+// the browser gives up on the stream: onChange(null) is then called every
+// EVENTS_POLL_MS until a new stream is tried. Returns an unsubscribe function.
+export const subscribeQueueEvents = (filters, onChange) => {
+  if (typeof EventSource === "undefined") return () => {};
+  const params = new URLSearchParams();
+  Object.entries(filters || {}).forEach(([key, value]) => {
+    [].concat(value).forEach((item) => {
+      if (item !== undefined && item !== null && item !== "") params.append(key, item);
+    });
+  });
+  const query = params.toString();
+  const url = `${EVENTS_URL}/events/queue${query ? `?${query}` : ""}`;
+  let source = null;
+  let pollTimer = null;
+  let retryTimer = null;
+
+  const connect = () => {
+    clearInterval(pollTimer);
+    source = new EventSource(url);
+    source.addEventListener("queue", (event) => {
+      try {
+        onChange(JSON.parse(event.data));
+      } catch (err) {
+        onChange(null);
+      }
+    });
+    source.onerror = () => {
+      // Dropped connections reconnect by themselves; only a refused stream ends up CLOSED
+      if (source.readyState !== EventSource.CLOSED) return;
+      onChange(null);
+      pollTimer = setInterval(() => onChange(null), EVENTS_POLL_MS);
+      retryTimer = setTimeout(connect, EVENTS_RETRY_MS);
+    };
+  };
+
+  connect();
+  return () => {
+    clearInterval(pollTimer);
+    clearTimeout(retryTimer);
+    if (source) source.close();
+  };
+};
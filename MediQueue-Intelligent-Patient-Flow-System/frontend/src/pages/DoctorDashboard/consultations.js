@@ -1,8 +1,22 @@
 import React, { useEffect, useState } from "react";
 
+const API = "http://127.0.0.1:5050";
+const PAGE_SIZE = 50; // matches the dashboard bundle's list size
+
+// One more page of a list whose bundle or previous page returned `cursor`
+const fetchNextPage = async (path, cursor) => {
+  const res = await fetch(`${API}${path}${path.includes("?") ? "&" : "?"}limit=${PAGE_SIZE}&after=${encodeURIComponent(cursor)}`);
+  if (!res.ok) throw new Error(`Failed to load more (${res.status})`);
+  return { rows: await res.json(), next: res.headers.get("X-Next-Cursor") };
+};
+
 const Consultations = ({ selectedAppointmentId }) => {
   const [consultations, setConsultations] = useState([]);
+  const [consultationsNext, setConsultationsNext] = useState(null);
   const [appointments, setAppointments] = useState([]);
+  const [pendingNext, setPendingNext] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [selectedNote, setSelectedNote] = useState("");
   const [showForm, setShowForm] = useState(false);
   const [formData, setFormData] = useState({
     a_id: "",
@@ -13,63 +27,69 @@ const Consultations = ({ selectedAppointmentId }) => {
   const [deletingIds, setDeletingIds] = useState([]);
   const doctorId = localStorage.getItem("userId");
 
-  // Fetch all consultations
-  const fetchConsultations = async () => {
-    try {
-      const res = await fetch("http://127.0.0.1:5050/consultations");
-      const data = await res.json();
-      setConsultations(data);
-    } catch (err) {
-      console.error("❌ Error fetching consultations:", err);
-    }
-  };
-
-  // Fetch completed appointments for this doctor
-  const fetchCompletedAppointments = async () => {
+  // Doctor's consultations and completed appointments still without one, in one request
+  const fetchDashboard = async () => {
     if (!doctorId) return;
     try {
-      const res = await fetch(`http://127.0.0.1:5050/doctor/${doctorId}/appointments`);
+      const res = await fetch(`${API}/dashboard/doctor/${doctorId}`);
       if (res.ok) {
         const data = await res.json();
-        // Filter only completed appointments that don't have consultations yet
-        const completed = data.filter(
-          (apt) => apt.a_status && apt.a_status.toLowerCase() === "completed"
-        );
-        
-        // Get appointment IDs that already have consultations
-        // We'll fetch consultations separately to avoid dependency issues
-        const consultationRes = await fetch("http://127.0.0.1:5050/consultations");
-        const consultationData = await consultationRes.json();
-        const consultationAppointmentIds = consultationData.map((c) => c.a_id);
-        
-        // Filter out appointments that already have consultations
-        let availableAppointments = completed.filter(
-          (apt) => !consultationAppointmentIds.includes(apt.a_id)
-        );
-        
+        setConsultations(data.consultations);
+        setConsultationsNext(data.consultations_next_cursor);
+
+        let availableAppointments = data.pending_consultations;
+        let next = data.pending_consultations_next_cursor;
+        let note = "";
         // If a specific appointment is selected, ensure it's in the list
         if (selectedAppointmentId) {
-          const selectedAppt = completed.find(apt => apt.a_id === parseInt(selectedAppointmentId));
-          if (selectedAppt && !availableAppointments.find(apt => apt.a_id === selectedAppt.a_id)) {
+          const selectedId = parseInt(selectedAppointmentId);
+          const matches = (apt) => apt.a_id === selectedId;
+          let selectedAppt =
+            availableAppointments.find(matches) ||
+            data.appointments.find((apt) => matches(apt) && apt.a_status === "Completed" && !apt.c_id);
+          // Older pending appointments are past the first page: follow the cursor until it turns up
+          while (!selectedAppt && next && !data.consultations.find(matches)) {
+            const page = await fetchNextPage(`/doctors/${doctorId}/pending_consultations`, next);
+            availableAppointments = [...availableAppointments, ...page.rows];
+            next = page.next;
+            selectedAppt = page.rows.find(matches);
+          }
+          if (selectedAppt && !availableAppointments.find(matches)) {
             // Add the selected appointment even if it would normally be filtered
             availableAppointments = [selectedAppt, ...availableAppointments];
           }
+          if (!selectedAppt) {
+            note = data.consultations.find(matches)
+              ? "This appointment already has a consultation"
+              : "This appointment is not waiting for a consultation";
+          }
         }
-        
+
         setAppointments(availableAppointments);
+        setPendingNext(next);
+        setSelectedNote(note);
       }
     } catch (err) {
-      console.error("❌ Error fetching appointments:", err);
+      console.error("❌ Error fetching doctor dashboard:", err);
     }
   };
 
-  useEffect(() => {
-    fetchConsultations();
-  }, []);
+  const loadMore = async (path, cursor, setRows, setNext) => {
+    setLoadingMore(true);
+    try {
+      const page = await fetchNextPage(path, cursor);
+      setRows((rows) => [...rows, ...page.rows]);
+      setNext(page.next);
+    } catch (err) {
+      console.error("❌ Error loading more:", err);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
 
   useEffect(() => {
     if (doctorId) {
-      fetchCompletedAppointments();
+      fetchDashboard();
     }
     // eslint-disable-next-line react-hooks/exhaustive-deps
   }, [doctorId, selectedAppointmentId]);
@@ -80,7 +100,7 @@ const Consultations = ({ selectedAppointmentId }) => {
       // First ensure appointments are loaded
       const loadAndSelect = async () => {
         if (doctorId) {
-          await fetchCompletedAppointments();
+          await fetchDashboard();
           // Wait a bit for appointments to load, then set the form
           setTimeout(() => {
             setShowForm(true);
@@ -101,7 +121,7 @@ const Consultations = ({ selectedAppointmentId }) => {
 
     setLoading(true);
     try {
-      const res = await fetch("http://127.0.0.1:5050/consultations", {
+      const res = await fetch(`${API}/consultations`, {
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({
@@ -116,8 +136,7 @@ const Consultations = ({ selectedAppointmentId }) => {
         alert(data.message || "Consultation added successfully!");
         setFormData({ a_id: "", symptoms: "", prescription: "" });
         setShowForm(false);
-        fetchConsultations(); // Refresh consultations list
-        fetchCompletedAppointments(); // Refresh available appointments
+        fetchDashboard(); // Refresh consultations and available appointments
       } else {
         alert(data.error || "Failed to add consultation");
       }
@@ -139,7 +158,7 @@ const Consultations = ({ selectedAppointmentId }) => {
     setDeletingIds((s) => [...s, c_id]);
 
     try {
-      const res = await fetch(`http://127.0.0.1:5050/consultations/${c_id}`, {
+      const res = await fetch(`${API}/consultations/${c_id}`, {
         method: "DELETE",
         headers: { "Content-Type": "application/json" },
       });
@@ -147,8 +166,7 @@ const Consultations = ({ selectedAppointmentId }) => {
       const data = await res.json();
       if (res.ok) {
         alert(data.message || "Consultation deleted successfully!");
-        fetchConsultations(); // Refresh consultations list
-        fetchCompletedAppointments(); // Refresh available appointments
+        fetchDashboard(); // Refresh consultations and available appointments
       } else {
         alert(data.error || "Failed to delete consultation");
       }
@@ -232,11 +250,24 @@ const Consultations = ({ selectedAppointmentId }) => {
                   </>
                 )}
               </select>
-              {selectedAppointmentId && (
+              {pendingNext && (
+                <button
+                  type="button"
+                  disabled={loadingMore}
+                  onClick={() => loadMore(`/doctors/${doctorId}/pending_consultations`, pendingNext, setAppointments, setPendingNext)}
+                  style={{ marginTop: "5px", background: "none", border: "none", color: "#0077b6", cursor: "pointer", padding: 0 }}
+                >
+                  {loadingMore ? "Loading..." : "Load older completed appointments"}
+                </button>
+              )}
+              {selectedAppointmentId && !selectedNote && (
                 <p style={{ color: "#0077b6", fontSize: "14px", marginTop: "5px", fontStyle: "italic" }}>
                   ✓ Appointment pre-selected from Appointments tab
                 </p>
               )}
+              {selectedNote && (
+                <p style={{ color: "#dc3545", fontSize: "14px", marginTop: "5px" }}>{selectedNote}</p>
+              )}
               {appointments.length === 0 && (
                 <p style={{ color: "#666", fontSize: "14px", marginTop: "5px" }}>
                   No completed appointments available for consultation
@@ -355,6 +386,24 @@ const Consultations = ({ selectedAppointmentId }) => {
           No consultations found. Add a consultation using the button above.
         </p>
       )}
+      {consultationsNext && (
+        <div style={{ textAlign: "center", marginTop: "15px" }}>
+          <button
+            disabled={loadingMore}
+            onClick={() => loadMore(`/consultations?doctor=${doctorId}`, consultationsNext, setConsultations, setConsultationsNext)}
+            style={{
+              padding: "8px 20px",
+              backgroundColor: "white",
+              color: "#0077b6",
+              border: "1px solid #0077b6",
+              borderRadius: "5px",
+              cursor: loadingMore ? "not-allowed" : "pointer",
+            }}
+          >
+            {loadingMore ? "Loading..." : "Load more consultations"}
+          </button>
+        </div>
+      )}
     </div>
   );
 };
@@ -1,4 +1,5 @@
-import React, { useEffect, useState } from "react";
+import React, { useCallback, useEffect, useState } from "react";
+import { slotKey, subscribeQueueEvents } from "../../api";
 
 const LiveQueue = () => {
   const [liveQueue, setLiveQueue] = useState(null);
@@ -6,11 +7,13 @@ const LiveQueue = () => {
   const [error, setError] = useState(null);
   const [lastUpdated, setLastUpdated] = useState(null);
 
-  const fetchLiveQueue = async () => {
+  const doctorId = localStorage.getItem("userId");
+
+  const fetchLiveQueue = useCallback(async () => {
     try {
       setLoading(true);
       setError(null);
-      const res = await fetch("http://localhost:5050/queue/live");
+      const res = await fetch(`http://localhost:5050/queue/live?doctor=${doctorId}`);
       
       if (!res.ok) {
         const err = await res.json().catch(() => ({ error: res.statusText }));
@@ -26,17 +29,23 @@ const LiveQueue = () => {
     } finally {
       setLoading(false);
     }
-  };
+  }, [doctorId]);
 
   useEffect(() => {
-    // Fetch immediately when component mounts
+    // Fetch immediately when component mounts; the slow poll is only a
+    // safety net in case the event stream drops
     fetchLiveQueue();
-    
-    // Refresh every 30 seconds
-    const intervalId = setInterval(fetchLiveQueue, 30000);
-    
+    const intervalId = setInterval(fetchLiveQueue, 300000);
     return () => clearInterval(intervalId);
-  }, []);
+  }, [fetchLiveQueue]);
+
+  // Refetch when something changes in this doctor's current slot. Slot
+  // rollovers are always pushed; the refetch moves the subscription on.
+  const liveSlot = slotKey(doctorId, liveQueue?.current_time, liveQueue?.time_slot?.start);
+  useEffect(() => {
+    if (!liveSlot) return undefined;
+    return subscribeQueueEvents({ slot: liveSlot }, fetchLiveQueue);
+  }, [liveSlot, fetchLiveQueue]);
 
   const formatTime = (timeStr) => {
     if (!timeStr) return "--";
@@ -31,6 +31,22 @@ const BookAppointment = ({ onBookingSuccess }) => {
       .catch((err) => console.error("Error fetching doctors:", err));
   }, []);
 
+  // Availability is fetched two weeks at a time per doctor and cached by date,
+  // so changing the date inside that window doesn't hit the server again
+  const [slotsByDate, setSlotsByDate] = useState({});
+  const [slotsDoctorId, setSlotsDoctorId] = useState("");
+  const [slotsRefresh, setSlotsRefresh] = useState(0);
+  const SLOT_RANGE_DAYS = 14;
+
+  const addDays = (dateStr, days) => {
+    const d = new Date(`${dateStr}T00:00:00`);
+    d.setDate(d.getDate() + days);
+    const year = d.getFullYear();
+    const month = String(d.getMonth() + 1).padStart(2, "0");
+    const day = String(d.getDate()).padStart(2, "0");
+    return `${year}-${month}-${day}`;
+  };
+
   // Fetch available slots when doctor or date changes
   useEffect(() => {
     const doctorId = formData.doctor_id;
@@ -41,19 +57,36 @@ const BookAppointment = ({ onBookingSuccess }) => {
       setAvailableSlots([]);
       return;
     }
+
+    const applySlots = (slots) => {
+      setAvailableSlots(slots);
+      // Reset time if no longer available
+      if (currentTime && !slots.some((s) => s.start === currentTime)) {
+        setFormData((prev) => ({ ...prev, time: "" }));
+      }
+    };
+
+    if (slotsDoctorId === doctorId && slotsByDate[date]) {
+      applySlots(slotsByDate[date]);
+      return;
+    }
     
     const fetchSlots = async () => {
       try {
         setLoadingSlots(true);
+        const from = date;
+        const to = addDays(from, SLOT_RANGE_DAYS - 1);
         const res = await fetch(
-          `http://localhost:5050/doctors/${doctorId}/available_slots?date=${date}`
+          `http://localhost:5050/doctors/${doctorId}/available_slots?from=${from}&to=${to}`
         );
         const data = await res.json();
-        setAvailableSlots(data.slots || []);
-        // Reset time if no longer available
-        if (currentTime && !data.slots?.some((s) => s.start === currentTime)) {
-          setFormData((prev) => ({ ...prev, time: "" }));
-        }
+        const byDate = {};
+        (data.days || []).forEach((d) => {
+          byDate[d.date] = d.slots || [];
+        });
+        setSlotsByDate(byDate);
+        setSlotsDoctorId(doctorId);
+        applySlots(byDate[date] || []);
       } catch (e) {
         console.error("Error fetching available slots:", e);
         setAvailableSlots([]);
@@ -64,7 +97,14 @@ const BookAppointment = ({ onBookingSuccess }) => {
     fetchSlots();
     // We intentionally only depend on doctor_id and date, not time
     // eslint-disable-next-line react-hooks/exhaustive-deps
-  }, [formData.doctor_id, formData.date]);
+  }, [formData.doctor_id, formData.date, slotsRefresh]);
+
+  // Drop cached availability so the next render refetches the latest counts
+  const invalidateSlots = () => {
+    setSlotsByDate({});
+    setSlotsDoctorId("");
+    setSlotsRefresh((n) => n + 1);
+  };
 
   const handleSubmit = (e) => {
     e.preventDefault();
@@ -96,11 +136,13 @@ const BookAppointment = ({ onBookingSuccess }) => {
             alert(msg);
           }
           // Refresh slots to reflect latest
+          invalidateSlots();
           return Promise.reject(new Error(msg));
         }
         alert(data.message || "Appointment booked successfully!");
         setFormData({ doctor_id: "", date: "", time: "" });
         setAvailableSlots([]);
+        invalidateSlots();
         // Refresh appointments in dashboard if callback provided
         if (onBookingSuccess) {
           onBookingSuccess();
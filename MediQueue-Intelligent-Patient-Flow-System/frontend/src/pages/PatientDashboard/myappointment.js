@@ -7,14 +7,12 @@ const MyAppointments = () => {
   const patientId = localStorage.getItem("patientId");
 
   useEffect(() => {
-    fetch("http://localhost:5050/appointments")
-      .then((res) => res.json())
-      .then((data) => {
-        const myAppointments = data.filter(
-          (appt) => appt.p_id === parseInt(patientId)
-        );
-        setAppointments(myAppointments);
-      })
+    const base = `http://localhost:5050/patients/${patientId}/appointments`;
+    Promise.all([
+      fetch(`${base}/upcoming`).then((res) => res.json()),
+      fetch(`${base}/past`).then((res) => res.json()),
+    ])
+      .then(([upcoming, past]) => setAppointments([...upcoming, ...past]))
       .catch((err) => console.error(err));
   }, [patientId]);
 
@@ -28,7 +26,7 @@ const MyAppointments = () => {
 
       if (response.ok) {
         alert("Appointment cancelled.");
-        setAppointments(appointments.filter((a) => a.a_id !== id));
+        setAppointments(appointments.filter((a) => a.id !== id));
       } else {
         alert("Error cancelling appointment.");
       }
@@ -54,14 +52,14 @@ const MyAppointments = () => {
         <tbody>
           {appointments.length > 0 ? (
             appointments.map((a) => (
-              <tr key={a.a_id}>
-                <td>{a.d_id}</td>
+              <tr key={a.id}>
+                <td>{a.doctor}</td>
                 <td>{a.date}</td>
                 <td>{a.time}</td>
-                <td>{a.a_status}</td>
+                <td>{a.status}</td>
                 <td>
-                  {a.a_status !== "Completed" ? (
-                    <button onClick={() => handleCancel(a.a_id)}>Cancel</button>
+                  {a.status !== "Completed" ? (
+                    <button onClick={() => handleCancel(a.id)}>Cancel</button>
                   ) : (
                     <span>-</span>
                   )}
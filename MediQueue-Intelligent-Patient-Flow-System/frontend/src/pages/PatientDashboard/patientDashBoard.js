@@ -1,4 +1,5 @@
 import React, { useCallback, useEffect, useState } from "react";
+import { slotKey, subscribeQueueEvents } from "../../api";
 import "./patientDashboard.css";
 import BookAppointment from "./bookappointment";
 
@@ -13,67 +14,54 @@ const PatientDashboard = () => {
 
   const userId = localStorage.getItem("userId");
 
-  // ✅ Fetch patient details
+  // ✅ First load: profile, appointments, queue status and live queue in one request
   useEffect(() => {
-    const fetchPatientData = async () => {
+    const fetchDashboard = async () => {
       try {
-        const res = await fetch(`http://localhost:5050/patients/${userId}`);
+        const res = await fetch(`http://localhost:5050/dashboard/patient/${userId}`);
         const data = await res.json();
-        setPatientData(data);
+        if (!res.ok) {
+          throw new Error(data.error || "Unable to load dashboard");
+        }
+        setAppointments([...data.upcoming, ...data.past]);
+        setUpcoming(data.upcoming);
+        setPast(data.past);
+        setQueueInfo({ loading: false, data: data.queue, error: null });
+        setLiveQueue({ loading: false, data: data.live_queue, error: null });
+        setPatientData(data.patient);
       } catch (err) {
-        console.error("Error fetching patient data:", err);
+        console.error("Error fetching patient dashboard:", err);
+        setQueueInfo({ loading: false, data: null, error: err.message });
+        setLiveQueue({ loading: false, data: null, error: err.message });
       }
     };
     if (userId) {
-      fetchPatientData();
+      fetchDashboard();
     }
   }, [userId]);
 
-  // ✅ Fetch and filter appointments
-  useEffect(() => {
-    const fetchAppointments = async () => {
-      try {
-        const res = await fetch("http://localhost:5050/appointments");
-        const data = await res.json();
-
-        if (patientData && patientData.p_name) {
-          const patientAppointments = data.filter(
-            (a) => a.patient.toLowerCase() === patientData.p_name.toLowerCase()
-          );
-
-          const today = new Date().toISOString().split("T")[0];
-
-          const upcomingList = patientAppointments
-            .filter(
-              (a) =>
-                (a.status === "Scheduled" || a.date >= today)
-            )
-            .sort((a, b) => {
-              // Sort by date first, then by time
-              if (a.date !== b.date) {
-                return a.date.localeCompare(b.date);
-              }
-              return (a.time || "").localeCompare(b.time || "");
-            });
-
-          const pastList = patientAppointments.filter(
-            (a) =>
-              (a.status === "Completed" || a.date < today)
-          );
-
-          setAppointments(patientAppointments);
-          setUpcoming(upcomingList);
-          setPast(pastList);
-        }
-      } catch (err) {
-        console.error("Error fetching appointments:", err);
-      }
-    };
-    if (patientData) {
-      fetchAppointments();
+  // ✅ Fetch this patient's upcoming and past appointments
+  const fetchAppointments = useCallback(async () => {
+    if (!patientData) return;
+    try {
+      const base = `http://localhost:5050/patients/${patientData.p_id}/appointments`;
+      const [upcomingList, pastList] = await Promise.all([
+        fetch(`${base}/upcoming`).then((res) => res.json()),
+        fetch(`${base}/past`).then((res) => res.json()),
+      ]);
+
+      setAppointments([...upcomingList, ...pastList]);
+      setUpcoming(upcomingList);
+      setPast(pastList);
+    } catch (err) {
+      console.error("Error fetching appointments:", err);
     }
   }, [patientData]);
 
+  // Doctor of the appointment being tracked, so we also hear about changes
+  // made to other patients in the same queue
+  const queueDoctorId = queueInfo.data?.doctor?.id;
+
   const fetchQueueStatus = useCallback(async ({ showLoader = false } = {}) => {
     if (!patientData) return;
 
@@ -96,20 +84,12 @@ const PatientDashboard = () => {
     }
   }, [patientData]);
 
-  useEffect(() => {
-    if (!patientData) return;
-
-    fetchQueueStatus({ showLoader: true });
-    const intervalId = setInterval(() => fetchQueueStatus(), 30000);
-
-    return () => clearInterval(intervalId);
-  }, [patientData, fetchQueueStatus]);
-
-  // Fetch live queue (current time slot appointments)
+  // Fetch live queue (current time slot appointments of the patient's doctor)
   const fetchLiveQueue = useCallback(async () => {
     setLiveQueue((prev) => ({ ...prev, loading: true }));
     try {
-      const res = await fetch("http://localhost:5050/queue/live");
+      const doctorFilter = queueDoctorId ? `?doctor=${queueDoctorId}` : "";
+      const res = await fetch(`http://localhost:5050/queue/live${doctorFilter}`);
       const data = await res.json();
       if (!res.ok) {
         throw new Error(data.error || "Unable to load live queue");
@@ -118,13 +98,55 @@ const PatientDashboard = () => {
     } catch (err) {
       setLiveQueue({ loading: false, data: null, error: err.message });
     }
-  }, []);
+  }, [queueDoctorId]);
 
   useEffect(() => {
-    fetchLiveQueue();
-    const intervalId = setInterval(fetchLiveQueue, 30000); // Refresh every 30 seconds
+    if (!patientData) return undefined;
+    // The dashboard bundle brought the first status; the slow poll is only a
+    // safety net in case the event stream drops
+    const intervalId = setInterval(() => {
+      fetchQueueStatus();
+      fetchLiveQueue();
+    }, 300000);
     return () => clearInterval(intervalId);
-  }, [fetchLiveQueue]);
+  }, [patientData, fetchQueueStatus, fetchLiveQueue]);
+
+  // One event stream for the whole page: this patient's own changes, the slot
+  // of the appointment being tracked, and the doctor's current slot on screen
+  const trackedSlot = slotKey(queueDoctorId, queueInfo.data?.appointment?.date, queueInfo.data?.appointment?.time);
+  const liveSlot = slotKey(queueDoctorId, liveQueue.data?.current_time, liveQueue.data?.time_slot?.start);
+
+  useEffect(() => {
+    if (!patientData) return undefined;
+    const onChange = (event) => {
+      if (event && event.type === "resync") {
+        // The server could not replay what this page missed: refetch everything
+        fetchAppointments();
+        fetchQueueStatus();
+        fetchLiveQueue();
+        return;
+      }
+      if (!event || event.type === "slot_rollover") {
+        fetchQueueStatus();
+        fetchLiveQueue();
+        return;
+      }
+      const eventSlot = slotKey(event.d_id, event.date, event.time);
+      if (String(event.p_id) === String(patientData.p_id)) {
+        fetchAppointments();
+        fetchQueueStatus();
+      } else if (eventSlot && eventSlot === trackedSlot) {
+        fetchQueueStatus();
+      }
+      if (eventSlot && eventSlot === liveSlot) {
+        fetchLiveQueue();
+      }
+    };
+    return subscribeQueueEvents(
+      { patient: patientData.p_id, slot: [trackedSlot, liveSlot] },
+      onChange
+    );
+  }, [patientData, trackedSlot, liveSlot, fetchAppointments, fetchQueueStatus, fetchLiveQueue]);
 
   const formatWaitTime = (minutes) => {
     if (minutes === 0) return "Ready now";
@@ -224,36 +246,6 @@ const PatientDashboard = () => {
   const refreshAppointments = () => {
     // Trigger refresh when appointment is booked
     if (patientData) {
-      const fetchAppointments = async () => {
-        try {
-          const res = await fetch("http://localhost:5050/appointments");
-          const data = await res.json();
-
-          if (patientData && patientData.p_name) {
-            const patientAppointments = data.filter(
-              (a) => a.patient.toLowerCase() === patientData.p_name.toLowerCase()
-            );
-
-            const today = new Date().toISOString().split("T")[0];
-
-            const upcomingList = patientAppointments.filter(
-              (a) =>
-                (a.status === "Scheduled" || a.date >= today)
-            );
-
-            const pastList = patientAppointments.filter(
-              (a) =>
-                (a.status === "Completed" || a.date < today)
-            );
-
-            setAppointments(patientAppointments);
-            setUpcoming(upcomingList);
-            setPast(pastList);
-          }
-        } catch (err) {
-          console.error("Error fetching appointments:", err);
-        }
-      };
       fetchAppointments();
       fetchQueueStatus();
     }
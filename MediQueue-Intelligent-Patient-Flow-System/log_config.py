@@ -0,0 +1,89 @@
+"""Leveled logging for the API.
+
+Everything logs under the "mediqueue" logger. MEDIQUEUE_LOG_LEVEL sets the
+level (default INFO; the `python app.py` dev server defaults to DEBUG so
+login OTPs show up in the console). DEBUG lines on hot paths such as the
+patient queue status poll would flood the log under load, so only a
+MEDIQUEUE_LOG_DEBUG_SAMPLE share of them (default 1.0, i.e. all) is kept;
+records logged with extra={"always": True} skip the sampling.
+
+Warnings that can fire on every statement or request (slow queries,
+likely N+1 loops) are logged with extra={"sample_key": ...}: the first
+record per key is kept and repeats within MEDIQUEUE_LOG_REPEAT_SECONDS
+(default 60; 0 keeps them all) are only counted, the count going out with
+the next record kept for that key.
+
+Modules log through get_logger("<module>"), a child of the "mediqueue"
+logger, so they share its handler, level and sampling.
+"""
+import logging
+import os
+import random
+import threading
+import time as _time
+
+LOGGER_NAME = "mediqueue"
+LOG_FORMAT = "%(asctime)s %(levelname)-7s %(name)s: %(message)s"
+DEBUG_SAMPLE_RATE = min(1.0, max(0.0, float(os.environ.get("MEDIQUEUE_LOG_DEBUG_SAMPLE", "1.0"))))
+REPEAT_SECONDS = max(0.0, float(os.environ.get("MEDIQUEUE_LOG_REPEAT_SECONDS", "60")))
+REPEAT_KEYS_MAX = 10000  # keys remembered before the oldest are forgotten
+
+
+class DebugSampler(logging.Filter):
+    """Keep every record at INFO and above, and a `rate` share of DEBUG records."""
+
+    def __init__(self, rate=DEBUG_SAMPLE_RATE):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG or self.rate >= 1.0 or getattr(record, "always", False):
+            return True
+        return random.random() < self.rate
+
+
+class RepeatSampler(logging.Filter):
+    """Keep the first record per `sample_key` every `interval` seconds and count the rest."""
+
+    def __init__(self, interval=REPEAT_SECONDS):
+        super().__init__()
+        self.interval = interval
+        self._seen = {}  # key -> [time last kept, records dropped since]
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        key = getattr(record, "sample_key", None)
+        if key is None or self.interval <= 0:
+            return True
+        now = _time.monotonic()
+        with self._lock:
+            seen = self._seen.get(key)
+            if seen is not None and now - seen[0] < self.interval:
+                seen[1] += 1
+                return False
+            dropped = seen[1] if seen is not None else 0
+            if seen is None and len(self._seen) >= REPEAT_KEYS_MAX:
+                self._seen.pop(next(iter(self._seen)))
+            self._seen[key] = [now, 0]
+        if dropped:
+            record.msg = f"{record.msg} (+{dropped} like it since the last report)"
+        return True
+
+
+def get_logger(name):
+    """The "mediqueue.<name>" logger; configure_logging() sets up its handler and level."""
+    return logging.getLogger(f"{LOGGER_NAME}.{name}")
+
+
+def configure_logging(default_level="INFO"):
+    """Attach one stderr handler to the "mediqueue" logger; safe to call again to change the level."""
+    logger = logging.getLogger(LOGGER_NAME)
+    logger.setLevel(os.environ.get("MEDIQUEUE_LOG_LEVEL", default_level).upper())
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        handler.addFilter(DebugSampler())
+        handler.addFilter(RepeatSampler())
+        logger.addHandler(handler)
+        logger.propagate = False
+    return logger
@@ -0,0 +1,277 @@
+"""Prometheus-style metrics served at GET /metrics.
+
+install(app) adds before/after-request hooks that count requests per route
+template, method and status, keep a latency histogram per route and track
+requests in flight. Each hook does a dict lookup and a short locked
+increment, so recording costs microseconds per request.
+
+Gauges that already exist elsewhere (pool usage, response cache counters)
+are read at scrape time through register_collector() instead of being
+updated on every change. Metrics are per process: scrape every worker.
+
+No client library is needed; render() writes the text exposition format
+(version 0.0.4) directly.
+"""
+import threading
+import time as _time
+from bisect import bisect_left
+
+from flask import g, request
+
+from log_config import get_logger
+
+log = get_logger("metrics")
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; covers a cached 304 (well under 5 ms) up to a slow export
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_text(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+# ----------------------------
+# METRIC TYPES
+# ----------------------------
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}  # label values tuple -> value
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + [f"{self.name}{_label_text(self.labels, k)} {_number(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, *label_values):
+        with self._lock:
+            self._values[label_values] = value
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def dec(self, *label_values, amount=1):
+        self.inc(*label_values, amount=-amount)
+
+    def render(self):
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + [f"{self.name}{_label_text(self.labels, k)} {_number(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram; quantile() estimates percentiles from the buckets."""
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS, quantiles_name=None):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+        # Also publish estimated p50/p95/p99 as a gauge family, for dashboards without histogram_quantile()
+        self.quantiles_name = quantiles_name
+
+    def observe(self, value, *label_values):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(label_values)
+            if series is None:
+                # per-bucket (not cumulative) counts, with a final +Inf bucket, then sum
+                series = self._values[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def _snapshot(self):
+        with self._lock:
+            return [(k, list(counts), total) for k, (counts, total) in self._values.items()]
+
+    @staticmethod
+    def _estimate(buckets, counts, q):
+        """Linear interpolation inside the bucket holding the q-th observation."""
+        total = sum(counts)
+        if not total:
+            return None
+        rank = q * total
+        seen = 0
+        for i, count in enumerate(counts):
+            if seen + count >= rank and count:
+                lower = buckets[i - 1] if i else 0.0
+                if i == len(buckets):
+                    return buckets[-1]  # beyond the last finite bucket; report its bound
+                return lower + (buckets[i] - lower) * (rank - seen) / count
+            seen += count
+        return buckets[-1]
+
+    def quantile(self, q, *label_values):
+        with self._lock:
+            series = self._values.get(label_values)
+            counts = list(series[0]) if series else None
+        return self._estimate(self.buckets, counts, q) if counts else None
+
+    def render(self):
+        lines = self.header()
+        for key, counts, total in self._snapshot():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                labels = _label_text(self.labels + ("le",), key + (_number(float(bound)),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _label_text(self.labels, key)
+            lines.append(f"{self.name}_sum{labels} {_number(round(total, 6))}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        if self.quantiles_name:
+            lines.extend(self._render_quantiles())
+        return lines
+
+    def _render_quantiles(self):
+        name = self.quantiles_name
+        lines = [f"# HELP {name} Estimated p50/p95/p99 of {self.name}, from its buckets.", f"# TYPE {name} gauge"]
+        for key, counts, _ in self._snapshot():
+            for q in QUANTILES:
+                value = self._estimate(self.buckets, counts, q)
+                if value is not None:
+                    labels = _label_text(self.labels + ("quantile",), key + (q,))
+                    lines.append(f"{name}{labels} {_number(round(value, 6))}")
+        return lines
+
+
+# ----------------------------
+# REGISTRY
+# ----------------------------
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, help_text, labels=()):
+        return self._add(Counter(name, help_text, labels))
+
+    def gauge(self, name, help_text, labels=()):
+        return self._add(Gauge(name, help_text, labels))
+
+    def histogram(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS, quantiles_name=None):
+        return self._add(Histogram(name, help_text, labels, buckets, quantiles_name))
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collect):
+        """`collect()` returns [(name, kind, help, value)] read at scrape time."""
+        self._collectors.append(collect)
+        return collect
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collect in self._collectors:
+            try:
+                samples = collect()
+            except Exception as e:
+                log.warning("Metrics collector %s failed: %s", getattr(collect, "__name__", collect), e)
+                continue
+            for name, kind, help_text, value in samples:
+                if value is None:
+                    continue
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}", f"{name} {_number(value)}"]
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+register_collector = registry.register_collector
+render = registry.render
+
+REQUESTS = registry.counter(
+    "mediqueue_http_requests_total", "HTTP requests by route template, method and status.",
+    ("route", "method", "status"),
+)
+REQUEST_LATENCY = registry.histogram(
+    "mediqueue_http_request_duration_seconds", "HTTP request latency by route template.", ("route",),
+    quantiles_name="mediqueue_http_request_duration_quantile_seconds",
+)
+IN_FLIGHT = registry.gauge("mediqueue_http_requests_in_flight", "HTTP requests currently being handled.")
+JOB_DURATION = registry.histogram(
+    "mediqueue_job_duration_seconds", "Slot scheduler job run time.", ("job",),
+)
+JOB_FAILURES = registry.counter("mediqueue_job_failures_total", "Slot scheduler job runs that raised.", ("job",))
+
+
+# ----------------------------
+# FLASK HOOKS
+# ----------------------------
+def _route():
+    rule = request.url_rule
+    # The rule template keeps label cardinality bounded (/patients/<int:p_id>, not every id)
+    return rule.rule if rule is not None else "unmatched"
+
+
+def _begin():
+    g.metrics_started = _time.perf_counter()
+    IN_FLIGHT.inc()
+
+
+def _record(response):
+    g.metrics_status = response.status_code
+    return response
+
+
+def _finish(exc):
+    started = g.pop("metrics_started", None)
+    if started is None:
+        return
+    IN_FLIGHT.dec()
+    route = _route()
+    status = g.pop("metrics_status", 500 if exc is not None else 200)
+    REQUESTS.inc(route, request.method, status)
+    REQUEST_LATENCY.observe(_time.perf_counter() - started, route)
+
+
+def install(app):
+    """Record request metrics for `app`; teardown also sees requests that raised."""
+    app.before_request(_begin)
+    app.after_request(_record)
+    app.teardown_request(_finish)
+
+
+def observe_job(name, seconds, ok):
+    JOB_DURATION.observe(seconds, name)
+    if not ok:
+        JOB_FAILURES.inc(name)
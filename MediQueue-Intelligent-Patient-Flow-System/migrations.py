@@ -0,0 +1,247 @@
+"""Versioned, non-destructive schema migrations for the clinic database.
+
+Unlike database.py (which drops and reseeds everything), this only applies
+migrations that are not yet recorded in `schema_migrations`, so it is safe
+to run against a live database:
+
+    python migrations.py                apply pending migrations
+    python migrations.py --status       list applied / pending versions
+    python migrations.py --check-plans  EXPLAIN the hot queries; exit 1 on a full scan
+
+On a handful of seed rows MySQL may legitimately prefer a table scan, so run
+--check-plans against realistic data volumes.
+"""
+import argparse
+import re
+import sys
+from datetime import date, time
+
+import directory
+import events
+import schema
+from db import db_connection
+from reservations import RESERVATION_TABLE_DDL
+
+
+# ----------------------------
+# HELPERS
+# ----------------------------
+def _index_exists(cursor, table, index_name):
+    cursor.execute(
+        """
+        SELECT 1 FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+        LIMIT 1
+        """,
+        (table, index_name),
+    )
+    return cursor.fetchone() is not None
+
+
+def _create_index(cursor, table, index_name, columns, unique=False):
+    """CREATE INDEX unless it already exists (MySQL has no IF NOT EXISTS for indexes)."""
+    if _index_exists(cursor, table, index_name):
+        return
+    kind = "UNIQUE INDEX" if unique else "INDEX"
+    cursor.execute(f"CREATE {kind} {index_name} ON {table} ({', '.join(columns)})")
+
+
+# ----------------------------
+# MIGRATIONS
+# ----------------------------
+def _m001_slot_reservation(cursor):
+    cursor.execute(RESERVATION_TABLE_DDL)
+
+
+def _m002_hot_path_indexes(cursor):
+    status = schema.resolve(cursor)["a_status"]
+    # Slot occupancy and per-doctor day views: WHERE d_id = ? AND date = ? AND time range AND status
+    _create_index(cursor, "appointment", "idx_appointment_doctor_slot", ["d_id", "date", "time", status])
+    # Patient queue lookups: WHERE p_id = ? AND status IN (...) ORDER BY date, time
+    _create_index(cursor, "appointment", "idx_appointment_patient_status", ["p_id", status, "date", "time"])
+    # Live queue and the slot-boundary auto-complete: WHERE date/time range AND status
+    _create_index(cursor, "appointment", "idx_appointment_date_time", ["date", "time", status])
+
+    # One queue row per appointment; drop any duplicates (keeping the oldest) first
+    cursor.execute("""
+        DELETE q FROM queue q
+        JOIN queue older ON older.a_id = q.a_id AND older.q_id < q.q_id
+    """)
+    _create_index(cursor, "queue", "uq_queue_appointment", ["a_id"], unique=True)
+
+
+def _m003_user_directory(cursor):
+    cursor.execute(directory.DIRECTORY_TABLE_DDL)
+    directory.backfill(cursor)
+
+
+def _m004_patient_date_index(cursor):
+    # Patient appointment lists: WHERE p_id = ? ORDER BY date, time (either direction), any status
+    _create_index(cursor, "appointment", "idx_appointment_patient_date", ["p_id", "date", "time"])
+
+
+def _m005_queue_event(cursor):
+    cursor.execute(events.EVENT_TABLE_DDL)
+
+
+MIGRATIONS = [
+    (1, "slot_reservation counter table", _m001_slot_reservation),
+    (2, "hot-path composite indexes and unique queue(a_id)", _m002_hot_path_indexes),
+    (3, "user_directory contact lookup table", _m003_user_directory),
+    (4, "appointment (p_id, date, time) index for patient lists", _m004_patient_date_index),
+    (5, "queue_event table relaying events between workers", _m005_queue_event),
+]
+
+
+# ----------------------------
+# RUNNER
+# ----------------------------
+def _ensure_migrations_table(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT PRIMARY KEY,
+            name VARCHAR(200) NOT NULL,
+            applied_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def applied_versions(cursor):
+    _ensure_migrations_table(cursor)
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def migrate(conn):
+    """Apply every pending migration in version order; return the versions applied.
+
+    MySQL DDL commits implicitly, so each migration is recorded right after it
+    runs and every step is written to be safe to re-run if it was interrupted.
+    """
+    cursor = conn.cursor()
+    applied = []
+    try:
+        done = applied_versions(cursor)
+        for version, name, step in MIGRATIONS:
+            if version in done:
+                continue
+            print(f"➡️  Applying migration {version}: {name}")
+            step(cursor)
+            cursor.execute(
+                "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                (version, name),
+            )
+            conn.commit()
+            applied.append(version)
+    finally:
+        cursor.close()
+    if applied:
+        schema.refresh(conn)
+    return applied
+
+
+# ----------------------------
+# QUERY PLAN CHECK
+# ----------------------------
+def hot_queries():
+    """(name, sql, params) for the queries dashboard polls, bookings and the scheduler run.
+
+    Built from the constants the code executes (placeholders and all), so the
+    plan check follows the code rather than a copy of it.
+    """
+    # Imported here: app.py is the route module and database.py imports this one
+    import app as api
+    import queue_engine
+    import reservations
+    from slots import SLOT_COUNTS_SQL, SLOT_MINUTES
+
+    today = date.today()
+    slot_start, slot_end = time(10, 0), time(10, 30)
+    return [
+        ("slot occupancy", SLOT_COUNTS_SQL, (SLOT_MINUTES, 1, today, today)),
+        ("live queue", api.LIVE_QUEUE_SQL, (today, slot_start, slot_end)),
+        ("live queue for one doctor", api.LIVE_QUEUE_DOCTOR_SQL, (1, today, slot_start, slot_end)),
+        ("live queue engine load", queue_engine.LOAD_SQL + queue_engine.DAY_FILTER, (today,)),
+        ("patient queue status", api.PATIENT_QUEUE_SQL, {
+            "p_id": 1, "today": today, "slot_start": slot_start, "slot_seconds": SLOT_MINUTES * 60,
+        }),
+        *(
+            (f"patient {scope} appointments", api.patient_appointments_first_page(scope),
+             (1, today, api.PATIENT_APPOINTMENTS_PAGE + 1))
+            for scope in api.PATIENT_APPOINTMENT_SCOPES
+        ),
+        *((f"patient data {name}", sql, (1,)) for name, sql in api.PATIENT_DATA_SQL.items()),
+        ("doctor day", api.DOCTOR_DAY_SQL, (1, today)),
+        ("doctor pending consultations", api.DOCTOR_PENDING_CONSULTATIONS_SQL, (1, api.DASHBOARD_LIST_LIMIT)),
+        ("doctor consultations", api.DOCTOR_CONSULTATIONS_SQL, (1, api.DASHBOARD_LIST_LIMIT)),
+        ("slot counter seed", reservations.SEED_SQL, (1, today, slot_start, 1, today, slot_start, slot_end)),
+        ("login contact lookup", directory.LOOKUP_SQL, ("1234567890",)),
+        ("past appointments to complete", api.AUTO_COMPLETE_SQL, (today, today, slot_start)),
+    ]
+
+
+# Tables a hot query must never read with a full scan
+INDEXED_TABLES = {"appointment", "queue", "user_directory"}
+
+_TABLE_REF = re.compile(r"\b(?:FROM|JOIN|UPDATE)\s+(\w+)(?:\s+(?:AS\s+)?(?!ON\b|WHERE\b|SET\b|JOIN\b|LEFT\b)(\w+))?", re.I)
+
+
+def _tables_by_alias(sql):
+    """{name EXPLAIN reports: table} - EXPLAIN shows a table's alias when it has one."""
+    tables = {}
+    for table, alias in _TABLE_REF.findall(sql):
+        tables[table] = table
+        if alias:
+            tables[alias] = table
+    return tables
+
+
+def check_query_plans(conn):
+    """EXPLAIN every hot query; return a list of (query name, table) that fall back to a full scan."""
+    cursor = conn.cursor(dictionary=True)
+    regressions = []
+    try:
+        for name, sql, params in hot_queries():
+            sql = schema.sql(conn, sql)
+            tables = _tables_by_alias(sql)
+            cursor.execute("EXPLAIN " + sql, params)
+            for row in cursor.fetchall():
+                table = tables.get(row.get("table"), row.get("table"))
+                if table in INDEXED_TABLES and row.get("type") == "ALL":
+                    regressions.append((name, table))
+    finally:
+        cursor.close()
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply clinic schema migrations")
+    parser.add_argument("--status", action="store_true", help="show applied and pending migrations")
+    parser.add_argument("--check-plans", action="store_true", help="fail if a hot query does a full table scan")
+    args = parser.parse_args()
+
+    with db_connection() as conn:
+        if args.status:
+            cursor = conn.cursor()
+            done = applied_versions(cursor)
+            cursor.close()
+            for version, name, _ in MIGRATIONS:
+                print(f"{'applied' if version in done else 'pending':8} {version:4}  {name}")
+            return 0
+
+        if args.check_plans:
+            regressions = check_query_plans(conn)
+            for name, table in regressions:
+                print(f"❌ {name}: full table scan on {table}")
+            if regressions:
+                return 1
+            print(f"✅ All {len(hot_queries())} hot queries use an index")
+            return 0
+
+        applied = migrate(conn)
+        print(f"✅ Applied {len(applied)} migration(s)" if applied else "✅ Schema is up to date")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
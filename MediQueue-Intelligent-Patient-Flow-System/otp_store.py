@@ -0,0 +1,149 @@
+"""Login OTP storage with expiry.
+
+Two implementations of the same small interface:
+
+    MemoryOTPStore   per process; fine for a single worker
+    SQLiteOTPStore   a local SQLite file shared by every worker on the host
+
+Pick one with MEDIQUEUE_OTP_STORE=memory|sqlite (default memory). An OTP is
+valid for MEDIQUEUE_OTP_TTL seconds and can be used once: consume() checks
+and deletes it in one step, so two workers can never both accept it.
+"""
+import os
+import sqlite3
+import tempfile
+import threading
+import time as _time
+from collections import OrderedDict
+
+OTP_TTL_SECONDS = int(os.environ.get("MEDIQUEUE_OTP_TTL", "300"))
+MAX_ENTRIES = int(os.environ.get("MEDIQUEUE_OTP_MAX_ENTRIES", "10000"))
+SWEEP_EVERY = 100  # writes between opportunistic sweeps of expired OTPs
+
+
+class MemoryOTPStore:
+    """OTPs in an insertion-ordered dict.
+
+    Every OTP gets the same TTL, so insertion order is expiry order: sweeping
+    pops expired entries off the front, and the size bound evicts the oldest.
+    """
+
+    def __init__(self, ttl=OTP_TTL_SECONDS, max_entries=MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # contact -> (otp, expires_at)
+        self.evictions = 0
+
+    def _sweep_locked(self, now):
+        removed = 0
+        while self._entries:
+            contact, (_, expires_at) = next(iter(self._entries.items()))
+            if expires_at > now:
+                break
+            del self._entries[contact]
+            removed += 1
+        return removed
+
+    def put(self, contact, otp):
+        now = _time.monotonic()
+        with self._lock:
+            self._sweep_locked(now)
+            self._entries.pop(contact, None)
+            self._entries[contact] = (otp, now + self.ttl)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def consume(self, contact, otp):
+        """Return True and forget the OTP if it matches and has not expired."""
+        now = _time.monotonic()
+        with self._lock:
+            entry = self._entries.get(contact)
+            if entry is None or entry[1] <= now:
+                return False
+            if entry[0] != otp:
+                return False
+            del self._entries[contact]
+            return True
+
+    def sweep(self):
+        with self._lock:
+            return self._sweep_locked(_time.monotonic())
+
+    def stats(self):
+        with self._lock:
+            return {"backend": "memory", "entries": len(self._entries), "evictions": self.evictions}
+
+
+class SQLiteOTPStore:
+    """OTPs in a SQLite file, so every worker process on the host sees the same codes.
+
+    Expiry uses wall-clock time (shared between processes) with an index on
+    expires_at; expired rows are swept every SWEEP_EVERY writes and from the
+    slot scheduler.
+    """
+
+    def __init__(self, path, ttl=OTP_TTL_SECONDS):
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+        self._writes = 0
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS otp (
+                    contact TEXT PRIMARY KEY,
+                    otp INTEGER NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_otp_expires_at ON otp (expires_at)")
+
+    def _connect(self):
+        # sqlite3 connections must stay on the thread (and process) that opened them
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5)
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def put(self, contact, otp):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO otp (contact, otp, expires_at) VALUES (?, ?, ?)",
+                (contact, otp, _time.time() + self.ttl),
+            )
+        self._writes += 1
+        if self._writes % SWEEP_EVERY == 0:
+            self.sweep()
+
+    def consume(self, contact, otp):
+        """Return True and forget the OTP if it matches and has not expired."""
+        with self._connect() as conn:
+            deleted = conn.execute(
+                "DELETE FROM otp WHERE contact = ? AND otp = ? AND expires_at > ?",
+                (contact, otp, _time.time()),
+            ).rowcount
+        return deleted == 1
+
+    def sweep(self):
+        with self._connect() as conn:
+            return conn.execute("DELETE FROM otp WHERE expires_at <= ?", (_time.time(),)).rowcount
+
+    def stats(self):
+        (entries,) = self._connect().execute("SELECT COUNT(*) FROM otp").fetchone()
+        return {"backend": "sqlite", "path": self.path, "entries": entries}
+
+
+def create_otp_store():
+    """Build the store selected by MEDIQUEUE_OTP_STORE."""
+    backend = os.environ.get("MEDIQUEUE_OTP_STORE", "memory").lower()
+    if backend == "sqlite":
+        path = os.environ.get(
+            "MEDIQUEUE_OTP_DB", os.path.join(tempfile.gettempdir(), "mediqueue-otp.sqlite3")
+        )
+        return SQLiteOTPStore(path)
+    if backend != "memory":
+        raise ValueError(f"Unknown MEDIQUEUE_OTP_STORE '{backend}' (use memory or sqlite)")
+    return MemoryOTPStore()
@@ -0,0 +1,188 @@
+"""Keyset (cursor) pagination and server-side filters for list endpoints.
+
+List routes accept `?limit=N&after=<cursor>` plus route-specific filters. The
+response body stays a plain JSON array so existing clients keep working; when
+more rows exist, the opaque cursor for the next page is returned in the
+`X-Next-Cursor` header (and a `Link: <...>; rel="next"` header). Pages are
+fetched with `WHERE (sort key) > (last key seen)` on indexed sort columns, so
+page N costs the same as page 1. Without `limit` the full list is returned,
+unless the route sets a default page size.
+"""
+import base64
+import json
+from datetime import date, datetime, timedelta
+from urllib.parse import urlencode
+
+from flask import jsonify, request
+
+MAX_LIMIT = 500
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class PageError(ValueError):
+    """Raised for malformed limit, cursor or filter parameters."""
+
+
+# ----------------------------
+# CURSORS
+# ----------------------------
+def _cursor_value(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, timedelta):
+        return str(value)
+    return value
+
+
+def encode_cursor(values):
+    raw = json.dumps([_cursor_value(v) for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token, expected_len):
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError) as e:
+        raise PageError("Invalid pagination cursor") from e
+    if not isinstance(values, list) or len(values) != expected_len:
+        raise PageError("Invalid pagination cursor")
+    return values
+
+
+# ----------------------------
+# SQL BUILDING
+# ----------------------------
+class Keyset:
+    """An ORDER BY over (sql expression, direction, row key) triples.
+
+    The last triple must be unique (normally the primary key) so the order is total.
+    """
+
+    def __init__(self, *keys):
+        self.keys = keys
+
+    def order_by(self):
+        return "ORDER BY " + ", ".join(f"{expr} {direction}" for expr, direction, _ in self.keys)
+
+    def after(self, values):
+        """Return (sql, params) selecting rows strictly after `values` in this order.
+
+        Expanded as `a > x OR (a = x AND (b > y OR ...))` so MySQL can range-scan the index.
+        """
+        sql, params = None, []
+        for (expr, direction, _), value in reversed(list(zip(self.keys, values))):
+            op = ">" if direction == "ASC" else "<"
+            if sql is None:
+                sql, params = f"{expr} {op} %s", [value]
+            else:
+                sql = f"({expr} {op} %s OR ({expr} = %s AND {sql}))"
+                params = [value, value] + params
+        return sql, params
+
+    def values_of(self, row):
+        return [row[key] for _, _, key in self.keys]
+
+
+def parse_date_arg(value):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError as e:
+        raise PageError(f"Invalid date '{value}'. Use YYYY-MM-DD") from e
+
+
+def parse_int_arg(value):
+    try:
+        return int(value)
+    except ValueError as e:
+        raise PageError(f"Invalid integer '{value}'") from e
+
+
+def build_filters(spec, columns=None):
+    """Turn query params into WHERE clauses.
+
+    `spec` maps a query param name to (sql with one %s, parser); params that
+    are absent from the request are skipped. `columns` (a schema.columns()
+    mapping) fills {a_status}/{q_status} placeholders in the sql.
+    """
+    clauses, params = [], []
+    for name, (sql, parse) in spec.items():
+        raw = request.args.get(name)
+        if raw in (None, ""):
+            continue
+        clauses.append(sql.format(**columns) if columns else sql)
+        params.append(parse(raw) if parse else raw)
+    return clauses, params
+
+
+def parse_limit(default=None):
+    raw = request.args.get("limit")
+    if raw in (None, ""):
+        return default
+    limit = parse_int_arg(raw)
+    if limit < 1:
+        raise PageError("limit must be positive")
+    return min(limit, MAX_LIMIT)
+
+
+def fetch_page(cursor, select_sql, keyset, filters=None, default_limit=None):
+    """Run `select_sql` (a SELECT ... FROM ... JOIN ... without WHERE/ORDER BY) for one page.
+
+    `filters` is a (clauses, params) pair from build_filters(). Without a
+    `limit` param the page holds `default_limit` rows (None = all). Returns
+    (rows, next_cursor); next_cursor is None on the last page.
+    """
+    clauses, params = filters or ([], [])
+    clauses, params = list(clauses), list(params)
+
+    limit = parse_limit(default_limit)
+    after = request.args.get("after")
+    if after:
+        if limit is None:
+            limit = MAX_LIMIT
+        sql, after_params = keyset.after(decode_cursor(after, len(keyset.keys)))
+        clauses.append(sql)
+        params.extend(after_params)
+
+    query = select_sql
+    if clauses:
+        query += "\nWHERE " + "\n  AND ".join(clauses)
+    query += "\n" + keyset.order_by()
+    if limit is not None:
+        query += "\nLIMIT %s"
+        params.append(limit + 1)  # one extra row tells us whether there is a next page
+
+    cursor.execute(query, tuple(params))
+    rows = cursor.fetchall()
+
+    next_cursor = None
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(keyset.values_of(rows[-1]))
+    return rows, next_cursor
+
+
+def first_page(cursor, query, params, keyset, limit):
+    """Run a prepared first-page `query` ending in `LIMIT %s` and return (rows, next_cursor) like fetch_page().
+
+    For bundles that read a list's first page next to other data; the
+    cursor continues on the list's own paginated endpoint.
+    """
+    cursor.execute(query, tuple(params) + (limit + 1,))
+    rows = cursor.fetchall()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(keyset.values_of(rows[-1]))
+    return rows, next_cursor
+
+
+def page_response(data, next_cursor):
+    """jsonify a page, advertising the next cursor in headers when there is one."""
+    response = jsonify(data)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+        args = request.args.to_dict()
+        args["after"] = next_cursor
+        response.headers["Link"] = f'<{request.path}?{urlencode(args)}>; rel="next"'
+    return response
@@ -0,0 +1,216 @@
+"""In-memory live queue for today, kept per (doctor, slot).
+
+The engine holds every active (Scheduled/Waiting) appointment of the day in
+a sorted list per (doctor, slot start), ordered by (time, token, a_id). It is
+rebuilt from MySQL on startup and at every slot boundary, and updated
+incrementally by the write routes in between, so /queue/live and
+/queue/patient/<p_id> answer without touching the database.
+
+Each process keeps its own copy: with several workers, a write handled by
+another worker is picked up at the next rebuild. Set MEDIQUEUE_QUEUE_ENGINE=0
+to always answer from SQL.
+"""
+import os
+import threading
+from bisect import bisect_left, insort
+from datetime import date
+
+import schema
+from serializer import as_time
+from slots import slot_start_for
+
+ENABLED = os.environ.get("MEDIQUEUE_QUEUE_ENGINE", "1") != "0"
+ACTIVE_APPOINTMENT_STATUSES = ("Scheduled", "Waiting")
+ACTIVE_QUEUE_STATUSES = ("waiting", "in progress", "consulting")
+
+LOAD_SQL = """
+    SELECT a.a_id, a.date, a.time, a.{a_status} AS appointment_status,
+           p.p_id AS patient_id, p.p_name AS patient_name,
+           d.d_id AS doctor_id, d.d_name AS doctor_name,
+           q.token_no, q.{q_status} AS queue_status, q.q_id
+    FROM appointment a
+    JOIN patient p ON a.p_id = p.p_id
+    JOIN doctor d ON a.d_id = d.d_id
+    LEFT JOIN queue q ON a.a_id = q.a_id
+"""
+DAY_FILTER = "WHERE a.date = %s AND a.{a_status} IN ('Scheduled', 'Waiting')"
+
+
+def _sort_key(entry):
+    # MySQL sorts NULL tokens first; -1 reproduces that
+    token = entry["token_no"] if entry["token_no"] is not None else -1
+    return (entry["time"], token, entry["a_id"])
+
+
+def _is_waiting(entry):
+    # Mirrors the SQL it replaces: only appointments with a queue row take a place
+    return entry["q_id"] is not None and (entry["queue_status"] or "").lower() in ACTIVE_QUEUE_STATUSES
+
+
+class LiveQueueEngine:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.day = None
+        self.ready = False
+        self._entries = {}     # a_id -> entry dict
+        self._slots = {}       # (d_id, slot_start) -> sorted [sort key]
+        self._by_patient = {}  # p_id -> {a_id}
+        self._touched = None   # a_ids changed while a rebuild is reading its snapshot
+
+    # ----------------------------
+    # MAINTENANCE
+    # ----------------------------
+    def _insert(self, entry):
+        key = (entry["doctor_id"], slot_start_for(entry["time"]))
+        self._entries[entry["a_id"]] = entry
+        insort(self._slots.setdefault(key, []), _sort_key(entry))
+        self._by_patient.setdefault(entry["patient_id"], set()).add(entry["a_id"])
+
+    def _discard(self, a_id):
+        entry = self._entries.pop(a_id, None)
+        if entry is None:
+            return
+        key = (entry["doctor_id"], slot_start_for(entry["time"]))
+        ordered = self._slots.get(key, [])
+        i = bisect_left(ordered, _sort_key(entry))
+        if i < len(ordered) and ordered[i] == _sort_key(entry):
+            del ordered[i]
+        if not ordered:
+            self._slots.pop(key, None)
+        patient_appts = self._by_patient.get(entry["patient_id"])
+        if patient_appts:
+            patient_appts.discard(a_id)
+            if not patient_appts:
+                del self._by_patient[entry["patient_id"]]
+
+    @staticmethod
+    def _entry_from_row(row):
+        entry = dict(row)
+        entry["time"] = as_time(entry["time"])
+        return entry
+
+    def _snapshot(self, conn, day):
+        cursor = conn.cursor(dictionary=True)
+        try:
+            cursor.execute(schema.sql(conn, LOAD_SQL + DAY_FILTER), (day,))
+            return {row["a_id"]: self._entry_from_row(row) for row in cursor.fetchall()}
+        finally:
+            cursor.close()
+
+    def rebuild(self, conn, day=None):
+        """Reload today's active appointments from the database."""
+        day = day or date.today()
+        with self._lock:
+            self._touched = set()
+        try:
+            snapshot = self._snapshot(conn, day)
+            with self._lock:
+                self._entries, self._slots, self._by_patient = {}, {}, {}
+                for entry in snapshot.values():
+                    self._insert(entry)
+                self.day = day
+                self.ready = True
+                touched = self._touched
+        finally:
+            with self._lock:
+                self._touched = None
+        # Writes that landed while the snapshot was being read may be missing from it
+        for a_id in touched:
+            self.refresh_appointment(conn, a_id)
+        return len(self._entries)
+
+    def refresh_appointment(self, conn, a_id):
+        """Re-read one appointment (primary-key lookup) after it was created or changed."""
+        self.refresh_appointments(conn, [a_id])
+
+    def refresh_appointments(self, conn, a_ids):
+        """Re-read several appointments in one primary-key IN query (bulk writes)."""
+        a_ids = list(a_ids)
+        if not a_ids:
+            return
+        cursor = conn.cursor(dictionary=True)
+        try:
+            placeholders = ", ".join(["%s"] * len(a_ids))
+            cursor.execute(schema.sql(conn, LOAD_SQL + f"WHERE a.a_id IN ({placeholders})"), tuple(a_ids))
+            rows = {row["a_id"]: row for row in cursor.fetchall()}
+        finally:
+            cursor.close()
+        with self._lock:
+            for a_id in a_ids:
+                if self._touched is not None:
+                    self._touched.add(a_id)
+                self._discard(a_id)
+                row = rows.get(a_id)
+                if row and row["date"] == self.day and row["appointment_status"] in ACTIVE_APPOINTMENT_STATUSES:
+                    self._insert(self._entry_from_row(row))
+
+    def remove(self, a_id):
+        with self._lock:
+            if self._touched is not None:
+                self._touched.add(a_id)
+            self._discard(a_id)
+
+    def is_current(self, today=None):
+        return ENABLED and self.ready and self.day == (today or date.today())
+
+    # ----------------------------
+    # QUERIES
+    # ----------------------------
+    def live(self, slot_start, d_id=None):
+        """Entries in the slot starting at `slot_start` (every doctor's, or just `d_id`'s), ordered by time and token."""
+        with self._lock:
+            keys = []
+            for (doctor, start), ordered in self._slots.items():
+                if start == slot_start and d_id in (None, doctor):
+                    keys.extend(ordered)
+            keys.sort()
+            return [dict(self._entries[a_id]) for _, _, a_id in keys]
+
+    def next_for_patient(self, p_id, slot_start):
+        """The patient's earliest entry today at or after `slot_start`, or None."""
+        with self._lock:
+            candidates = [self._entries[a_id] for a_id in self._by_patient.get(p_id, ())]
+            candidates = [e for e in candidates if e["time"] >= slot_start]
+            if not candidates:
+                return None
+            return dict(min(candidates, key=lambda e: (e["time"], e["a_id"])))
+
+    def ahead_of(self, entry):
+        """Number of still-waiting entries ahead of `entry` in its doctor's slot."""
+        with self._lock:
+            ordered = self._slots.get((entry["doctor_id"], slot_start_for(entry["time"])), [])
+            position = bisect_left(ordered, _sort_key(entry))
+            return sum(1 for _, _, a_id in ordered[:position] if _is_waiting(self._entries[a_id]))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": ENABLED,
+                "ready": self.ready,
+                "day": self.day.isoformat() if self.day else None,
+                "appointments": len(self._entries),
+                "slots": len(self._slots),
+                "patients": len(self._by_patient),
+            }
+
+    def check(self, conn):
+        """Compare the in-memory state with the database; return the differences."""
+        day = self.day or date.today()
+        snapshot = self._snapshot(conn, day)
+        with self._lock:
+            missing = sorted(set(snapshot) - set(self._entries))
+            extra = sorted(set(self._entries) - set(snapshot))
+            mismatched = sorted(
+                a_id for a_id in set(snapshot) & set(self._entries)
+                if snapshot[a_id] != self._entries[a_id]
+            )
+        return {
+            "day": day.isoformat(),
+            "consistent": not (missing or extra or mismatched),
+            "missing": missing,
+            "extra": extra,
+            "mismatched": mismatched,
+        }
+
+
+live_queue = LiveQueueEngine()
@@ -0,0 +1,319 @@
+"""Race-free slot reservation for appointment booking.
+
+Each (doctor, date, slot) has a row in `slot_reservation` holding how many
+Scheduled/Waiting appointments it has and the last token handed out. A
+booking claims capacity and its token with one conditional UPDATE on that
+row; the row lock it takes serialises concurrent bookings for the same slot
+until the booking transaction commits, so the slot can never be
+oversubscribed and tokens never repeat.
+
+The same row is the slot's token sequence: every code path that creates a
+queue row takes its token from `last_token` (reserve_and_book() and
+claim_slot() together with the capacity, allocate_token() on its own), so
+numbering is per slot everywhere and allocation is a primary-key update,
+never a MAX() scan.
+
+reserve_and_book_many() books a whole batch in one transaction: it locks
+every counter row the batch touches with a single SELECT ... FOR UPDATE,
+checks capacity and hands out tokens in memory, then writes appointments,
+queue rows and counters with one multi-row statement each.
+"""
+from mysql.connector import Error
+
+import schema
+from serializer import as_time
+from slots import SLOT_CAPACITY, slot_window
+
+RESERVATION_TABLE_DDL = """
+    CREATE TABLE IF NOT EXISTS slot_reservation (
+        d_id INT NOT NULL,
+        date DATE NOT NULL,
+        slot_start TIME NOT NULL,
+        booked INT NOT NULL DEFAULT 0,
+        last_token INT NOT NULL DEFAULT 0,
+        PRIMARY KEY (d_id, date, slot_start)
+    )
+"""
+
+_table_ready = False
+
+
+class SlotFull(Exception):
+    """Raised when a slot already holds SLOT_CAPACITY active appointments."""
+
+    def __init__(self, slot_start, slot_end, capacity=SLOT_CAPACITY):
+        super().__init__(f"Slot {slot_start}-{slot_end} is full")
+        self.slot_start = slot_start
+        self.slot_end = slot_end
+        self.capacity = capacity
+
+
+def ensure_reservation_table(conn):
+    """Create the counter table once per process (DDL commits implicitly)."""
+    global _table_ready
+    if _table_ready:
+        return
+    cursor = conn.cursor()
+    try:
+        cursor.execute(RESERVATION_TABLE_DDL)
+    finally:
+        cursor.close()
+    _table_ready = True
+
+
+def _claim(cursor, d_id, day, slot_start):
+    """Take one unit of capacity and the next token; return the token or None if full/missing."""
+    cursor.execute(
+        """
+        UPDATE slot_reservation
+        SET booked = booked + 1,
+            last_token = LAST_INSERT_ID(last_token + 1)
+        WHERE d_id = %s AND date = %s AND slot_start = %s
+          AND booked < %s
+        """,
+        (d_id, day, slot_start, SLOT_CAPACITY),
+    )
+    if cursor.rowcount != 1:
+        return None
+    # LAST_INSERT_ID(expr) makes the new token come back in the OK packet
+    return cursor.lastrowid
+
+
+def _next_token(cursor, d_id, day, slot_start):
+    """Advance the slot's token sequence without touching its capacity; None if the row is missing."""
+    cursor.execute(
+        """
+        UPDATE slot_reservation
+        SET last_token = LAST_INSERT_ID(last_token + 1)
+        WHERE d_id = %s AND date = %s AND slot_start = %s
+        """,
+        (d_id, day, slot_start),
+    )
+    if cursor.rowcount != 1:
+        return None
+    return cursor.lastrowid
+
+
+SEED_SQL = """
+    INSERT IGNORE INTO slot_reservation (d_id, date, slot_start, booked, last_token)
+    SELECT %s, %s, %s,
+           COUNT(CASE WHEN a.{a_status} IN ('Scheduled','Waiting') THEN 1 END),
+           COALESCE(MAX(q.token_no), 0)
+    FROM appointment a
+    LEFT JOIN queue q ON q.a_id = a.a_id
+    WHERE a.d_id = %s
+      AND a.date = %s
+      AND a.time >= %s AND a.time < %s
+"""
+
+
+def _seed(conn, cursor, d_id, day, slot_start, slot_end):
+    """Create the counter row for a slot from the appointments already in it."""
+    cursor.execute(
+        schema.sql(conn, SEED_SQL),
+        (d_id, day, slot_start, d_id, day, slot_start, slot_end),
+    )
+
+
+def _counter_exists(cursor, d_id, day, slot_start):
+    cursor.execute(
+        "SELECT 1 FROM slot_reservation WHERE d_id = %s AND date = %s AND slot_start = %s",
+        (d_id, day, slot_start),
+    )
+    return cursor.fetchone() is not None
+
+
+def _claim_or_seed(conn, cursor, d_id, day, slot_start, slot_end):
+    """_claim(), seeding the counter row first if the slot has never been booked; None if full.
+
+    A full slot is the usual reason a claim fails, so the seed (a counting
+    scan of the slot's appointments) only runs when a primary-key lookup
+    shows the row is really missing.
+    """
+    token_no = _claim(cursor, d_id, day, slot_start)
+    if token_no is None and not _counter_exists(cursor, d_id, day, slot_start):
+        _seed(conn, cursor, d_id, day, slot_start, slot_end)
+        token_no = _claim(cursor, d_id, day, slot_start)
+    return token_no
+
+
+def reserve_and_book(conn, p_id, d_id, day, appt_time):
+    """Book an appointment and its queue token in one short transaction.
+
+    Returns (a_id, token_no). Raises SlotFull when the slot has no capacity left.
+    """
+    ensure_reservation_table(conn)
+    slot_start, slot_end = slot_window(day, appt_time)
+    cursor = conn.cursor()
+    try:
+        token_no = _claim_or_seed(conn, cursor, d_id, day, slot_start, slot_end)
+        if token_no is None:
+            conn.rollback()
+            raise SlotFull(slot_start, slot_end)
+
+        cursor.execute(
+            schema.sql(conn, """INSERT INTO appointment (p_id, d_id, date, time, {a_status})
+               VALUES (%s, %s, %s, %s, 'Scheduled')"""),
+            (p_id, d_id, day, appt_time),
+        )
+        a_id = cursor.lastrowid
+        cursor.execute(
+            schema.sql(conn, "INSERT INTO queue (a_id, token_no, {q_status}) VALUES (%s, %s, 'Waiting')"),
+            (a_id, token_no),
+        )
+        conn.commit()
+        return a_id, token_no
+    except Error:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def _lock_counters(cursor, keys):
+    """Lock the counter rows for (d_id, date, slot_start) keys; return {key: [booked, last_token]} for those that exist."""
+    rows = ", ".join(["(%s, %s, %s)"] * len(keys))
+    cursor.execute(
+        f"""
+        SELECT d_id, date, slot_start, booked, last_token
+        FROM slot_reservation
+        WHERE (d_id, date, slot_start) IN ({rows})
+        FOR UPDATE
+        """,
+        [value for key in keys for value in key],
+    )
+    counters = {}
+    for d_id, day, slot_start, booked, last_token in cursor.fetchall():
+        counters[(d_id, day, as_time(slot_start))] = [booked, last_token]
+    return counters
+
+
+def _inserted_ids(cursor, first_id, expected):
+    """Primary keys of the rows of one multi-row INSERT, checked against `expected` [(p_id, d_id)].
+
+    InnoDB hands a simple multi-row INSERT a consecutive block of ids; the read
+    back makes sure of it (and of auto_increment_increment) rather than assuming.
+    """
+    cursor.execute("SELECT @@SESSION.auto_increment_increment")
+    step = cursor.fetchone()[0]
+    a_ids = [first_id + i * step for i in range(len(expected))]
+    placeholders = ", ".join(["%s"] * len(a_ids))
+    cursor.execute(f"SELECT a_id, p_id, d_id FROM appointment WHERE a_id IN ({placeholders})", a_ids)
+    found = {a_id: (p_id, d_id) for a_id, p_id, d_id in cursor.fetchall()}
+    if [found.get(a_id) for a_id in a_ids] != list(expected):
+        raise Error(msg="Bulk insert did not receive consecutive appointment ids")
+    return a_ids
+
+
+def reserve_and_book_many(conn, items):
+    """Book a batch of (p_id, d_id, day, appt_time) items in one transaction.
+
+    Capacity is checked per slot across the batch, in item order. Returns one
+    result per item: (a_id, token_no), or a SlotFull for items whose slot had
+    no capacity left (the rest of the batch is still booked).
+    """
+    ensure_reservation_table(conn)
+    windows = [slot_window(day, appt_time) for _, _, day, appt_time in items]
+    slot_ends = {}
+    for (_, d_id, day, _), (slot_start, slot_end) in zip(items, windows):
+        slot_ends[(d_id, day, slot_start)] = slot_end
+    keys = sorted(slot_ends)  # one lock order for every batch, so batches don't deadlock each other
+
+    cursor = conn.cursor()
+    try:
+        counters = _lock_counters(cursor, keys)
+        missing = [key for key in keys if key not in counters]
+        if missing:
+            for d_id, day, slot_start in missing:
+                _seed(conn, cursor, d_id, day, slot_start, slot_ends[(d_id, day, slot_start)])
+            counters.update(_lock_counters(cursor, missing))
+
+        results = []
+        bookings = []
+        for (p_id, d_id, day, appt_time), (slot_start, slot_end) in zip(items, windows):
+            counter = counters[(d_id, day, slot_start)]
+            if counter[0] >= SLOT_CAPACITY:
+                results.append(SlotFull(slot_start, slot_end))
+                continue
+            counter[0] += 1
+            counter[1] += 1
+            bookings.append((len(results), p_id, d_id, day, appt_time, counter[1]))
+            results.append(None)
+
+        if bookings:
+            cursor.executemany(
+                schema.sql(conn, """INSERT INTO appointment (p_id, d_id, date, time, {a_status})
+                   VALUES (%s, %s, %s, %s, 'Scheduled')"""),
+                [(p_id, d_id, day, appt_time) for _, p_id, d_id, day, appt_time, _ in bookings],
+            )
+            a_ids = _inserted_ids(cursor, cursor.lastrowid, [(p_id, d_id) for _, p_id, d_id, _, _, _ in bookings])
+            cursor.executemany(
+                schema.sql(conn, "INSERT INTO queue (a_id, token_no, {q_status}) VALUES (%s, %s, 'Waiting')"),
+                [(a_id, booking[5]) for a_id, booking in zip(a_ids, bookings)],
+            )
+            # The rows are locked above, so writing the final values back is safe (MySQL 8.0.19+ row alias)
+            cursor.executemany(
+                """
+                INSERT INTO slot_reservation (d_id, date, slot_start, booked, last_token)
+                VALUES (%s, %s, %s, %s, %s) AS new
+                ON DUPLICATE KEY UPDATE booked = new.booked, last_token = new.last_token
+                """,
+                [key + tuple(counters[key]) for key in keys],
+            )
+            for a_id, booking in zip(a_ids, bookings):
+                results[booking[0]] = (a_id, booking[5])
+        conn.commit()
+        return results
+    except Error:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def allocate_token(conn, cursor, d_id, day, appt_time):
+    """Hand out the next token of an existing appointment's slot.
+
+    For queue rows created outside reserve_and_book() (appointments that were
+    stored without one). Runs inside the caller's transaction, which holds the
+    counter row lock until it commits, so concurrent callers never share a token.
+    """
+    ensure_reservation_table(conn)
+    slot_start, slot_end = slot_window(day, appt_time)
+    token_no = _next_token(cursor, d_id, day, slot_start)
+    if token_no is None:
+        _seed(conn, cursor, d_id, day, slot_start, slot_end)
+        token_no = _next_token(cursor, d_id, day, slot_start)
+    return token_no
+
+
+def claim_slot(conn, cursor, d_id, day, appt_time):
+    """Take one unit of an appointment's slot capacity and its token; return the token.
+
+    For appointments inserted outside reserve_and_book() with an active
+    status. Runs inside the caller's transaction, so the claim and the
+    INSERT commit (or roll back) together. Raises SlotFull when the slot
+    has no capacity left.
+    """
+    ensure_reservation_table(conn)
+    slot_start, slot_end = slot_window(day, appt_time)
+    token_no = _claim_or_seed(conn, cursor, d_id, day, slot_start, slot_end)
+    if token_no is None:
+        raise SlotFull(slot_start, slot_end)
+    return token_no
+
+
+def release_slot(cursor, d_id, day, appt_time):
+    """Give back one unit of capacity when an active appointment leaves its slot.
+
+    Runs inside the caller's transaction. Tokens are never reused.
+    """
+    slot_start, _ = slot_window(day, appt_time)
+    cursor.execute(
+        """
+        UPDATE slot_reservation
+        SET booked = booked - 1
+        WHERE d_id = %s AND date = %s AND slot_start = %s AND booked > 0
+        """,
+        (d_id, day, slot_start),
+    )
@@ -0,0 +1,174 @@
+"""Versioned response cache with conditional GET for rarely-changing reads.
+
+Cached views belong to a resource family ("doctors", "patients", "admins",
+"slots:<d_id>"). Each family has a version that write routes bump; a stored
+response is served only while its family version is unchanged, so a write
+invalidates every cached page of that family at once without tracking keys.
+
+Responses carry an ETag (a hash of the body) and Last-Modified (when the
+family last changed). A request whose If-None-Match matches the stored ETag
+gets a 304 straight from memory, without a database connection.
+
+Memory is bounded by an LRU over at most MEDIQUEUE_RESPONSE_CACHE_SIZE
+responses. Versions are per process, so entries also expire after
+MEDIQUEUE_RESPONSE_CACHE_TTL seconds to bound staleness from writes handled
+by another worker.
+"""
+import hashlib
+import os
+import threading
+import time as _time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import make_response, request
+
+MAX_ENTRIES = max(1, int(os.environ.get("MEDIQUEUE_RESPONSE_CACHE_SIZE", "512")))
+TTL_SECONDS = float(os.environ.get("MEDIQUEUE_RESPONSE_CACHE_TTL", "60"))
+
+
+class _Entry:
+    __slots__ = ("version", "stored_at", "etag", "last_modified", "body", "mimetype")
+
+    def __init__(self, version, etag, last_modified, body, mimetype):
+        self.version = version
+        self.stored_at = _time.monotonic()
+        self.etag = etag
+        self.last_modified = last_modified
+        self.body = body
+        self.mimetype = mimetype
+
+
+class ResponseCache:
+    def __init__(self, max_entries=MAX_ENTRIES, ttl=TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # (family, full path) -> _Entry, least recently used first
+        self._versions = {}            # family -> (version, last modified)
+        self._started = datetime.now(timezone.utc).replace(microsecond=0)
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.evictions = 0
+
+    # ----------------------------
+    # VERSIONS
+    # ----------------------------
+    def version(self, family):
+        with self._lock:
+            return self._versions.get(family, (0, self._started))
+
+    def bump(self, *families):
+        """Invalidate everything cached for `families` (call after the write commits)."""
+        now = datetime.now(timezone.utc).replace(microsecond=0)
+        with self._lock:
+            for family in families:
+                version, _ = self._versions.get(family, (0, self._started))
+                self._versions[family] = (version + 1, now)
+
+    def bump_prefix(self, prefix):
+        """Invalidate every family whose name starts with `prefix` (e.g. "slots:")."""
+        with self._lock:
+            families = {family for family, _ in self._entries if family.startswith(prefix)}
+        self.bump(*families)
+
+    # ----------------------------
+    # ENTRIES
+    # ----------------------------
+    def _lookup(self, key, version):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.version != version or _time.monotonic() - entry.stored_at > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def _store(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "families": len(self._versions),
+                "hits": self.hits,
+                "misses": self.misses,
+                "not_modified": self.not_modified,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else None,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    # ----------------------------
+    # VIEW DECORATOR
+    # ----------------------------
+    def _respond(self, entry):
+        response = make_response(entry.body)
+        response.mimetype = entry.mimetype
+        response.set_etag(entry.etag)
+        response.last_modified = entry.last_modified
+        response.headers["Cache-Control"] = "no-cache"  # clients must revalidate, which is cheap
+        response.make_conditional(request)
+        if response.status_code == 304:
+            self._count("not_modified")
+        return response
+
+    def cached(self, family):
+        """Cache a GET view's 200 responses under `family`.
+
+        `family` is a name, or a callable taking the view's URL arguments and
+        returning one (for per-resource families such as "slots:<d_id>").
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                name = family(**kwargs) if callable(family) else family
+                version, last_modified = self.version(name)
+                key = (name, request.full_path)
+
+                entry = self._lookup(key, version)
+                if entry is not None:
+                    self._count("hits")
+                    return self._respond(entry)
+
+                self._count("misses")
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200 or response.is_streamed:
+                    return response
+                body = response.get_data()
+                entry = _Entry(
+                    version,
+                    hashlib.sha1(body).hexdigest()[:20],
+                    last_modified,
+                    body,
+                    response.mimetype,
+                )
+                # Only keep it if no write bumped the family while the view ran
+                if self.version(name)[0] == version:
+                    self._store(key, entry)
+                return self._respond(entry)
+            return wrapper
+        return decorator
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,102 @@
+"""Background jobs that run once per 30-minute appointment slot boundary."""
+import threading
+import time as _time
+from datetime import datetime, timedelta
+
+from log_config import get_logger
+from metrics import observe_job
+from slots import SLOT_MINUTES
+from sql_trace import traced
+
+log = get_logger("scheduler")
+
+# Wake slightly after the boundary so `datetime.now()` is safely inside the new slot
+BOUNDARY_GRACE_SECONDS = 1.0
+
+
+def current_slot_start(now=None):
+    """Return the start of the 30-minute slot containing `now`."""
+    now = now or datetime.now()
+    slot_minute = 0 if now.minute < SLOT_MINUTES else SLOT_MINUTES
+    return now.replace(minute=slot_minute, second=0, microsecond=0)
+
+
+def next_slot_boundary(now=None):
+    """Return the datetime at which the next 30-minute slot starts."""
+    return current_slot_start(now) + timedelta(minutes=SLOT_MINUTES)
+
+
+class SlotBoundaryScheduler:
+    """Runs registered jobs on startup and then at every slot boundary.
+
+    Jobs run sequentially on a single daemon thread; a failing job is logged
+    and does not stop the others. With several worker processes each runs a
+    scheduler: jobs on process-local state (caches, the in-memory queue) run
+    in all of them, while `shared` jobs (database writes) only run in the
+    process whose `leader.held()` is true.
+    """
+
+    def __init__(self, leader=None):
+        self._jobs = []
+        self._leader = leader
+        self._stop = threading.Event()
+        self._thread = None
+        self.last_runs = {}  # {job name: {"started_at", "duration_ms", "ok", "statements", "db_ms"}}
+
+    def add_job(self, func=None, name=None, shared=False):
+        """Register `func` (also usable as @add_job or @add_job(shared=True))."""
+        if func is None:
+            return lambda f: self.add_job(f, name, shared)
+        self._jobs.append((name or func.__name__, func, shared))
+        return func
+
+    def is_leader(self):
+        return self._leader is None or self._leader.held()
+
+    def run_jobs(self):
+        leading = None
+        for name, func, shared in self._jobs:
+            if shared:
+                if leading is None:
+                    leading = self.is_leader()
+                if not leading:
+                    continue
+            started = _time.perf_counter()
+            ok = True
+            with traced(name) as trace:
+                try:
+                    func()
+                except Exception:
+                    ok = False
+                    log.exception("Scheduled job %s failed", name)
+            elapsed = _time.perf_counter() - started
+            observe_job(name, elapsed, ok)
+            self.last_runs[name] = {
+                "started_at": datetime.now().isoformat(),
+                "duration_ms": round(elapsed * 1000, 3),
+                "ok": ok,
+                "statements": trace.statements,
+                "db_ms": round(trace.db_ms, 3),
+            }
+
+    def _loop(self):
+        self.run_jobs()
+        while not self._stop.is_set():
+            wait = (next_slot_boundary() - datetime.now()).total_seconds() + BOUNDARY_GRACE_SECONDS
+            if self._stop.wait(max(wait, 0)):
+                break
+            self.run_jobs()
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="slot-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+        if self._leader is not None:
+            self._leader.release()
@@ -0,0 +1,75 @@
+"""Schema capabilities: which column names this database actually uses.
+
+database.py creates `appointment.status` and `queue.status`, while
+hospital.sql has `appointment.a_status` and `queue.q_status`. SQL touching
+those columns is written with `{a_status}` / `{q_status}` placeholders and
+formatted with columns(), which reads information_schema once per process
+(and again after migrations via refresh()) instead of on every request.
+"""
+import threading
+
+# placeholder -> (table, candidate columns in order of preference)
+CAPABILITIES = {
+    "a_status": ("appointment", ("a_status", "status")),
+    "q_status": ("queue", ("q_status", "status")),
+}
+
+_columns = None
+_lock = threading.Lock()
+
+
+class SchemaError(RuntimeError):
+    """Raised when a table lacks every candidate column for a capability."""
+
+
+def _text(value):
+    # information_schema columns come back as bytes on some server/connector combinations
+    return value.decode() if isinstance(value, (bytes, bytearray)) else str(value)
+
+
+def resolve(cursor):
+    """Look the mapping up without caching it (for migrations mid-change)."""
+    tables = sorted({table for table, _ in CAPABILITIES.values()})
+    cursor.execute(
+        f"""
+        SELECT table_name, column_name FROM information_schema.columns
+        WHERE table_schema = DATABASE() AND table_name IN ({', '.join(['%s'] * len(tables))})
+        """,
+        tuple(tables),
+    )
+    present = {(_text(table).lower(), _text(column).lower()) for table, column in cursor.fetchall()}
+
+    resolved = {}
+    for name, (table, candidates) in CAPABILITIES.items():
+        for column in candidates:
+            if (table, column) in present:
+                resolved[name] = column
+                break
+        else:
+            raise SchemaError(f"{table} has none of the columns {', '.join(candidates)}")
+    return resolved
+
+
+def refresh(conn):
+    """Re-read the schema (call after migrations); returns the new mapping."""
+    global _columns
+    cursor = conn.cursor()
+    try:
+        resolved = resolve(cursor)
+    finally:
+        cursor.close()
+    with _lock:
+        _columns = resolved
+    return resolved
+
+
+def columns(conn):
+    """Return {placeholder: column name}, resolving it on first use."""
+    if _columns is None:
+        return refresh(conn)
+    return _columns
+
+
+def sql(conn, text):
+    """Format `text`'s {a_status}/{q_status} placeholders for this database."""
+    return text.format(**columns(conn))
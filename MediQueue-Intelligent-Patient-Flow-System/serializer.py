@@ -0,0 +1,227 @@
+"""Turning MySQL rows into JSON responses.
+
+mysql-connector hands back DATE, DATETIME, TIME and DECIMAL cells as date,
+datetime, timedelta and Decimal objects, which JSON can't hold. Rather than
+an isinstance check on every cell of every row, serialize() builds a
+converter plan once per result (from cursor.description when the cursor is
+at hand, else from the first non-null value of each column) and touches
+only the columns that need converting:
+
+    DATE      -> "YYYY-MM-DD"
+    DATETIME  -> "YYYY-MM-DD HH:MM:SS"
+    TIME      -> "HH:MM:SS" (zero-padded)
+    DECIMAL   -> str
+
+Rows are converted in place. as_time()/as_date() go the other way, reading
+the same values back into datetime.time/date for slot arithmetic.
+
+install(app) makes jsonify encode with orjson when it is installed (pip
+install orjson, an optional dependency); output is the same JSON as Flask's
+default provider, minus the ASCII escaping. Without orjson nothing changes.
+"""
+import json
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from functools import lru_cache
+
+from flask.json.provider import DefaultJSONProvider
+from mysql.connector import FieldType
+
+try:
+    import orjson
+except ImportError:  # optional dependency, see the module docstring
+    orjson = None
+
+
+# ----------------------------
+# CONVERTERS
+# ----------------------------
+def _date_to_str(value):
+    return value.isoformat()
+
+
+def _datetime_to_str(value):
+    return value.isoformat(" ")
+
+
+def _timedelta_to_str(value):
+    if not value.days and not value.microseconds:
+        text = str(value)  # "H:MM:SS" for the common 0-24h case, formatted in C
+        return "0" + text if len(text) == 7 else text
+    seconds = value.days * 86400 + value.seconds
+    sign = "-" if seconds < 0 else ""
+    seconds = abs(seconds)
+    return f"{sign}{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+def _time_to_str(value):
+    return f"{value.hour:02d}:{value.minute:02d}:{value.second:02d}"
+
+
+def format_hhmm(value):
+    """A TIME value (timedelta, time or "H:MM[:SS]" string) as "HH:MM"."""
+    if isinstance(value, timedelta):
+        return _timedelta_to_str(value).rsplit(":", 1)[0]
+    if isinstance(value, time):
+        return f"{value.hour:02d}:{value.minute:02d}"
+    hours, _, rest = str(value).partition(":")
+    return f"{hours.zfill(2)}:{rest[:2].zfill(2)}"
+
+
+_BY_FIELD_TYPE = {
+    FieldType.DATE: _date_to_str,
+    FieldType.NEWDATE: _date_to_str,
+    FieldType.DATETIME: _datetime_to_str,
+    FieldType.TIMESTAMP: _datetime_to_str,
+    FieldType.TIME: _timedelta_to_str,
+    FieldType.DECIMAL: str,
+    FieldType.NEWDECIMAL: str,
+}
+
+# datetime before date: it is a subclass
+_BY_PYTHON_TYPE = (
+    (datetime, _datetime_to_str),
+    (date, _date_to_str),
+    (timedelta, _timedelta_to_str),
+    (time, _time_to_str),
+    (Decimal, str),
+)
+
+
+# ----------------------------
+# PLANS
+# ----------------------------
+@lru_cache(maxsize=256)
+def _plan_for_columns(columns):
+    return tuple((name, _BY_FIELD_TYPE[type_code]) for name, type_code in columns if type_code in _BY_FIELD_TYPE)
+
+
+def plan_from_description(description):
+    """(column, converter) pairs for a cursor.description; cached per result shape."""
+    return _plan_for_columns(tuple((column[0], column[1]) for column in description))
+
+
+def _converter_for(value):
+    for kind, convert in _BY_PYTHON_TYPE:
+        if isinstance(value, kind):
+            return convert
+    return None
+
+
+def plan_from_rows(rows):
+    """(column, converter) pairs from the first non-null value of each column."""
+    plan = []
+    for name in rows[0]:
+        value = next((row[name] for row in rows if row[name] is not None), None)
+        convert = _converter_for(value)
+        if convert is not None:
+            plan.append((name, convert))
+    return tuple(plan)
+
+
+def serialize(rows, description=None, overrides=None):
+    """Make dict rows JSON-ready in place and return them.
+
+    `description` is the producing cursor's description; without it the
+    plan is read off the values. `overrides` maps a column to a converter
+    that replaces the planned one (e.g. {"time": format_hhmm}).
+    """
+    if not rows:
+        return rows
+    plan = plan_from_description(description) if description else plan_from_rows(rows)
+    if overrides:
+        plan = tuple((name, convert) for name, convert in plan if name not in overrides)
+        plan += tuple(overrides.items())
+    if not plan:
+        return rows
+    for row in rows:
+        for name, convert in plan:
+            value = row[name]
+            if value is not None:
+                row[name] = convert(value)
+    return rows
+
+
+def fetch(cursor):
+    """fetchall() on a dictionary cursor, serialized."""
+    return serialize(cursor.fetchall(), cursor.description)
+
+
+# ----------------------------
+# PARSING
+# ----------------------------
+def as_time(value):
+    """A TIME value (timedelta, time or "HH:MM[:SS]" string) as datetime.time, or None."""
+    if isinstance(value, time):
+        return value
+    if isinstance(value, timedelta):
+        seconds = value.days * 86400 + value.seconds
+        return time(seconds // 3600, seconds // 60 % 60, seconds % 60)
+    if isinstance(value, str):
+        for fmt in ("%H:%M:%S", "%H:%M"):
+            try:
+                return datetime.strptime(value, fmt).time()
+            except ValueError:
+                continue
+    return None
+
+
+def as_date(value):
+    """A DATE value ("YYYY-MM-DD" strings included) as datetime.date; None if unparseable."""
+    if isinstance(value, str):
+        try:
+            return datetime.strptime(value, "%Y-%m-%d").date()
+        except ValueError:
+            return None
+    return value
+
+
+# ----------------------------
+# JSON ENCODING
+# ----------------------------
+def _response_value(args, kwargs):
+    """What jsonify(*args, **kwargs) serializes, as JSONProvider.response() documents it."""
+    if args and kwargs:
+        raise TypeError("app.json.response() takes either args or kwargs, not both")
+    if not args and not kwargs:
+        return None
+    if len(args) == 1:
+        return args[0]
+    return list(args) if args else kwargs
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask's JSON provider with orjson doing the encoding when it is available."""
+
+    def _orjson_option(self):
+        # Dates go through self.default like they do with the stdlib encoder
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return option
+
+    def _indenting(self):
+        return (self.compact is None and self._app.debug) or self.compact is False
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs.get("indent"):
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self._orjson_option()).decode()
+
+    def response(self, *args, **kwargs):
+        if orjson is None or self._indenting():
+            return super().response(*args, **kwargs)
+        obj = _response_value(args, kwargs)
+        body = orjson.dumps(obj, default=self.default, option=self._orjson_option() | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+def dumps(obj):
+    """Compact JSON text for already-serialized data (streaming responses)."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=str, option=orjson.OPT_NON_STR_KEYS).decode()
+    return json.dumps(obj, default=str, separators=(",", ":"))
+
+
+def install(app):
+    app.json = FastJSONProvider(app)
@@ -0,0 +1,210 @@
+"""Production entry point: the API under gunicorn with several worker processes.
+
+    python server.py --workers 4 --threads 8 --event-streams 64 --bind 0.0.0.0:5050
+
+`python app.py` is the single-process dev server (reloader and debugger on);
+use this everywhere else. gunicorn is an optional dependency (pip install
+gunicorn). Settings come from flags or the environment:
+
+    MEDIQUEUE_BIND              [0.0.0.0:5050]
+    MEDIQUEUE_WORKERS           worker processes [number of CPUs]
+    MEDIQUEUE_THREADS           request threads per worker [8; keep at or below MEDIQUEUE_DB_POOL_SIZE]
+    MEDIQUEUE_MAX_EVENT_STREAMS open /events/queue streams per worker [64]
+    MEDIQUEUE_GRACEFUL_TIMEOUT  seconds a draining worker may finish requests [30]
+    MEDIQUEUE_MAX_REQUESTS      recycle a worker after this many requests [0 = never]
+
+The app is imported and warmed once in the master (schema mapping, the
+reservation/directory table checks) and then forked, so workers share
+those pages copy-on-write; gc.freeze() keeps the collector from touching
+(and so copying) them. Each worker opens its own connection pool after the
+fork and runs its own slot scheduler for the state that lives in process
+memory (response cache, live queue, event broker). Jobs that write to the
+database (auto-completing past appointments) run only in the worker holding
+the `mediqueue-scheduler` MySQL lock; another takes over if it exits.
+
+With more than one worker, OTPs default to the shared SQLite store, queue
+events are relayed through MySQL so every worker's event streams see every
+booking (see events.py), and the in-memory live queue is off (a booking made
+in one worker would not show in another's copy until the next slot
+boundary); set MEDIQUEUE_OTP_STORE / MEDIQUEUE_EVENT_RELAY /
+MEDIQUEUE_QUEUE_ENGINE explicitly to override.
+
+Workers are threaded (gthread), and an open /events/queue stream holds one
+of a worker's threads until the dashboard closes. Each worker therefore
+gets --threads plus --event-streams threads, and past --event-streams open
+streams it answers /events/queue with 503 (the dashboard polls instead), so
+the --threads request threads are never taken by streams. An idle stream
+thread only waits on a condition and holds no database connection; set
+--event-streams to the number of dashboards you expect open, divided by
+the workers. Past a few hundred per worker, serve /events/queue from
+async_app.py (one event loop, no thread per stream) by routing that path to
+it at the proxy.
+
+`kill -HUP <master pid>` replaces the workers gracefully: new ones are
+forked while the old ones drain. The app is preloaded, so HUP does not pick
+up code changes; deploy new code with `kill -USR2` (start a new master
+beside the old one) followed by `kill -TERM` to the old master. On SIGTERM a
+worker answers 503 on /healthz,
+stops its scheduler, ends its event streams (clients reconnect elsewhere)
+and finishes in-flight requests within the graceful timeout.
+"""
+import argparse
+import gc
+import os
+import signal
+import threading
+
+from log_config import configure_logging, get_logger
+
+try:
+    from gunicorn.app.base import BaseApplication
+except ImportError:  # optional dependency, see the module docstring
+    BaseApplication = object
+
+DEFAULT_BIND = os.environ.get("MEDIQUEUE_BIND", "0.0.0.0:5050")
+DEFAULT_WORKERS = int(os.environ.get("MEDIQUEUE_WORKERS", str(os.cpu_count() or 1)))
+DEFAULT_THREADS = int(os.environ.get("MEDIQUEUE_THREADS", "8"))
+GRACEFUL_TIMEOUT = int(os.environ.get("MEDIQUEUE_GRACEFUL_TIMEOUT", "30"))
+MAX_REQUESTS = int(os.environ.get("MEDIQUEUE_MAX_REQUESTS", "0"))
+DEFAULT_EVENT_STREAMS = int(os.environ.get("MEDIQUEUE_MAX_EVENT_STREAMS", "64"))
+
+log = get_logger("server")
+
+
+def worker_threads(threads, event_streams):
+    """gunicorn threads per worker: `threads` for requests plus one for each event stream allowed."""
+    return threads + event_streams
+
+
+def configure_environment(workers, event_streams):
+    """Per-process state that must be shared (or switched off) once there are several workers."""
+    # events.py refuses streams past this, so they never take the request threads
+    os.environ["MEDIQUEUE_MAX_EVENT_STREAMS"] = str(event_streams)
+    if workers > 1:
+        os.environ.setdefault("MEDIQUEUE_OTP_STORE", "sqlite")
+        os.environ.setdefault("MEDIQUEUE_QUEUE_ENGINE", "0")
+        os.environ.setdefault("MEDIQUEUE_EVENT_RELAY", "mysql")
+
+
+# ----------------------------
+# APP FACTORY
+# ----------------------------
+def preload():
+    """Warm what every worker can inherit, on a throwaway connection (never the pool)."""
+    import mysql.connector
+
+    import directory
+    import schema
+    from db import DB_CONFIG
+    from reservations import ensure_reservation_table
+
+    try:
+        conn = mysql.connector.connect(**DB_CONFIG)
+    except mysql.connector.Error as e:
+        log.warning("Preload skipped, database unavailable: %s", e)
+        return
+    try:
+        schema.refresh(conn)
+        ensure_reservation_table(conn)
+        directory.ensure_directory(conn)
+    except (mysql.connector.Error, schema.SchemaError) as e:
+        log.warning("Preload incomplete: %s", e)
+    finally:
+        conn.close()
+
+
+def create_app():
+    """Import the Flask app and warm it; call before forking workers."""
+    import app as api
+
+    preload()
+    # Objects that exist now are never freed; keep the collector from writing to their pages after fork
+    gc.freeze()
+    return api.app
+
+
+# ----------------------------
+# WORKER HOOKS
+# ----------------------------
+def post_fork(server, worker):
+    # Sockets inherited from the master must never be shared between processes
+    from db import reset_pool
+
+    reset_pool()
+
+
+def post_worker_init(worker):
+    import app as api
+
+    api.start_event_relay()
+    api.scheduler.start()
+    original = worker.handle_exit
+
+    def handle_exit(sig, frame):
+        # Drain off the signal handler's stack: stopping the scheduler and waking streams takes locks
+        threading.Thread(target=api.stop_background_jobs, name="drain", daemon=True).start()
+        original(sig, frame)
+
+    signal.signal(signal.SIGTERM, handle_exit)
+
+
+def worker_exit(server, worker):
+    import app as api
+
+    api.stop_background_jobs()
+
+
+class MediQueueServer(BaseApplication):
+    def __init__(self, options):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        return create_app()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--bind", default=DEFAULT_BIND)
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--threads", type=int, default=DEFAULT_THREADS)
+    parser.add_argument("--event-streams", type=int, default=DEFAULT_EVENT_STREAMS)
+    parser.add_argument("--graceful-timeout", type=int, default=GRACEFUL_TIMEOUT)
+    parser.add_argument("--max-requests", type=int, default=MAX_REQUESTS)
+    args = parser.parse_args()
+    if args.event_streams < 1:
+        parser.error("--event-streams must be at least 1")
+
+    if BaseApplication is object:
+        raise SystemExit("server.py needs gunicorn: pip install gunicorn")
+    configure_environment(args.workers, args.event_streams)
+    configure_logging()
+
+    from db import POOL_SIZE
+
+    if args.threads > POOL_SIZE:
+        log.warning("%s threads per worker share %s pooled connections; "
+                    "raise MEDIQUEUE_DB_POOL_SIZE or requests will wait for connections", args.threads, POOL_SIZE)
+
+    MediQueueServer({
+        "bind": args.bind,
+        "workers": args.workers,
+        "threads": worker_threads(args.threads, args.event_streams),
+        "worker_class": "gthread",
+        "preload_app": True,
+        "graceful_timeout": args.graceful_timeout,
+        "timeout": max(60, args.graceful_timeout * 2),
+        "max_requests": args.max_requests,
+        "max_requests_jitter": args.max_requests // 10,
+        "post_fork": post_fork,
+        "post_worker_init": post_worker_init,
+        "worker_exit": worker_exit,
+    }).run()
+
+
+if __name__ == "__main__":
+    main()
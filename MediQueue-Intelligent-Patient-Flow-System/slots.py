@@ -0,0 +1,91 @@
+"""Half-hour appointment slot arithmetic and occupancy lookups."""
+from datetime import date, datetime, time, timedelta
+
+SLOT_MINUTES = 30
+SLOT_CAPACITY = 5  # max Scheduled/Waiting appointments per doctor per slot
+WORK_START = time(9, 0, 0)
+WORK_END = time(18, 0, 0)  # exclusive: the last slot is 17:30-18:00
+MAX_RANGE_DAYS = 31
+
+
+def slot_start_for(value):
+    """Round a time down to the start of its 30-minute slot."""
+    slot_minute = 0 if value.minute < SLOT_MINUTES else SLOT_MINUTES
+    return time(value.hour, slot_minute, 0)
+
+
+def slot_window(day, value):
+    """Return (slot_start, slot_end) times for the slot containing `value` on `day`."""
+    slot_start = slot_start_for(value)
+    slot_end = (datetime.combine(day, slot_start) + timedelta(minutes=SLOT_MINUTES)).time()
+    return slot_start, slot_end
+
+
+def day_slots():
+    """Yield (slot_start, slot_end) for every working slot of a day."""
+    current = datetime.combine(date.min, WORK_START)
+    work_end = datetime.combine(date.min, WORK_END)
+    while current < work_end:
+        nxt = current + timedelta(minutes=SLOT_MINUTES)
+        yield current.time(), nxt.time()
+        current = nxt
+
+
+SLOT_COUNTS_SQL = """
+    SELECT date,
+           HOUR(time) AS slot_hour,
+           FLOOR(MINUTE(time) / %s) AS slot_half,
+           COUNT(*) AS cnt
+    FROM appointment
+    WHERE d_id = %s
+      AND date BETWEEN %s AND %s
+      AND {a_status} IN ('Scheduled','Waiting')
+    GROUP BY date, slot_hour, slot_half
+"""
+
+
+def slot_counts_query(d_id, start_day, end_day, columns):
+    """(sql, params) for fetch_slot_counts(); shared with the async app."""
+    return SLOT_COUNTS_SQL.format(**columns), (SLOT_MINUTES, d_id, start_day, end_day)
+
+
+def slot_counts(rows):
+    """Turn SLOT_COUNTS_SQL rows (dicts) into {(date, slot_start): booked}."""
+    counts = {}
+    for row in rows:
+        slot_start = time(int(row["slot_hour"]), int(row["slot_half"]) * SLOT_MINUTES, 0)
+        counts[(row["date"], slot_start)] = row["cnt"]
+    return counts
+
+
+def fetch_slot_counts(cursor, d_id, start_day, end_day, columns):
+    """Return {(date, slot_start): booked} for a doctor over [start_day, end_day].
+
+    One grouped query replaces a COUNT(*) per slot; slots with no bookings
+    are simply absent from the result. `columns` is the schema.columns() mapping.
+    """
+    cursor.execute(*slot_counts_query(d_id, start_day, end_day, columns))
+    return slot_counts(cursor.fetchall())
+
+
+def available_slots(day, counts, now=None):
+    """Build the bookable slot list for `day` from a fetch_slot_counts() result.
+
+    Past slots are dropped for today and nothing is offered for past dates.
+    """
+    now = now or datetime.now()
+    if day < now.date():
+        return []
+    available = []
+    for slot_start, slot_end in day_slots():
+        # Real-time filtering: Skip past time slots for today
+        if day == now.date() and datetime.combine(day, slot_start) < now:
+            continue
+        cnt = counts.get((day, slot_start), 0)
+        if cnt < SLOT_CAPACITY:
+            available.append({
+                "start": slot_start.strftime("%H:%M"),
+                "end": slot_end.strftime("%H:%M"),
+                "remaining": SLOT_CAPACITY - cnt,
+            })
+    return available
@@ -0,0 +1,234 @@
+"""Per-request SQL instrumentation.
+
+db_connection() hands out connections wrapped by instrument(); their cursors
+time every statement and count the rows fetched. While a request is being
+handled (see install()) the numbers are added to that request's trace, and
+when it finishes:
+
+- a `Server-Timing: db;dur=...` header reports DB time and statement count,
+- statements slower than MEDIQUEUE_SLOW_QUERY_MS are logged with their
+  parameters redacted,
+- a statement shape repeated MEDIQUEUE_N_PLUS_ONE_THRESHOLD times or more in
+  one request is reported as a likely N+1 loop,
+- per-endpoint totals are kept for GET /db/requests.
+
+MEDIQUEUE_SQL_TRACE=0 hands out the raw connections instead.
+"""
+import os
+import re
+import threading
+import time as _time
+from collections import Counter
+from contextlib import contextmanager
+from functools import lru_cache
+
+from flask import request
+
+from log_config import get_logger
+
+ENABLED = os.environ.get("MEDIQUEUE_SQL_TRACE", "1") != "0"
+SLOW_QUERY_MS = float(os.environ.get("MEDIQUEUE_SLOW_QUERY_MS", "200"))
+N_PLUS_ONE_THRESHOLD = int(os.environ.get("MEDIQUEUE_N_PLUS_ONE_THRESHOLD", "5"))
+
+log = get_logger("sql")
+
+_local = threading.local()
+_totals_lock = threading.Lock()
+_endpoint_totals = {}  # endpoint -> running totals
+
+
+# ----------------------------
+# STATEMENT SHAPES
+# ----------------------------
+_STRING_LITERAL = re.compile(r"'(?:[^'\\]|\\.)*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*(?:\?|%s|%\(\w+\)s)(?:\s*,\s*(?:\?|%s|%\(\w+\)s))*\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=1024)
+def statement_shape(sql):
+    """Normalise a statement so calls differing only in values compare equal."""
+    shape = _STRING_LITERAL.sub("?", sql)
+    shape = _NUMBER_LITERAL.sub("?", shape)
+    shape = _PLACEHOLDER_LIST.sub("(...)", shape)
+    return _WHITESPACE.sub(" ", shape).strip()
+
+
+def _redacted(params):
+    if not params:
+        return "no params"
+    return f"{len(params)} param(s) redacted"
+
+
+# ----------------------------
+# TRACES
+# ----------------------------
+class RequestTrace:
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.started = _time.perf_counter()
+        self.statements = 0
+        self.db_ms = 0.0
+        self.rows = 0
+        self.shapes = Counter()
+
+    def record(self, sql, params, elapsed_ms):
+        self.statements += 1
+        self.db_ms += elapsed_ms
+        self.shapes[statement_shape(sql)] += 1
+
+    def repeated_shapes(self):
+        return [(shape, n) for shape, n in self.shapes.items() if n >= N_PLUS_ONE_THRESHOLD]
+
+
+def current_trace():
+    return getattr(_local, "trace", None)
+
+
+@contextmanager
+def traced(name):
+    """Trace the statements run inside the block outside a request (background jobs)."""
+    previous = current_trace()
+    trace = RequestTrace(name)
+    _local.trace = trace
+    try:
+        yield trace
+    finally:
+        _local.trace = previous
+
+
+def _record(sql, params, elapsed_ms):
+    trace = current_trace()
+    if trace is not None:
+        trace.record(sql, params, elapsed_ms)
+    if elapsed_ms >= SLOW_QUERY_MS:
+        where = trace.endpoint if trace is not None else "background"
+        shape = statement_shape(sql)
+        # One line per statement shape and endpoint a minute; a slow hot query would flood the log otherwise
+        log.warning("Slow query (%.1f ms, %s): %s [%s]", elapsed_ms, where, shape, _redacted(params),
+                    extra={"sample_key": ("slow", where, shape)})
+
+
+def _count_rows(n):
+    trace = current_trace()
+    if trace is not None:
+        trace.rows += n
+
+
+# ----------------------------
+# WRAPPERS
+# ----------------------------
+class InstrumentedCursor:
+    """Times execute()/executemany() and counts fetched rows; everything else is passed through."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        started = _time.perf_counter()
+        try:
+            return self._cursor.execute(operation, params, *args, **kwargs)
+        finally:
+            _record(operation, params, (_time.perf_counter() - started) * 1000)
+
+    def executemany(self, operation, seq_params, *args, **kwargs):
+        started = _time.perf_counter()
+        try:
+            return self._cursor.executemany(operation, seq_params, *args, **kwargs)
+        finally:
+            _record(operation, None, (_time.perf_counter() - started) * 1000)
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is not None:
+            _count_rows(1)
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        rows = self._cursor.fetchmany(*args, **kwargs)
+        _count_rows(len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        _count_rows(len(rows))
+        return rows
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class InstrumentedConnection:
+    def __init__(self, conn):
+        self._conn = conn
+
+    def cursor(self, *args, **kwargs):
+        return InstrumentedCursor(self._conn.cursor(*args, **kwargs))
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+def instrument(conn):
+    return InstrumentedConnection(conn) if ENABLED else conn
+
+
+# ----------------------------
+# FLASK HOOKS
+# ----------------------------
+def _begin():
+    _local.trace = RequestTrace(request.endpoint or request.path)
+
+
+def _finish(response):
+    trace = current_trace()
+    _local.trace = None
+    if trace is None:
+        return response
+
+    total_ms = (_time.perf_counter() - trace.started) * 1000
+    response.headers.add(
+        "Server-Timing",
+        f'db;dur={trace.db_ms:.2f};desc="{trace.statements} statements, {trace.rows} rows", app;dur={total_ms:.2f}',
+    )
+    response.headers["Timing-Allow-Origin"] = "*"  # let the dashboards' devtools show it cross-origin
+
+    repeated = trace.repeated_shapes()
+    for shape, n in repeated:
+        log.warning("Possible N+1 in %s: %sx %s", trace.endpoint, n, shape,
+                    extra={"sample_key": ("n+1", trace.endpoint, shape)})
+
+    with _totals_lock:
+        totals = _endpoint_totals.setdefault(trace.endpoint, {
+            "requests": 0, "statements": 0, "db_ms": 0.0, "rows": 0, "max_statements": 0, "n_plus_one": 0,
+        })
+        totals["requests"] += 1
+        totals["statements"] += trace.statements
+        totals["db_ms"] += trace.db_ms
+        totals["rows"] += trace.rows
+        totals["max_statements"] = max(totals["max_statements"], trace.statements)
+        totals["n_plus_one"] += bool(repeated)
+    return response
+
+
+def install(app):
+    """Trace every request handled by `app`."""
+    if ENABLED:
+        app.before_request(_begin)
+        app.after_request(_finish)
+
+
+def endpoint_stats():
+    """Per-endpoint request, statement, DB time and row totals, with per-request averages."""
+    with _totals_lock:
+        snapshot = {endpoint: dict(totals) for endpoint, totals in _endpoint_totals.items()}
+    for totals in snapshot.values():
+        requests = totals["requests"]
+        totals["db_ms"] = round(totals["db_ms"], 3)
+        totals["avg_statements"] = round(totals["statements"] / requests, 2)
+        totals["avg_db_ms"] = round(totals["db_ms"] / requests, 3)
+    return snapshot
@@ -0,0 +1,57 @@
+"""Streaming JSON array responses for large listings and exports.
+
+Rows are read from an unbuffered cursor in `fetchmany` batches and encoded
+one at a time, so memory stays flat no matter how big the result set is.
+Cells are converted with the same per-column plan as the regular list
+endpoints (see serializer.py).
+"""
+from flask import Response
+
+import schema
+import serializer
+from db import db_connection
+
+BATCH_SIZE = 1000
+
+
+def iter_json_array(sql, params=(), batch_size=BATCH_SIZE):
+    """Yield a JSON array of the query's rows, one chunk per batch.
+
+    The pooled connection is held only while the generator runs; if the client
+    disconnects early, the unread rows are drained before it goes back to the pool.
+    `sql` may use schema.sql()'s {a_status}/{q_status} placeholders (so no
+    other braces); they are filled in on this same connection, before the
+    unbuffered cursor opens, so a stream never needs a second one.
+    """
+    with db_connection() as conn:
+        sql = schema.sql(conn, sql)
+        cursor = conn.cursor(dictionary=True, buffered=False)
+        exhausted = False
+        try:
+            cursor.execute(sql, params)
+            yield "["
+            first = True
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    exhausted = True
+                    break
+                serializer.serialize(rows, cursor.description)
+                chunk = []
+                for row in rows:
+                    chunk.append(("" if first else ",") + serializer.dumps(row))
+                    first = False
+                yield "".join(chunk)
+            yield "]"
+        finally:
+            if not exhausted:
+                conn.consume_results()
+            cursor.close()
+
+
+def stream_json(sql, params=(), batch_size=BATCH_SIZE, filename=None):
+    """Return a chunked application/json Response streaming the query's rows."""
+    response = Response(iter_json_array(sql, params, batch_size), mimetype="application/json")
+    if filename:
+        response.headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
@@ -0,0 +1,129 @@
+"""/events/queue under load, on a thread pool sized like a server.py worker.
+
+gunicorn's gthread worker runs requests on a ThreadPoolExecutor; the tests
+do the same with server.worker_threads(), open many more streams than a
+worker has request threads, and check that events reach every stream
+promptly while ordinary requests still find a free thread.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import pytest
+
+import app as api
+import server
+from events import EventBroker
+
+THREADS = 8
+EVENT_STREAMS = 64
+SUBSCRIBERS = 3 * THREADS  # well past the threads // 4 streams the old default allowed
+
+
+@pytest.fixture
+def broker(monkeypatch):
+    broker = EventBroker(max_streams=EVENT_STREAMS)
+    monkeypatch.setattr(api, "broker", broker)
+    yield broker
+    broker.close()
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out")
+        time.sleep(0.01)
+
+
+def subscriber(client, path, received):
+    """Read one stream (holding a pool thread, as a gthread worker would) until its first event."""
+    response = client.get(path, buffered=False)
+    try:
+        for chunk in response.response:
+            if b"event: queue" in chunk:
+                received.append(time.monotonic())
+                return
+    finally:
+        response.close()
+
+
+def test_events_reach_every_stream_while_requests_still_run(broker):
+    client = api.app.test_client()
+    received = []
+
+    with ThreadPoolExecutor(server.worker_threads(THREADS, EVENT_STREAMS)) as pool:
+        streams = [
+            pool.submit(subscriber, client, "/events/queue?doctor=3", received)
+            for _ in range(SUBSCRIBERS)
+        ]
+        wait_until(lambda: broker.subscribers == SUBSCRIBERS)
+
+        # Every request thread is still free for ordinary requests
+        health = [pool.submit(lambda: client.get("/healthz").status_code) for _ in range(THREADS)]
+        done, pending = wait(health, timeout=2)
+        assert not pending and all(future.result() == 200 for future in done)
+
+        published = time.monotonic()
+        api._publish_queue_change("booked", a_id=1, d_id=3)
+        done, pending = wait(streams, timeout=2)
+
+    assert not pending
+    assert len(received) == SUBSCRIBERS
+    assert max(received) - published < 1.0
+
+
+def test_streams_past_the_limit_are_refused(broker):
+    broker.max_streams = 2
+    client = api.app.test_client()
+
+    with ThreadPoolExecutor(4) as pool:
+        streams = [pool.submit(subscriber, client, "/events/queue", []) for _ in range(2)]
+        wait_until(lambda: broker.subscribers == 2)
+
+        response = client.get("/events/queue")
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "60"
+
+        broker.close()
+        wait(streams, timeout=2)
+
+
+def frames(stream, n):
+    return [next(stream) for _ in range(n)]
+
+
+def test_last_event_id_within_history_replays_the_missed_events():
+    broker = EventBroker(history_size=3)
+    for n in range(5):
+        broker.publish({"queue"}, {"type": "booked", "a_id": n})
+
+    preamble, *replayed = frames(broker.stream({"queue"}, after=3), 3)
+
+    assert preamble == "retry: 3000\nid: 3\n\n"
+    assert [frame.split("\n")[0] for frame in replayed] == ["id: 4", "id: 5"]
+
+
+@pytest.mark.parametrize("after", [1, 9])  # older than the history holds; from before a restart
+def test_unreplayable_last_event_id_gets_a_resync(after):
+    broker = EventBroker(history_size=3)
+    for n in range(5):
+        broker.publish({"queue"}, {"type": "booked", "a_id": n})
+
+    preamble, event = frames(broker.stream({"queue"}, after=after), 2)
+
+    assert preamble == "retry: 3000\nid: 5\n\n"
+    assert event == 'id: 5\nevent: queue\ndata: {"type": "resync"}\n\n'
+
+
+def test_resync_through_the_route(monkeypatch):
+    monkeypatch.setattr(api, "broker", EventBroker(history_size=2))
+    for n in range(4):
+        api._publish_queue_change("booked", a_id=n, d_id=3)
+
+    response = api.app.test_client().get("/events/queue?doctor=3", headers={"Last-Event-ID": "1"}, buffered=False)
+    try:
+        stream = iter(response.response)
+        next(stream)
+        assert b'"type": "resync"' in next(stream)
+    finally:
+        response.close()
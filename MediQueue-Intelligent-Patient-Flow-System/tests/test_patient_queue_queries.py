@@ -0,0 +1,133 @@
+"""Statement counts for /queue/patient/<p_id>, read off the request's SQL trace.
+
+The route runs against a recording connection (no MySQL needed) that is
+wrapped by sql_trace.instrument() exactly like a pooled one, so the counts
+in the Server-Timing header are the ones production would report.
+"""
+import re
+from contextlib import contextmanager
+from datetime import date, time, timedelta
+
+import pytest
+
+import app as api
+import schema
+import sql_trace
+
+COLUMNS = {"a_status": "a_status", "q_status": "q_status"}
+
+
+class RecordingCursor:
+    def __init__(self, conn):
+        self._conn = conn
+        self.rowcount = 0
+        self.lastrowid = None
+
+    def execute(self, operation, params=None):
+        self._conn.statements.append(operation)
+
+    def fetchone(self):
+        return self._conn.rows.pop(0) if self._conn.rows else None
+
+    def fetchall(self):
+        rows, self._conn.rows = self._conn.rows, []
+        return rows
+
+    def close(self):
+        pass
+
+
+class RecordingConnection:
+    """Answers each fetch with the next of `rows` and keeps every statement it was sent."""
+
+    def __init__(self, rows):
+        self.rows = list(rows)
+        self.statements = []
+
+    def cursor(self, *args, **kwargs):
+        return RecordingCursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+def queue_row(q_id=7, ahead_count=2):
+    tomorrow = date.today() + timedelta(days=1)
+    return {
+        "appointment_id": 42,
+        "appointment_date": tomorrow,
+        "appointment_time": timedelta(hours=10, minutes=15),
+        "appointment_status": "Scheduled",
+        "doctor_id": 3,
+        "d_name": "Dr. Rao",
+        "q_id": q_id,
+        "queue_status": "Waiting",
+        "ahead_count": ahead_count,
+        "is_first_in_slot": ahead_count == 0,
+    }
+
+
+@pytest.fixture
+def database(monkeypatch):
+    """Route db_connection() to a RecordingConnection primed with the rows given."""
+    conns = []
+
+    def prime(*rows):
+        conn = RecordingConnection(rows)
+        conns.append(conn)
+        return conn
+
+    @contextmanager
+    def db_connection():
+        yield sql_trace.instrument(conns.pop(0))
+
+    monkeypatch.setattr(sql_trace, "ENABLED", True)
+    monkeypatch.setattr(schema, "_columns", COLUMNS)
+    monkeypatch.setattr(api, "db_connection", db_connection)
+    monkeypatch.setattr(api.live_queue, "ready", False)  # answer from SQL, not the in-memory queue
+    return prime
+
+
+def statements_run(response):
+    match = re.search(r"(\d+) statements", response.headers["Server-Timing"])
+    return int(match.group(1))
+
+
+def test_steady_state_is_one_statement(database):
+    conn = database(queue_row())
+
+    response = api.app.test_client().get("/queue/patient/5")
+
+    assert response.status_code == 200
+    assert response.json["aheadCount"] == 2
+    assert statements_run(response) == 1
+    assert conn.statements == [schema.sql(None, api.PATIENT_QUEUE_SQL)]
+
+
+def test_patient_without_appointment_is_one_statement(database):
+    database()
+
+    response = api.app.test_client().get("/queue/patient/5")
+
+    assert response.json == {"inQueue": False}
+    assert statements_run(response) == 1
+
+
+def test_live_queue_hit_runs_no_sql(database, monkeypatch):
+    conn = database()
+    entry = {
+        "a_id": 42, "date": date.today(), "time": time(10, 15), "appointment_status": "Scheduled",
+        "doctor_id": 3, "doctor_name": "Dr. Rao", "queue_status": "Waiting", "q_id": 7,
+    }
+    monkeypatch.setattr(api.live_queue, "is_current", lambda today=None: True)
+    monkeypatch.setattr(api.live_queue, "next_for_patient", lambda p_id, slot_start: entry)
+    monkeypatch.setattr(api.live_queue, "ahead_of", lambda entry: 0)
+
+    response = api.app.test_client().get("/queue/patient/5")
+
+    assert response.json["isFirstInSlot"] is True
+    assert statements_run(response) == 0
+    assert conn.statements == []